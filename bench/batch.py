@@ -0,0 +1,56 @@
+"""Throughput of a script of commands, interactive loop vs batch mode
+
+Run from the repository root with:
+
+    python -m bench.batch
+
+A script that adds tasks to a new list is fed to the interactive loop,
+which draws a frame after every command, and then run in batch mode,
+which dispatches the same commands without drawing anything.
+"""
+import io
+import time
+
+from console import Console
+from tui import TUI
+
+SIZES = [1_000, 10_000, 100_000]
+INTERACTIVE_MAX = 10_000  # Larger scripts take too long interactively
+
+
+def make_script(task_count):
+    """Create a script adding tasks to a new list
+
+    :param task_count: Number of tasks to add
+    :type task_count: int
+    :return: Lines of the script
+    :rtype: list
+    """
+    return (["add Benchmark", "2"] +
+            [f"add Benchmark task number {i}" for i in range(task_count)])
+
+
+def main():
+    print(f"{'commands':>9} {'interactive':>16} {'batch':>16}")
+    for size in SIZES:
+        script = make_script(size)
+        interactive = None
+        if size <= INTERACTIVE_MAX:
+            console = Console(io.StringIO("\n".join(script) + "\n"),
+                              io.StringIO())
+            start = time.perf_counter()
+            TUI(console).run()
+            interactive = len(script) / (time.perf_counter() - start)
+
+        tui = TUI(Console(output_stream=io.StringIO()))
+        start = time.perf_counter()
+        tui.run_batch(script, io.StringIO())
+        batch = len(script) / (time.perf_counter() - start)
+        assert len(tui.notebook[2]) == size
+
+        shown = "-" if interactive is None else f"{interactive:.0f}/s"
+        print(f"{len(script):>9} {shown:>16} {batch:>14.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
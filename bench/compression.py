@@ -0,0 +1,49 @@
+"""Compression ratio and throughput of uploaded notebooks, per method
+
+Run from the repository root with:
+
+    python -m bench.compression
+
+Both notebook formats are compressed with every method that uploads may
+use, as Storage does, chunk by chunk. Throughput is the size of the
+uncompressed data per second, for compressing and for decompressing.
+"""
+import time
+
+from bench.notebooks import make_notebook
+from compression import METHODS, compress, decompress
+
+SIZES = [1_000, 100_000, 1_000_000]
+MB = 1000 * 1000
+
+
+def timed(function, *args):
+    """Call a function and measure how long it took
+
+    :return: Tuple of (result, seconds)
+    :rtype: tuple
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    print(f"{'tasks':>9} {'format':>7} {'method':>7} {'size':>12} "
+          f"{'ratio':>6} {'compress':>12} {'decompress':>12}")
+    for size in SIZES:
+        notebook = make_notebook(size)
+        for name, data in (("json", notebook.serialize().encode()),
+                           ("binary", notebook.encode())):
+            for method in METHODS:
+                packed, packing = timed(
+                    lambda: b"".join(compress(data, method)))
+                _, unpacking = timed(decompress, packed)
+                print(f"{size:>9} {name:>7} {method:>7} {len(packed):>12,} "
+                      f"{len(packed) / len(data):>6.2f} "
+                      f"{len(data) / packing / MB:>7.1f}MB/s "
+                      f"{len(data) / unpacking / MB:>7.1f}MB/s")
+
+
+if __name__ == "__main__":
+    main()
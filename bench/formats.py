@@ -0,0 +1,44 @@
+"""Size and speed of the JSON and binary notebook formats
+
+Run from the repository root with:
+
+    python -m bench.formats
+"""
+import time
+
+from bench.notebooks import make_notebook
+from notebook import Notebook
+
+SIZES = [1_000, 100_000, 1_000_000]
+
+
+def timed(function, *args):
+    """Call a function and measure how long it took
+
+    :return: Tuple of (result, seconds)
+    :rtype: tuple
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    print(f"{'tasks':>9} {'format':>7} {'size':>12} {'encode':>10} "
+          f"{'decode':>10}")
+    for size in SIZES:
+        notebook = make_notebook(size)
+        text, json_encode = timed(notebook.serialize)
+        _, json_decode = timed(Notebook.from_json, text)
+        data, binary_encode = timed(notebook.encode)
+        _, binary_decode = timed(Notebook.decode, data)
+        json_size = len(text.encode())
+        print(f"{size:>9} {'json':>7} {json_size:>12,} "
+              f"{json_encode * 1000:>8.1f}ms {json_decode * 1000:>8.1f}ms")
+        print(f"{size:>9} {'binary':>7} {len(data):>12,} "
+              f"{binary_encode * 1000:>8.1f}ms "
+              f"{binary_decode * 1000:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Memory and time of undo history, per change vs per notebook snapshot
+
+Run from the repository root with:
+
+    python -m bench.history
+
+A thousand commands are run on notebooks of growing size, each renaming,
+marking or removing a random task, with History recording them. This is
+compared with the naive alternative, a copy of the notebook per command,
+of which a single one is measured. History memory is measured with
+tracemalloc, and stays the same regardless of the notebook size.
+"""
+import gc
+import random
+import time
+import tracemalloc
+
+from bench.notebooks import make_notebook
+from history import History
+from notebook import Notebook
+
+SIZES = [1_000, 100_000, 1_000_000]
+COMMANDS = 1_000
+
+
+def run_commands(notebook, history, seed=0):
+    """Change random tasks of a notebook, one change per command
+
+    :param notebook: The notebook
+    :type notebook: :class:`Notebook`
+    :param history: History recording the notebook
+    :type history: :class:`History`
+    :param seed: Random seed
+    :type seed: int, optional
+    """
+    rng = random.Random(seed)
+    for i in range(COMMANDS):
+        lst = notebook[rng.randint(1, len(notebook))]
+        index = rng.randint(1, len(lst))
+        if i % 3 == 0:
+            lst.set_body(index, f"Renamed task {i}")
+        elif i % 3 == 1:
+            lst.set_done(index, True)
+        else:
+            lst.remove(index)
+        history.commit()
+
+
+def main():
+    print(f"{'tasks':>9} {'history':>18} {'undo all':>9}"
+          f" {'snapshot':>20}")
+    for size in SIZES:
+        notebook = make_notebook(size)
+        history = History(1024 * 1024 * 1024)
+        history.track(notebook)
+
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        run_commands(notebook, history)
+        elapsed = time.perf_counter() - start
+        held, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        while history.can_undo():
+            history.undo()
+        undo_time = time.perf_counter() - start
+
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        copy = Notebook.from_data(notebook.data())
+        copy_time = time.perf_counter() - start
+        copy_size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del copy
+
+        print(f"{size:>9} {held / COMMANDS:>7.0f}B/cmd"
+              f" {elapsed / COMMANDS * 1e6:>5.1f}us {undo_time:>8.3f}s"
+              f" {copy_size / 1024:>8.0f}KB/cmd"
+              f" {copy_time * 1e3:>6.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
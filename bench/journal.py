@@ -0,0 +1,68 @@
+"""Cost of keeping the notebook on the local disk
+
+Run from the repository root with:
+
+    python -m bench.journal
+
+For each size, a notebook is written as a snapshot, followed by a journal
+of single-change commands, just short of the next snapshot. After a clean
+exit, which takes a snapshot, startup only reads the snapshot index, and
+should take milliseconds regardless of the number of tasks. After a crash,
+the journal is replayed, which decodes every list it changes.
+"""
+import tempfile
+import time
+
+from bench.notebooks import make_notebook
+from localstorage import LocalStorage
+from task import Task
+
+SIZES = [1_000, 100_000, 1_000_000]
+
+
+def load(directory, task_count):
+    """Load the notebook from disk, and draw the list overview
+
+    :return: Tuple of (seconds taken, :class:`LocalStorage` of the session)
+    :rtype: tuple
+    """
+    start = time.perf_counter()
+    local = LocalStorage(directory)
+    notebook = local.load()
+    str(notebook)
+    elapsed = time.perf_counter() - start
+    assert notebook.stats.total == task_count
+    return elapsed, local
+
+
+def main():
+    print(f"{'tasks':>9} {'snapshot':>10} {'flush':>10} {'startup':>10}"
+          f" {'recovery':>10}")
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as directory:
+            notebook = make_notebook(size)
+            local = LocalStorage(directory)
+            start = time.perf_counter()
+            local.track(notebook)
+            snapshot = time.perf_counter() - start
+
+            changes = LocalStorage.SNAPSHOT_EVERY - 1
+            start = time.perf_counter()
+            for i in range(changes):
+                notebook[1 + i % len(notebook)].add(Task(f"Task {i}"))
+                local.flush()
+            flush = (time.perf_counter() - start) / changes
+
+            local.close()  # As if the session crashed
+            recovery, local = load(directory, size + changes)
+            local.snapshot()
+            local.close()
+            startup, local = load(directory, size + changes)
+            local.close()
+
+        print(f"{size:>9} {snapshot * 1000:>8.1f}ms {flush * 1000:>8.2f}ms"
+              f" {startup * 1000:>8.1f}ms {recovery * 1000:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Time from loading a binary notebook to drawing the list overview
+
+Run from the repository root with:
+
+    python -m bench.lazy_load
+
+With lazy loading, only the index of lists is decoded before the first
+frame, so the time should not depend on the number of tasks.
+"""
+import time
+
+from bench.notebooks import make_notebook
+from notebook import Notebook
+
+SIZES = [1_000, 100_000, 1_000_000]
+
+
+def first_frame(data, lazy):
+    """Load a notebook and render the list overview
+
+    :return: Seconds taken
+    :rtype: float
+    """
+    start = time.perf_counter()
+    notebook = Notebook.load(data, lazy)
+    str(notebook)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'tasks':>9} {'eager':>10} {'lazy':>10}")
+    for size in SIZES:
+        data = make_notebook(size).encode()
+        eager = first_frame(data, False)
+        lazy = first_frame(data, True)
+        print(f"{size:>9} {eager * 1000:>8.1f}ms {lazy * 1000:>8.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
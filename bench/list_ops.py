@@ -0,0 +1,77 @@
+"""Per-operation cost of List task operations at growing list sizes
+
+Run from the repository root with:
+
+    python -m bench.list_ops
+
+Every operation is timed at a random position, so the results reflect the
+average cost of shifting tasks inside the list. The cost per operation
+should stay roughly flat from 10 to 1,000,000 tasks.
+"""
+import random
+import time
+
+from list import List
+from task import Task
+
+SIZES = [10, 100, 1_000, 10_000, 100_000, 1_000_000]
+OPERATIONS = 2_000
+
+
+def make_list(size):
+    """Create a list filled with the given number of tasks
+
+    :param size: Number of tasks
+    :type size: int
+    :return: The filled list
+    :rtype: :class:`List`
+    """
+    lst = List("Benchmark")
+    for i in range(size):
+        lst.add(Task(f"Task {i}"))
+    return lst
+
+
+def time_per_op(lst, operation):
+    """Run an operation repeatedly at random positions
+
+    :param lst: The list to operate on
+    :type lst: :class:`List`
+    :param operation: Function(lst, index) performing a single operation
+    :type operation: function
+    :return: Average time per operation in microseconds
+    :rtype: float
+    """
+    rng = random.Random(0)
+    positions = [rng.randint(1, len(lst)) for _ in range(OPERATIONS)]
+    start = time.perf_counter()
+    for index in positions:
+        operation(lst, index)
+    return (time.perf_counter() - start) / OPERATIONS * 1e6
+
+
+def op_get(lst, index):
+    lst[index]
+
+
+def op_insert_remove(lst, index):
+    lst.insert(index, Task("Inserted"))
+    lst.remove(index)
+
+
+def op_move(lst, index):
+    lst.move(index, len(lst) - index + 1)
+
+
+def main():
+    print(f"{'tasks':>10} {'get':>10} {'ins+rem':>10} {'move':>10}  (us/op)")
+    for size in SIZES:
+        lst = make_list(size)
+        get = time_per_op(lst, op_get)
+        insert_remove = time_per_op(lst, op_insert_remove)
+        move = time_per_op(lst, op_move)
+        print(f"{size:>10} {get:>10.2f} {insert_remove:>10.2f} {move:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
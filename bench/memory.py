@@ -0,0 +1,69 @@
+"""Memory used per task, with one object per task and with TaskStore
+
+Run from the repository root with:
+
+    python -m bench.memory
+
+The object layout is what lists used before TaskStore: a BlockList of
+objects with an instance dictionary holding the body and both flags.
+Memory is measured with tracemalloc, and includes the task bodies.
+"""
+import gc
+import tracemalloc
+
+from bench.notebooks import make_notebook
+from blocklist import BlockList
+from list import List
+
+SIZES = [1_000, 100_000, 1_000_000]
+
+
+class ObjectTask:
+    """A task stored as a regular object, like Task before TaskStore"""
+
+    def __init__(self, body, done, prio):
+        self.body = body
+        self.done = done
+        self.prio = prio
+
+
+def measure(build):
+    """Measure the memory held by the result of a function
+
+    :param build: Function creating the measured object
+    :type build: function
+    :return: Allocated bytes still held after the function returned
+    :rtype: int
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = build()  # noqa: F841 - keep the result alive while measuring
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+
+def main():
+    print(f"{'tasks':>9} {'body':>6} {'objects':>9} {'store':>9}"
+          "  (bytes/task)")
+    for size in SIZES:
+        lst = make_notebook(size, list_count=1)[1]
+        tasks = [(task["body"], task["done"], task["prio"])
+                 for task in lst.data()["tasks"]]
+        del lst
+        # Bodies are copied, so that they are not shared with `tasks`,
+        # and count towards the measured memory
+        objects = measure(lambda: BlockList(
+            ObjectTask(body.encode().decode(), done, prio)
+            for body, done, prio in tasks))
+        store = measure(lambda: List.from_data({"name": "Memory", "tasks": [
+            {"body": body.encode().decode(), "done": done, "prio": prio}
+            for body, done, prio in tasks]}))
+        body = sum(len(task[0].encode()) for task in tasks) / size
+        print(f"{size:>9} {body:>6.1f} {objects / size:>9.1f}"
+              f" {store / size:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
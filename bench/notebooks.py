@@ -0,0 +1,39 @@
+"""Synthetic notebooks for benchmarks"""
+import random
+
+from list import List
+from notebook import Notebook
+from task import Task
+
+WORDS = ["buy", "milk", "call", "mom", "fix", "the", "bike", "write",
+         "report", "clean", "kitchen", "book", "flights", "pay", "rent",
+         "water", "plants", "read", "chapter", "walk", "dog", "email", "bob"]
+
+
+def make_notebook(task_count, list_count=10, seed=0):
+    """Create a notebook with tasks spread evenly across lists
+
+    Task bodies are random sequences of words, roughly a third of tasks
+    are done, and a fifth are priority.
+
+    :param task_count: Total number of tasks
+    :type task_count: int
+    :param list_count: Number of lists
+    :type list_count: int, optional
+    :param seed: Random seed, the same seed creates the same notebook
+    :type seed: int, optional
+    :return: The generated notebook
+    :rtype: :class:`Notebook`
+    """
+    rng = random.Random(seed)
+    notebook = Notebook()
+    for i in range(list_count):
+        lst = List(f"List {i + 1}")
+        count = task_count // list_count
+        if i < task_count % list_count:
+            count += 1
+        for _ in range(count):
+            body = " ".join(rng.choices(WORDS, k=rng.randint(2, 6)))
+            lst.add(Task(body[:40], rng.random() < 0.3, rng.random() < 0.2))
+        notebook.add(lst)
+    return notebook
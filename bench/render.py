@@ -0,0 +1,57 @@
+"""Bytes written to the terminal per frame, differential vs full redraw
+
+Run from the repository root with:
+
+    python -m bench.render
+
+A scripted session is played through the TUI. Every frame is presented
+normally, and additionally measured as if the whole screen was redrawn.
+"""
+import io
+import statistics
+
+from console import Console
+from screen import Screen
+from tui import TUI
+
+SCRIPT = (
+    ["1"] +
+    [f"add Benchmark task number {i}" for i in range(1, 31)] +
+    [f"done {i}" for i in range(1, 31, 3)] +
+    [f"prio {i}" for i in range(2, 31, 5)] +
+    ["page 1", "page 2", "rename 3 Renamed task", "move 4 1", "back",
+     "add Second list", "rename 2 Renamed list", "settings", "back",
+     "help", "", "exit", "exit"]
+)
+
+
+def main():
+    full_frames = []
+    diff_frames = []
+    present = Screen.present
+
+    def measured_present(self, keep_cursor=False):
+        shadow = Screen((self._width, self._height), Console(
+            output_stream=io.StringIO()))
+        shadow._cells = [row[:] for row in self._cells]
+        shadow._x, shadow._y = self._x, self._y
+        full_frames.append(present(shadow))
+        diff_frames.append(present(self, keep_cursor))
+        return diff_frames[-1]
+
+    Screen.present = measured_present
+    console = Console(io.StringIO("\n".join(SCRIPT) + "\n"), io.StringIO())
+    TUI(console).run()
+
+    full = sum(full_frames) / len(full_frames)
+    diff = sum(diff_frames) / len(diff_frames)
+    print(f"frames:               {len(diff_frames)}")
+    print(f"full redraw:          {full:.0f} bytes/frame")
+    print(f"differential, mean:   {diff:.0f} bytes/frame")
+    print(f"differential, median: {statistics.median(diff_frames):.0f} "
+          f"bytes/frame")
+    print(f"reduction:            {full / diff:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
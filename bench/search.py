@@ -0,0 +1,62 @@
+"""Cost of finding tasks with the search index
+
+Run from the repository root with:
+
+    python -m bench.search
+
+The lists are indexed in the background once the notebook is tracked,
+and the build time is how long that takes. Lookups and updates should
+take milliseconds or less, even at a million tasks, including the first
+lookup after tasks were shifted. Lookup time grows with the number of
+matching tasks, and every word used here appears in a large share of
+the generated tasks.
+"""
+import time
+
+from bench.notebooks import make_notebook
+from search import SearchIndex
+from task import Task
+
+SIZES = [1_000, 100_000, 1_000_000]
+QUERIES = ["milk", "buy milk", "kitchen rent bob"]
+LIMIT = 19
+UPDATES = 1_000
+
+
+def main():
+    print(f"{'tasks':>9} {'build':>9} " +
+          " ".join(f"{repr(q):>18}" for q in QUERIES) +
+          f" {'update':>9}")
+    for size in SIZES:
+        notebook = make_notebook(size)
+        index = SearchIndex()
+        start = time.perf_counter()
+        index.track(notebook)
+        index.wait()
+        build = time.perf_counter() - start
+
+        lookups = []
+        for query in QUERIES:
+            start = time.perf_counter()
+            index.find(query, LIMIT)
+            lookups.append(time.perf_counter() - start)
+
+        lst = notebook[1]
+        start = time.perf_counter()
+        for i in range(UPDATES):
+            lst.insert(1, Task("buy more milk"))
+            lst.set_body(2, "call bob")
+            lst.remove(1)
+        update = (time.perf_counter() - start) / (3 * UPDATES)
+        start = time.perf_counter()
+        index.find("milk", LIMIT)
+        shifted = time.perf_counter() - start
+
+        print(f"{size:>9} {build * 1000:>7.0f}ms " +
+              " ".join(f"{t * 1000:>16.2f}ms" for t in lookups) +
+              f" {update * 1e6:>7.1f}us"
+              f"  (first lookup after shifting: {shifted * 1000:.1f}ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Time from starting run.py to its first frame, with a budget
+
+Run from the repository root with:
+
+    python -m bench.startup
+
+Startup time is paid every time the app is run from a terminal, and
+by the session server when it's restarted. The app is started several
+times, and exits as soon as it has written the first frame. The median
+time must stay within the budget, and modules that are only needed after
+"connect", like the Dropbox SDK, must not be imported. The exit status
+is 1 if either check fails, so the benchmark can guard against
+regressions. The event loop is started after the first frame, so
+importing asyncio is not counted.
+
+The slowest imports are listed from a single run with -X importtime,
+by the time spent in each module itself.
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BUDGET_MS = 150  # Max median time to the first frame
+RUNS = 7
+DEFERRED = ["dropbox", "gdshortener", "requests"]  # Imported on connect
+# Start the app, and exit once it has written the first frame
+CHILD = ("import sys, console; "
+         "end = console.Frame.end; "
+         "console.Frame.end = lambda self: (end(self), sys.exit(0)); "
+         "import run")
+
+
+def start_app(*options):
+    """Start the app, and wait until it shows the first frame and exits
+
+    :param options: Additional interpreter options
+    :type options: str
+    :return: Tuple of (seconds taken, interpreter's error output)
+    :rtype: tuple
+    """
+    env = dict(os.environ, LISTS_HOME="")  # Don't read lists from disk
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, *options, "-c", CHILD],
+                            env=env, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True, check=True)
+    return time.perf_counter() - start, result.stderr
+
+
+def parse_importtime(output):
+    """Read the modules imported by the app from -X importtime output
+
+    :param output: Error output of the interpreter
+    :type output: str
+    :return: Dict of module name -> microseconds spent importing the module
+    itself, not counting the modules it imports
+    :rtype: dict
+    """
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, _, name = line[len("import time:"):].split("|")
+        if not own.strip().isdecimal():
+            continue  # Header line
+        modules[name.strip()] = int(own)
+    return modules
+
+
+def main():
+    times = [start_app()[0] for _ in range(RUNS)]
+    median = statistics.median(times)
+    _, output = start_app("-X", "importtime")
+    modules = parse_importtime(output)
+
+    print("Slowest imports:")
+    top = sorted(((own, name) for name, own in modules.items()),
+                 reverse=True)
+    for own, name in top[:8]:
+        print(f"  {name:<24} {own / 1000:>7.1f}ms")
+    print(f"Time to first frame: {median * 1000:.0f}ms median of {RUNS} "
+          f"(budget {BUDGET_MS}ms)")
+
+    failed = False
+    if median * 1000 > BUDGET_MS:
+        print("FAIL: startup is over budget")
+        failed = True
+    for name in DEFERRED:
+        if name in modules:
+            print(f"FAIL: \"{name}\" is imported on startup")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
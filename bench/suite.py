@@ -0,0 +1,264 @@
+"""Microbenchmarks of the core data path, checked against stored baselines
+
+Run from the repository root with:
+
+    python -m bench.suite
+
+Each case times a single operation, like parsing a command or rendering
+a frame, at notebook sizes from 10 to 1,000,000 tasks, using synthetic
+notebooks. Cases that don't depend on the notebook run once. The time per
+call is the best of several repeats.
+
+Results are compared with the baselines stored in bench/baselines.json.
+Baselines may come from a different machine, or one that was busier, so
+times are scaled by a calibration loop, timed right before each case on
+both machines. A case regresses when it is slower than its baseline by
+more than its threshold, and the exit status is then 1. Thresholds are
+generous, as timings of small cases vary a lot between runs.
+
+Run with --update to store the current results as the new baselines,
+keeping the thresholds. Use --filter to run only the cases whose name
+contains a text, and --max-size to skip larger notebooks.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import timeit
+from collections import namedtuple
+
+from bench.notebooks import make_notebook
+from config import Config
+from console import Console
+from input import UserInput
+from notebook import Notebook
+from tui import TUI
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+SIZES = [10, 1_000, 100_000, 1_000_000]
+THRESHOLD = 0.5  # Default allowed slowdown, as a fraction of the baseline
+MIN_TIME = 0.1  # Min seconds per repeat, calls are added until reached
+REPEATS = 5  # Max number of repeats per case
+MAX_TIME = 2.0  # Repeats stop early after this many seconds
+FAST_CALL = 1e-6  # Calls faster than this are timed 5 times as long
+
+# A benchmark case. `setup` takes the notebook size, or None if `sizes` is
+# None, and returns the function to time.
+Case = namedtuple("Case", ["name", "sizes", "setup"])
+
+_notebooks = {}  # Size -> notebook, shared by the cases
+
+
+def notebook_of(size):
+    """Return a synthetic notebook with ten lists, creating it once
+
+    :param size: Total number of tasks
+    :type size: int
+    :return: The notebook
+    :rtype: :class:`Notebook`
+    """
+    if size not in _notebooks:
+        _notebooks.clear()  # Larger notebooks take a lot of memory
+        _notebooks[size] = make_notebook(size)
+    return _notebooks[size]
+
+
+def setup_parse(_):
+    """Parse a command with an index and text"""
+    return lambda: UserInput.parse("  rename 12 Buy milk and eggs  ")
+
+
+def setup_find(_):
+    """Look up a command of list view by prefix"""
+    commands = TUI(Console(output_stream=io.StringIO())).list_view_commands
+    return lambda: commands.find("ren")
+
+
+def setup_config_get(_):
+    """Read a setting, as done for every task drawn"""
+    config = Config()
+    return lambda: config.get("print_done_tasks")
+
+
+def setup_list_str(size):
+    """Print a single list holding all tasks"""
+    lst = make_notebook(size, list_count=1)[1]
+    return lambda: str(lst)
+
+
+def setup_notebook_str(size):
+    """Print the list overview"""
+    notebook = notebook_of(size)
+    return lambda: str(notebook)
+
+
+def setup_serialize(size):
+    """Convert the notebook to JSON"""
+    notebook = notebook_of(size)
+    return notebook.serialize
+
+
+def setup_from_json(size):
+    """Create the notebook from JSON"""
+    text = notebook_of(size).serialize()
+    return lambda: Notebook.from_json(text)
+
+
+def setup_render(size, task_view):
+    """Prepare drawing full frames of a session, with output captured
+
+    :param size: Total number of tasks
+    :type size: int
+    :param task_view: Show the first list, rather than the list overview
+    :type task_view: bool
+    :return: Function drawing a frame
+    :rtype: function
+    """
+    output = io.StringIO()
+    tui = TUI(Console(output_stream=output))
+    tui.notebook = notebook_of(size)
+    tui.state = TUI.State.LIST_VIEW
+    if task_view:
+        tui.active_list = tui.notebook[1]
+        tui.state = TUI.State.TASK_VIEW
+
+    def render():
+        output.seek(0)
+        output.truncate()
+        tui.screen.invalidate()  # Draw every cell, not just the changes
+        tui._render()
+    return render
+
+
+CASES = [
+    Case("parse", None, setup_parse),
+    Case("find", None, setup_find),
+    Case("config_get", None, setup_config_get),
+    Case("list_str", SIZES, setup_list_str),
+    Case("notebook_str", SIZES, setup_notebook_str),
+    Case("serialize", SIZES, setup_serialize),
+    Case("from_json", SIZES, setup_from_json),
+    Case("render_lists", SIZES, lambda size: setup_render(size, False)),
+    Case("render_tasks", SIZES, lambda size: setup_render(size, True)),
+]
+
+
+def measure(function):
+    """Time a function, calling it enough times to be measurable
+
+    :param function: The function
+    :type function: function
+    :return: Best seconds per call
+    :rtype: float
+    """
+    timer = timeit.Timer(function)
+    number, elapsed = timer.autorange()
+    # Calls of nanoseconds vary more between samples, so take longer ones
+    min_time = MIN_TIME * 5 if elapsed / number < FAST_CALL else MIN_TIME
+    while elapsed < min_time:
+        number *= 2
+        elapsed = timer.timeit(number)
+    times = [elapsed]
+    while len(times) < REPEATS and sum(times) < MAX_TIME:
+        times.append(timer.timeit(number))
+    return min(times) / number
+
+
+def calibrate():
+    """Time a fixed pure-Python workload, to compare machines
+
+    :return: Best seconds per call
+    :rtype: float
+    """
+    return measure(lambda: sum(i * i for i in range(10_000)))
+
+
+def format_time(seconds):
+    """Format a duration with a fitting unit
+
+    :param seconds: The duration
+    :type seconds: float
+    :return: The formatted duration
+    :rtype: str
+    """
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def load_baselines():
+    """Read the stored baselines
+
+    :return: Dict with "results", a dict of case key -> dict with
+    "seconds", "calibration" seconds timed before the case, and "threshold"
+    :rtype: dict
+    """
+    try:
+        with open(BASELINES, encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {"results": {}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--update", action="store_true",
+                        help="store the results as the new baselines")
+    parser.add_argument("--filter", default="",
+                        help="only run cases whose name contains this text")
+    parser.add_argument("--max-size", type=int, default=max(SIZES),
+                        help="skip notebooks with more tasks than this")
+    args = parser.parse_args()
+
+    baselines = load_baselines()
+    print(f"{'case':<22} {'time':>10} {'baseline':>10} {'change':>8}")
+
+    results = {}
+    regressions = []
+    for case in CASES:
+        if args.filter not in case.name:
+            continue
+        for size in case.sizes or [None]:
+            if size is not None and size > args.max_size:
+                continue
+            key = case.name if size is None else f"{case.name}/{size}"
+            function = case.setup(size)
+            calibration = calibrate()
+            seconds = measure(function)
+            results[key] = (seconds, calibration)
+            stored = baselines["results"].get(key)
+            if stored is None:
+                print(f"{key:<22} {format_time(seconds):>10} {'-':>10}")
+                continue
+            expected = (stored["seconds"] * calibration /
+                        stored["calibration"])
+            change = seconds / expected - 1
+            status = ""
+            if change > stored["threshold"]:
+                status = " REGRESSION"
+                regressions.append(key)
+            print(f"{key:<22} {format_time(seconds):>10} "
+                  f"{format_time(expected):>10} {change:>+8.0%}{status}")
+
+    if args.update:
+        for key, (seconds, calibration) in results.items():
+            stored = baselines["results"].get(key, {"threshold": THRESHOLD})
+            baselines["results"][key] = {"seconds": seconds,
+                                         "calibration": calibration,
+                                         "threshold": stored["threshold"]}
+        baselines["python"] = platform.python_version()
+        with open(BASELINES, "w", encoding="utf-8") as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+            file.write("\n")
+        print(f"Baselines of {len(results)} cases stored.")
+    elif len(regressions) > 0:
+        print(f"FAIL: {len(regressions)} cases regressed: "
+              f"{', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
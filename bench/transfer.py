@@ -0,0 +1,112 @@
+"""Peak memory of exporting and importing lists, streamed vs whole
+
+Run from the repository root with:
+
+    python -m bench.transfer
+
+A notebook is exported to a JSON file, once as a single string from
+Notebook.serialize(), and once with the streaming export, list by list.
+The file is then imported again, once by parsing the whole file with
+Notebook.from_json(), and once with the streaming import, which adds
+tasks in chunks. Peak memory is measured with tracemalloc, on top of
+what's held before each step, so it doesn't include the exported
+notebook. Imports do include the imported notebook, so the difference
+between them is what parsing costs on top of it. Times are taken while
+tracing allocations, so they are only comparable with each other.
+"""
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+from bench.notebooks import make_notebook
+from list import List
+from notebook import Notebook
+from transfer import export_lists, import_lists
+
+SIZES = [10_000, 100_000, 1_000_000]
+MB = 1024 * 1024
+
+
+def measure(run):
+    """Measure the time and peak memory of a function
+
+    :param run: The function
+    :type run: function
+    :return: Tuple of (seconds taken, peak bytes allocated by the function)
+    :rtype: tuple
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def export_whole(notebook, path):
+    """Write a notebook as a single JSON string"""
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(notebook.serialize())
+
+
+def export_streamed(notebook, path):
+    """Write a notebook with the streaming export"""
+    with open(path, "w", encoding="utf-8") as file:
+        export_lists(notebook, file, "json")
+
+
+def import_whole(path):
+    """Read a notebook by parsing the whole file at once"""
+    with open(path, encoding="utf-8") as file:
+        return Notebook.from_json(file.read())
+
+
+def import_streamed(path):
+    """Read a notebook with the streaming import, like the import command"""
+    notebook = Notebook()
+    lists = {}
+    with open(path, encoding="utf-8") as file:
+        for key, name, tasks in import_lists(file, "json", "Imported"):
+            if key not in lists:
+                lists[key] = List(name)
+                notebook.add(lists[key])
+            if len(tasks) > 0:
+                lists[key].extend(tasks)
+    return notebook
+
+
+def measure_export(size, path):
+    """Measure both exports of a notebook
+
+    :param size: Number of tasks in the notebook
+    :type size: int
+    :param path: Path of the file to write
+    :type path: str
+    :return: Tuple of (whole, streamed), each as returned by measure()
+    :rtype: tuple
+    """
+    notebook = make_notebook(size)
+    return (measure(lambda: export_whole(notebook, path)),
+            measure(lambda: export_streamed(notebook, path)))
+
+
+def main():
+    print(f"{'tasks':>9} {'step':>7} {'whole':>16} {'streamed':>16}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "lists.json")
+        for size in SIZES:
+            rows = [("export", *measure_export(size, path)),
+                    ("import", measure(lambda: import_whole(path)),
+                     measure(lambda: import_streamed(path)))]
+            for step, whole, streamed in rows:
+                print(f"{size:>9} {step:>7}"
+                      f" {whole[1] / MB:>6.1f}MB {whole[0]:>6.2f}s"
+                      f" {streamed[1] / MB:>6.1f}MB {streamed[0]:>6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Helpers for reading and writing the compact binary notebook format
+
+Integers are stored as unsigned LEB128 varints, and strings as
+a varint byte length followed by UTF-8 data.
+"""
+
+
+def write_varint(out, value):
+    """Append an unsigned integer as a varint
+
+    :param out: Buffer to append to
+    :type out: bytearray
+    :param value: Non-negative integer
+    :type value: int
+    """
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    """Read a varint
+
+    :param data: Buffer to read from
+    :type data: bytes or memoryview
+    :param pos: Position of the varint
+    :type pos: int
+    :raises ValueError: The data ends in the middle of the varint
+    :return: Tuple of (value, position after the varint)
+    :rtype: tuple
+    """
+    result = 0
+    shift = 0
+    try:
+        while True:
+            byte = data[pos]
+            pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result, pos
+            shift += 7
+    except IndexError:
+        raise ValueError("Unexpected end of binary data")
+
+
+def write_str(out, text):
+    """Append a length-prefixed string
+
+    :param out: Buffer to append to
+    :type out: bytearray
+    :param text: The string
+    :type text: str
+    """
+    encoded = text.encode()
+    write_varint(out, len(encoded))
+    out += encoded
+
+
+def read_str(data, pos):
+    """Read a length-prefixed string
+
+    :param data: Buffer to read from
+    :type data: bytes or memoryview
+    :param pos: Position of the string
+    :type pos: int
+    :raises ValueError: The data ends in the middle of the string
+    :return: Tuple of (string, position after the string)
+    :rtype: tuple
+    """
+    length, pos = read_varint(data, pos)
+    end = pos + length
+    if end > len(data):
+        raise ValueError("Unexpected end of binary data")
+    return bytes(data[pos:end]).decode(), end
@@ -0,0 +1,311 @@
+from collections.abc import MutableSequence
+from itertools import chain
+
+
+class BlockList(MutableSequence):
+    """A zero-based sequence split into bounded blocks
+
+    Elements are stored in a list of blocks, each holding at most
+    2 * `block_size` elements. A Fenwick tree over the block lengths is used
+    to locate the block holding any position in O(log n), so random access,
+    insertion and removal never shift more than one block's worth of
+    elements. Blocks are split or dropped as they grow and shrink.
+
+    :param iterable: Initial contents, defaults to empty
+    :type iterable: iterable, optional
+    :param block_size: Target number of elements per block
+    :type block_size: int, optional
+    """
+
+    DEFAULT_BLOCK_SIZE = 512
+
+    def __init__(self, iterable=(), block_size=DEFAULT_BLOCK_SIZE):
+        """Constructor method
+        """
+        self._block_size = block_size
+        self._blocks = []
+        self._tree = [0]  # Fenwick tree over block lengths, one-based
+        self._len = 0
+        self.extend(iterable)
+
+    def __len__(self):
+        """Return the number of elements
+
+        :return: element count
+        :rtype: int
+        """
+        return self._len
+
+    def __iter__(self):
+        """Iterate over all elements in order
+        """
+        return chain.from_iterable(self._blocks)
+
+    def iter_from(self, index):
+        """Iterate over the elements from the provided position to the end
+
+        The position is only located once, so this is much faster than
+        retrieving the elements one by one.
+
+        :param index: zero-based position of the first element
+        :type index: int
+        :return: Iterator of the elements
+        :rtype: iterator
+        """
+        if index >= self._len:
+            return iter(())
+        block, offset = self._locate(index)
+        blocks = self._blocks
+        following = (blocks[i] for i in range(block + 1, len(blocks)))
+        return chain(blocks[block][offset:], chain.from_iterable(following))
+
+    def __getitem__(self, index):
+        """Retrieve the element at the provided position
+
+        :param index: zero-based position
+        :type index: int
+        :raises IndexError: Index is out of bounds
+        :return: The element
+        """
+        block, offset = self._locate(index)
+        return self._blocks[block][offset]
+
+    def __setitem__(self, index, value):
+        """Replace the element at the provided position
+
+        :param index: zero-based position
+        :type index: int
+        :param value: The new element
+        :raises IndexError: Index is out of bounds
+        """
+        block, offset = self._locate(index)
+        self._blocks[block][offset] = value
+
+    def __delitem__(self, index):
+        """Remove the element at the provided position
+
+        :param index: zero-based position
+        :type index: int
+        :raises IndexError: Index is out of bounds
+        """
+        self.pop(index)
+
+    def insert(self, index, value):
+        """Insert an element before the provided position
+
+        Unlike :meth:`list.insert`, the position must lie within the sequence,
+        or be equal to its length to append.
+
+        :param index: zero-based position, 0 <= index <= len(self)
+        :type index: int
+        :param value: The element to insert
+        :raises IndexError: Index is out of bounds
+        """
+        if index == self._len:
+            self.append(value)
+            return
+        block, offset = self._locate(index)
+        self._blocks[block].insert(offset, value)
+        self._len += 1
+        self._tree_add(block, 1)
+        if len(self._blocks[block]) > 2 * self._block_size:
+            self._split(block)
+
+    def append(self, value):
+        """Add an element to the end of the sequence
+
+        :param value: The element to add
+        """
+        if (len(self._blocks) == 0 or
+                len(self._blocks[-1]) >= self._block_size):
+            self._blocks.append(self._new_block([value]))
+            self._len += 1
+            self._tree_append()
+            return
+        self._blocks[-1].append(value)
+        self._len += 1
+        self._tree_add(len(self._blocks) - 1, 1)
+
+    def extend(self, values):
+        """Add many elements to the end of the sequence
+
+        The index is rebuilt once, rather than once per element.
+
+        :param values: The elements to add
+        :type values: iterable
+        """
+        values = list(values)
+        if len(values) == 0:
+            return
+        start = 0
+        if (len(self._blocks) > 0 and
+                len(self._blocks[-1]) < self._block_size):
+            start = self._block_size - len(self._blocks[-1])
+            self._blocks[-1].extend(values[:start])
+        for i in range(start, len(values), self._block_size):
+            self._blocks.append(
+                self._new_block(values[i:i + self._block_size]))
+        self._len += len(values)
+        self._rebuild()
+
+    def pop(self, index=None):
+        """Remove and return the element at the provided position
+
+        :param index: zero-based position, defaults to the last element
+        :type index: int, optional
+        :raises IndexError: Index is out of bounds
+        :return: The removed element
+        """
+        if index is None:
+            index = self._len - 1
+        block, offset = self._locate(index)
+        value = self._blocks[block].pop(offset)
+        self._len -= 1
+        if len(self._blocks[block]) == 0:
+            del self._blocks[block]
+            self._rebuild()
+        else:
+            self._tree_add(block, -1)
+        return value
+
+    def move(self, index, new_index):
+        """Move an element to a different position
+
+        After the move, the element is found at `new_index`.
+
+        :param index: zero-based position of the element
+        :type index: int
+        :param new_index: zero-based position to move the element to
+        :type new_index: int
+        :raises IndexError: Either index is out of bounds
+        """
+        if not 0 <= new_index < self._len:
+            raise IndexError(new_index)
+        self.insert(new_index, self.pop(index))
+
+    def copy(self):
+        """Return a copy of the sequence, which later changes don't affect
+
+        Blocks are copied by slicing, so elements are not copied.
+
+        :return: The copy
+        :rtype: :class:`BlockList`
+        """
+        result = type(self)(block_size=self._block_size)
+        result._blocks = [block[:] for block in self._blocks]
+        result._tree = self._tree[:]
+        result._len = self._len
+        return result
+
+    def clear(self):
+        """Remove all elements
+        """
+        self._blocks = []
+        self._tree = [0]
+        self._len = 0
+
+    def _new_block(self, values):
+        """Create a block holding the provided elements
+
+        Subclasses may store their elements in a different kind of block.
+        Blocks must support the list methods used by this class, including
+        slicing with [start:].
+
+        :param values: The elements of the block
+        :type values: list
+        :return: The new block
+        :rtype: list
+        """
+        return values
+
+    def _locate(self, index):
+        """Find the block holding the provided position
+
+        :param index: zero-based position
+        :type index: int
+        :raises IndexError: Index is out of bounds
+        :return: Tuple of (block index, offset within block)
+        :rtype: tuple
+        """
+        if not isinstance(index, int):
+            raise TypeError(f"Index must be an integer, not {type(index)}")
+        if not 0 <= index < self._len:
+            raise IndexError(index)
+
+        # Fenwick tree descent - find the last block whose prefix sum
+        # is still <= index
+        tree = self._tree
+        pos = 0
+        remaining = index
+        step = 1 << (len(tree) - 1).bit_length()
+        while step > 0:
+            nxt = pos + step
+            if nxt < len(tree) and tree[nxt] <= remaining:
+                pos = nxt
+                remaining -= tree[nxt]
+            step >>= 1
+        return pos, remaining
+
+    def _offset(self, block):
+        """Count the elements held by the blocks before the provided one
+
+        :param block: zero-based block index
+        :type block: int
+        :return: Position of the block's first element
+        :rtype: int
+        """
+        tree = self._tree
+        total = 0
+        i = block
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def _tree_add(self, block, delta):
+        """Adjust the recorded length of a block
+
+        :param block: zero-based block index
+        :type block: int
+        :param delta: Change of the block's length
+        :type delta: int
+        """
+        i = block + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _tree_append(self):
+        """Extend the Fenwick tree after a block was added to the end
+        """
+        tree = self._tree
+        i = len(tree)
+        # The new node covers the blocks (i - lowbit(i), i]
+        total = len(self._blocks[i - 1])
+        j = i - 1
+        while j > i - (i & -i):
+            total += tree[j]
+            j -= j & -j
+        tree.append(total)
+
+    def _rebuild(self):
+        """Recreate the Fenwick tree after blocks were added or removed
+        """
+        tree = [0] + [len(block) for block in self._blocks]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _split(self, block):
+        """Split an oversized block in two halves
+
+        :param block: zero-based block index
+        :type block: int
+        """
+        old = self._blocks[block]
+        half = len(old) // 2
+        self._blocks.insert(block + 1, old[half:])
+        del old[half:]
+        self._rebuild()
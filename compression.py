@@ -0,0 +1,144 @@
+import lzma
+import zlib
+
+MAGIC = b"LSTZ"  # Start of compressed data, followed by the method
+METHODS = {"zlib": b"z", "lzma": b"x"}  # Method name -> its marker byte
+CHUNK_SIZE = 1024 * 1024  # Bytes of input compressed at once
+
+
+def compress(data, method="zlib"):
+    """Compress data in chunks, with a marker telling the method
+
+    Output is produced as the input is consumed, so it can be sent before
+    the whole input was compressed.
+
+    :param data: Data to compress
+    :type data: bytes
+    :param method: Name of the method, one of METHODS
+    :type method: str, optional
+    :raises ValueError: The method is not known
+    :return: Generator of the compressed chunks, in order
+    :rtype: generator
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown compression method: {method}")
+    compressor = _compressor(method)
+    yield MAGIC + METHODS[method]
+    view = memoryview(data)
+    for start in range(0, len(data), CHUNK_SIZE):
+        chunk = compressor.compress(view[start:start + CHUNK_SIZE])
+        if len(chunk) > 0:
+            yield chunk
+    yield compressor.flush()
+
+
+def decompress(data):
+    """Decompress data made by compress(), or return other data as it is
+
+    :param data: The data
+    :type data: bytes
+    :raises ValueError: The data is damaged, cut short, or followed by
+    other data
+    :return: The original data
+    :rtype: bytes
+    """
+    decoder = Decoder()
+    return decoder.feed(data) + decoder.finish()
+
+
+class Decoder:
+    """Decompresses data made by compress() chunk by chunk, as it arrives
+
+    Data that doesn't start with the marker is passed through as it is.
+    """
+
+    def __init__(self):
+        """Constructor method
+        """
+        self._head = b""  # Start of the data, until the marker can be told
+        self._decompressor = None  # None if the data is not compressed yet
+        self._plain = False  # The data is not compressed
+
+    def feed(self, chunk):
+        """Decompress the next chunk of data
+
+        :param chunk: The chunk
+        :type chunk: bytes
+        :raises ValueError: The data is damaged, or follows the end of
+        the compressed data
+        :return: The original data decompressed so far from this chunk
+        :rtype: bytes
+        """
+        if self._plain:
+            return chunk
+        if self._decompressor is None:
+            self._head += chunk
+            if len(self._head) <= len(MAGIC):
+                return b""
+            chunk, self._head = self._head, b""
+            if not chunk.startswith(MAGIC):
+                self._plain = True
+                return chunk
+            marker = chunk[len(MAGIC):len(MAGIC) + 1]
+            for method, method_marker in METHODS.items():
+                if marker == method_marker:
+                    self._decompressor = _decompressor(method)
+                    break
+            else:
+                raise ValueError("Unknown compression method")
+            chunk = chunk[len(MAGIC) + 1:]
+        if self._decompressor.eof:
+            if len(chunk) > 0:
+                raise ValueError("Unexpected data after compressed data")
+            return b""
+        try:
+            data = self._decompressor.decompress(chunk)
+        except (zlib.error, lzma.LZMAError) as e:
+            raise ValueError(f"Damaged compressed data: {e}")
+        if len(self._decompressor.unused_data) > 0:
+            raise ValueError("Unexpected data after compressed data")
+        return data
+
+    def finish(self):
+        """Check that the data is complete
+
+        :raises ValueError: The compressed data was cut short, or is
+        followed by other data
+        :return: Data held back while looking for the marker
+        :rtype: bytes
+        """
+        if self._decompressor is not None:
+            if not self._decompressor.eof:
+                raise ValueError("Compressed data was cut short")
+            if len(self._decompressor.unused_data) > 0:
+                raise ValueError("Unexpected data after compressed data")
+            return b""
+        head, self._head = self._head, b""
+        return head
+
+
+def _compressor(method):
+    """Create a compressor
+
+    :param method: Name of the method
+    :type method: str
+    :return: Object with compress() and flush() methods
+    :rtype: object
+    """
+    if method == "lzma":
+        return lzma.LZMACompressor()
+    return zlib.compressobj()
+
+
+def _decompressor(method):
+    """Create a decompressor
+
+    :param method: Name of the method
+    :type method: str
+    :return: Object with a decompress() method, and eof and unused_data
+    attributes
+    :rtype: object
+    """
+    if method == "lzma":
+        return lzma.LZMADecompressor()
+    return zlib.decompressobj()
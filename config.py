@@ -2,7 +2,12 @@ from colorama import Fore, Style
 
 
 class Config:
-    """Facility for accessing global app configuration
+    """Settings of a single session, starting from the default values
+
+    Fields are found by name through a dict. Every change is passed to
+    the functions in `listeners`, which are called with the field name and
+    the new value, so that anything derived from the settings can be
+    updated.
     """
 
     class Field:
@@ -41,7 +46,7 @@ class Config:
 
             self.value = value
 
-    _fields = [
+    _defaults = [
         Field("print_done_tasks",
               "yes",
               "Show done tasks",
@@ -49,11 +54,36 @@ class Config:
         Field("save_on_exit",
               "yes",
               "Save on exit",
-              ["yes", "no"])
+              ["yes", "no"]),
+        Field("save_mode",
+              "changes",
+              "Upload on save",
+              ["changes", "all"]),
+        Field("autosave",
+              "off",
+              "Autosave after changes",
+              ["off", "2s", "10s", "60s"]),
+        Field("save_format",
+              "json",
+              "Storage format",
+              ["json", "binary"]),
+        Field("undo_memory",
+              "10MB",
+              "Memory for undo history",
+              ["1MB", "10MB", "100MB"])
     ]
 
-    @classmethod
-    def get(cls, name):
+    def __init__(self):
+        """Constructor method
+        """
+        self._fields = [
+            Config.Field(field.name, field.value, field.description,
+                         list(field.values))
+            for field in self._defaults]
+        self._by_name = {field.name: field for field in self._fields}
+        self.listeners = []  # Functions called with (name, value) on changes
+
+    def get(self, name):
         """Retrieve a config field's value
 
         :param name: Field name
@@ -62,10 +92,12 @@ class Config:
         :return: The value of the config field
         :rtype: str
         """
-        return cls._find_field(name).value
+        try:
+            return self._by_name[name].value
+        except KeyError:
+            raise ValueError(f"There is no config field called \"{name}\"")
 
-    @classmethod
-    def set(cls, name, value):
+    def set(self, name, value):
         """Set a config field to a provided value
 
         :param name: Field name
@@ -75,10 +107,9 @@ class Config:
         :raises ValueError: No field with such name, or the provided value
         is invalid for the field
         """
-        cls._find_field(name).set(value)
+        self._change(self._find_field(name), value)
 
-    @classmethod
-    def set_at(cls, index, value):
+    def set_at(self, index, value):
         """Set a config field by index
 
         The index corresponds to numbers as shown in the print() output,
@@ -91,13 +122,11 @@ class Config:
         :raises IndexError: The provided index is out of range
         :raises ValueError: The provided value is invalid for the field
         """
-        try:
-            cls._fields[index - 1].set(value)
-        except IndexError:
+        if not 1 <= index <= len(self._fields):
             raise IndexError(f"There is no field with index {index}.")
+        self._change(self._fields[index - 1], value)
 
-    @classmethod
-    def description_at(cls, index):
+    def description_at(self, index):
         """Return the description of the field at the provided index
 
         :param index: Field index
@@ -107,10 +136,9 @@ class Config:
         :rtype: str
         """
         index -= 1
-        return cls._fields[index].description
+        return self._fields[index].description
 
-    @classmethod
-    def _find_field(cls, name):
+    def _find_field(self, name):
         """Retrieve the field object with the given name
 
         :param name: Field name
@@ -120,20 +148,61 @@ class Config:
         :rtype: :class:`Field`
         """
         try:
-            return next(filter(lambda f: f.name == name, cls._fields))
-        except StopIteration:
+            return self._by_name[name]
+        except KeyError:
             raise ValueError(f"There is no config field called \"{name}\"")
 
-    @classmethod
-    def print(cls):
+    def _change(self, field, value):
+        """Set a field, and notify the listeners if its value changed
+
+        :param field: The field
+        :type field: :class:`Field`
+        :param value: New value to set on the field
+        :type value: str
+        :raises ValueError: The provided value is invalid for the field
+        """
+        previous = field.value
+        field.set(value)
+        if field.value == previous:
+            return
+        for listener in self.listeners:
+            listener(field.name, field.value)
+
+    def data(self):
+        """Return the dict representation of the settings
+
+        :return: A dictionary of field name -> value
+        :rtype: dict
+        """
+        return {field.name: field.value for field in self._fields}
+
+    def update(self, data):
+        """Set the fields from a dict representation
+
+        Unknown fields and values that are not allowed are skipped, so
+        settings stored by a different version of the app can be loaded.
+
+        :param data: A dictionary as previously returned by data()
+        :type data: dict
+        """
+        for name, value in data.items():
+            field = self._by_name.get(name)
+            if field is None or not isinstance(value, str):
+                continue
+            try:
+                self._change(field, value)
+            except ValueError:
+                continue
+
+    def print(self):
         """Return the string with the human-readable state of all fields
 
         :return: String with one field per line
         :rtype: str
         """
         result = ""
-        for i in range(len(cls._fields)):
-            field = cls._fields[i]
+        for i in range(len(self._fields)):
+            field = self._fields[i]
             index = i + 1
             values_text = ""
             if len(field.values) > 0:
@@ -1,17 +1,166 @@
-from colorama import Cursor
+import sys
+
+from colorama import Cursor, ansi
+from colorama.ansitowin32 import StreamWrapper
+
+
+class Frame:
+    """Collects console output, so that a whole frame is written at once
+
+    While a frame is open, :meth:`Console.put` only appends to an in-memory
+    buffer. Closing the frame writes the buffer to the console's output
+    with a single write, optionally wrapped in synchronized update markers,
+    which let the terminal display the frame atomically.
+
+    :param console: The console the frame is written to
+    :type console: :class:`Console`
+    """
+
+    SYNC_BEGIN = f"{ansi.CSI}?2026h"  # Begin synchronized update
+    SYNC_END = f"{ansi.CSI}?2026l"  # End synchronized update
+
+    def __init__(self, console):
+        """Constructor method
+        """
+        self.synchronized = True  # Whether to wrap frames in sync markers
+        self.puts = 0  # Number of put() calls collected into the last frame
+        self.writes = 0  # Number of writes made by the last frame
+        self.bytes = 0  # Number of bytes written by the last frame
+        self._console = console
+        self._buffer = None  # Output of the currently open frame
+
+    def begin(self):
+        """Open a new frame, buffering all further output
+        """
+        self._buffer = []
+
+    def end(self):
+        """Close the frame, and write all buffered output
+        """
+        if self._buffer is None:
+            return
+        self.puts = len(self._buffer)
+        if self.synchronized:
+            self._buffer.insert(0, self.SYNC_BEGIN)
+            self._buffer.append(self.SYNC_END)
+        data = "".join(self._buffer).encode()
+        self._buffer = None
+
+        self.bytes = len(data)
+        self.writes = 1
+        output = self._console.output
+        output.flush()  # Keep the ordering with any earlier output
+        stream = getattr(output, "buffer", None)
+        # Text-only streams, like io.StringIO, and streams wrapped by
+        # colorama to translate escape sequences on Windows, take text
+        if stream is None or isinstance(output, StreamWrapper):
+            output.write(data.decode())
+        else:
+            stream.write(data)
+        output.flush()
+
+    def is_open(self):
+        """Check whether output is currently being buffered
+
+        :return: `True` if a frame is open
+        :rtype: bool
+        """
+        return self._buffer is not None
+
+
+class Console:
+    """Text input and output of a single session
+
+    Without streams, the console uses the standard input and output
+    of the process, as they are at the time of each call.
+
+    :param input_stream: Stream to read commands from, defaults to stdin
+    :type input_stream: :class:`io.TextIOBase`, optional
+    :param output_stream: Stream to write to, defaults to stdout
+    :type output_stream: :class:`io.TextIOBase`, optional
+    """
+
+    def __init__(self, input_stream=None, output_stream=None):
+        """Constructor method
+        """
+        self._input = input_stream
+        self._output = output_stream
+        self.frame = Frame(self)
+
+    @property
+    def output(self):
+        """The stream output is written to
+        """
+        return sys.stdout if self._output is None else self._output
+
+    def input(self):
+        """Read a line of user input
+
+        :raises EOFError: There is no more input
+        :return: The line, without the trailing newline
+        :rtype: str
+        """
+        if self._input is None:
+            return input()
+        self.output.flush()
+        line = self._input.readline()
+        if line == "":
+            raise EOFError
+        return line.rstrip("\r\n")
+
+    def put(self, text):
+        """Print a string without any appended newline
+
+        Inside of a frame, the string is buffered instead.
+
+        :param text: The string to print
+        :type text: str
+        """
+        if self.frame.is_open():
+            self.frame._buffer.append(str(text))
+        else:
+            self.output.write(str(text))
+            self.output.flush()
+
+    def put_at(self, x, y, text):
+        """Print a string at a specific console position
+
+        :param x: Horizontal position
+        :type x: int
+        :param y: Vertical position
+        :type y: int
+        :param text: The string to print
+        :type text: str
+        """
+        self.put(f"{Cursor.POS(x + 1, y + 1)}{text}")
+
+    def clear(self, console_size):
+        """Clear the screen, and position the cursor at the top
+
+        Erases the display rather than scrolling it with newlines, which
+        would only scroll the bottom row while :class:`Screen` is in use.
+
+        :param console_size: Size of the console as (rows, columns)
+        :type console_size: tuple
+        """
+        self.put(ansi.clear_screen())
+        self.put_at(0, 0, "")
+
+
+default_console = Console()  # Standard input and output of the process
 
 
 def put(text):
-    """Print a string without any appended newline
+    """Print a string to the standard output, without any appended newline
 
     :param text: The string to print
     :type text: str
     """
-    print(text, end="")
+    default_console.put(text)
 
 
 def put_at(x, y, text):
-    """Print a string at a specific console position
+    """Print a string at a specific position of the standard output
 
     :param x: Horizontal position
     :type x: int
@@ -20,14 +169,13 @@ def put_at(x, y, text):
     :param text: The string to print
     :type text: str
     """
-    put(f"{Cursor.POS(x + 1, y + 1)}{text}")
+    default_console.put_at(x, y, text)
 
 
 def clear(console_size):
-    """Clear the screen, and position the cursor at the top
+    """Clear the standard output, and position the cursor at the top
 
     :param console_size: Size of the console as (rows, columns)
     :type console_size: tuple
     """
-    put("\n" * console_size[1])
-    put_at(0, 0, "")
+    default_console.clear(console_size)
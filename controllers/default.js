@@ -1,13 +1,41 @@
-const Pty = require('node-pty');
+const ChildProcess = require('child_process');
 const fs = require('fs');
+const net = require('net');
+const os = require('os');
+const path = require('path');
+
+// All visitors are served by a single Python process, one session per
+// connection to its socket
+const SOCKET_PATH = process.env.LISTS_SOCKET ||
+    path.join(os.tmpdir(), 'lists.sock');
+const RESTART_DELAY = 1000;  // Milliseconds to wait before a restart
+var server = null;
 
 exports.install = function () {
 
     ROUTE('/');
     WEBSOCKET('/', socket, ['raw']);
+    startServer();
 
 };
 
+function startServer() {
+    server = ChildProcess.spawn('python3', ['server.py', SOCKET_PATH], {
+        cwd: process.env.PWD,
+        stdio: 'inherit'
+    });
+
+    server.on('exit', function (code, signal) {
+        console.log("Session server stopped, restarting");
+        server = null;
+        setTimeout(startServer, RESTART_DELAY);
+    });
+}
+
+process.on('exit', function () {
+    server && server.kill();
+});
+
 function socket() {
 
     this.encodedecode = false;
@@ -15,37 +43,36 @@ function socket() {
 
     this.on('open', function (client) {
 
-        // Spawn terminal
-        client.tty = Pty.spawn('python3', ['run.py'], {
-            name: 'xterm-color',
-            cols: 80,
-            rows: 24,
-            cwd: process.env.PWD,
-            env: process.env
+        // Start a session
+        client.session = net.createConnection(SOCKET_PATH);
+        client.session.setEncoding('utf8');
+
+        client.session.on('error', function (err) {
+            console.log("Session failed: ", err.message);
         });
 
-        client.tty.on('exit', function (code, signal) {
-            client.tty = null;
+        client.session.on('close', function () {
+            client.session = null;
             client.close();
-            console.log("Process killed");
+            console.log("Session ended");
         });
 
-        client.tty.on('data', function (data) {
+        client.session.on('data', function (data) {
             client.send(data);
         });
 
     });
 
     this.on('close', function (client) {
-        if (client.tty) {
-            client.tty.kill(9);
-            client.tty = null;
-            console.log("Process killed and terminal unloaded");
+        if (client.session) {
+            client.session.destroy();
+            client.session = null;
+            console.log("Session closed");
         }
     });
 
     this.on('message', function (client, msg) {
-        client.tty && client.tty.write(msg);
+        client.session && client.session.write(msg);
     });
 }
 
@@ -57,4 +84,4 @@ if (process.env.CREDS != null) {
             socket.emit("console_output", "Error saving credentials: " + err);
         }
     });
-}
\ No newline at end of file
+}
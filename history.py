@@ -0,0 +1,265 @@
+from collections import namedtuple
+
+from list import List
+from operation import Operation
+from task import Task
+
+
+class History:
+    """Undo and redo support, following the changes of a notebook
+
+    The history is a listener of the notebook. For every change, it keeps
+    only what is needed to revert it: the index of the change, and the
+    value it replaced, such as the old body of a renamed task. Removed
+    tasks and lists are kept as they are, rather than copied, so every
+    change costs a small, constant amount of memory. The changes made
+    by a single command are grouped together by commit(), and undone
+    together.
+
+    Reverting a group changes the notebook like any command would,
+    so the listeners, like storage, see the reverting changes, and
+    the history records them as a group that reverts the undo, for redo.
+
+    The memory held by the history is estimated, and the oldest groups are
+    dropped once it's over the budget. A group too large to fit the budget
+    can't be undone, and nothing before it can be undone either.
+
+    :param budget: Max estimated bytes held by the history
+    :type budget: int
+    """
+
+    # A change, as needed to revert it: `value` holds what was replaced
+    # or removed, the number of added tasks, or the new index of a task
+    Change = namedtuple("Change", ["kind", "list_index", "task_index",
+                                   "value"])
+
+    CHANGE_COST = 120  # Estimated bytes held per change
+    TASK_COST = 60  # Estimated bytes held per task of a removed list
+
+    def __init__(self, budget):
+        """Constructor method
+        """
+        self.budget = budget
+        self._notebook = None  # The notebook being followed
+        # Groups of changes to revert for undo and redo, oldest first, each
+        # as a tuple of (changes, estimated bytes held by them)
+        self._undo = []
+        self._redo = []
+        self._group = []  # Changes of the running command
+        self._cost = 0  # Estimated bytes held by all groups
+        self._group_cost = 0  # Estimated bytes held by the running command
+        self._discard = False  # Whether the running command is too large
+        self._reverting = False  # Whether an undo or redo is running
+
+    def track(self, notebook):
+        """Start following the changes made to a notebook, with an empty
+        history
+
+        :param notebook: The notebook to follow
+        :type notebook: :class:`Notebook`
+        """
+        if self._notebook is not None:
+            self._notebook.listeners.remove(self._record)
+        self._notebook = notebook
+        notebook.listeners.append(self._record)
+        self._clear()
+
+    def can_undo(self):
+        """Check whether there are changes to undo
+
+        :return: `True` if undo() would change the notebook
+        :rtype: bool
+        """
+        return len(self._undo) > 0
+
+    def can_redo(self):
+        """Check whether there are undone changes to redo
+
+        :return: `True` if redo() would change the notebook
+        :rtype: bool
+        """
+        return len(self._redo) > 0
+
+    def commit(self):
+        """Finish the group of changes made by the running command
+
+        A group with any changes becomes the latest one to undo, and
+        the undone changes can no longer be redone.
+        """
+        if self._reverting:
+            return
+        group, discard, cost = self._take_group()
+        if discard:
+            self._clear()
+        elif len(group) > 0:
+            self._cost -= sum(cost for _, cost in self._redo)
+            self._redo = []
+            self._push(self._undo, group, cost)
+
+    def undo(self):
+        """Revert the latest group of changes
+
+        :raises RuntimeError: There is nothing to undo
+        :return: Number of changes reverted
+        :rtype: int
+        """
+        self.commit()
+        if len(self._undo) == 0:
+            raise RuntimeError("There is nothing to undo.")
+        return self._revert(self._undo, self._redo)
+
+    def redo(self):
+        """Repeat the latest group of undone changes
+
+        :raises RuntimeError: There is nothing to redo
+        :return: Number of changes repeated
+        :rtype: int
+        """
+        self.commit()
+        if len(self._redo) == 0:
+            raise RuntimeError("There is nothing to redo.")
+        return self._revert(self._redo, self._undo)
+
+    def _revert(self, source, target):
+        """Revert the latest group of one stack, recording the reverting
+        changes as a group of the other
+
+        :param source: Stack to take the group from
+        :type source: list
+        :param target: Stack to put the reverting group on
+        :type target: list
+        :return: Number of changes reverted
+        :rtype: int
+        """
+        group, cost = source.pop()
+        self._cost -= cost
+        self._reverting = True
+        try:
+            for change in reversed(group):
+                self._apply(change)
+        finally:
+            self._reverting = False
+            reverting, discard, cost = self._take_group()
+        if discard:  # Groups in the target stack no longer apply
+            self._cost -= sum(cost for _, cost in target)
+            target.clear()
+        else:
+            self._push(target, reverting, cost)
+        return len(group)
+
+    def _apply(self, change):
+        """Make the change that reverts a recorded one
+
+        :param change: The recorded change
+        :type change: :class:`History.Change`
+        """
+        notebook = self._notebook
+        kind = change.kind
+        if kind in (Operation.LIST_ADD, Operation.LIST_INSERT):
+            notebook.remove(change.list_index)
+            return
+        if kind == Operation.LIST_REMOVE:
+            notebook.insert(change.list_index, change.value)
+            return
+        if kind == Operation.LIST_RENAME:
+            notebook.rename(change.list_index, change.value)
+            return
+
+        lst = notebook[change.list_index]
+        if kind == Operation.TASK_ADD:
+            lst.remove(len(lst))
+        elif kind == Operation.TASK_EXTEND:
+            for _ in range(change.value):
+                lst.remove(len(lst))
+        elif kind == Operation.TASK_INSERT:
+            lst.remove(change.task_index)
+        elif kind == Operation.TASK_REMOVE:
+            lst.insert(change.task_index, change.value)
+        elif kind == Operation.TASK_RENAME:
+            lst.set_body(change.task_index, change.value)
+        elif kind == Operation.TASK_DONE:
+            lst.set_done(change.task_index, change.value)
+        elif kind == Operation.TASK_PRIO:
+            lst.set_prio(change.task_index, change.value)
+        elif kind == Operation.TASK_MOVE:
+            lst.move(change.value, change.task_index)
+
+    def _record(self, operation):
+        """Remember how to revert a change of the notebook
+
+        :param operation: The change made to the notebook
+        :type operation: :class:`Operation`
+        """
+        if self._discard:
+            return
+        kind = operation.kind
+        if kind == Operation.TASK_EXTEND:
+            value = len(operation.value)
+        elif kind == Operation.TASK_MOVE:
+            value = operation.value
+        else:
+            value = operation.previous
+        change = self.Change(kind, operation.list_index, operation.task_index,
+                             value)
+        self._group.append(change)
+        self._group_cost += self._change_size(change)
+        if self._group_cost > self.budget:
+            self._group = []
+            self._group_cost = 0
+            self._discard = True
+
+    def _take_group(self):
+        """Remove and return the changes recorded since the last group
+
+        :return: Tuple of (changes, whether they were discarded for being
+        too large, estimated bytes held by the changes)
+        :rtype: tuple
+        """
+        result = (self._group, self._discard, self._group_cost)
+        self._group = []
+        self._group_cost = 0
+        self._discard = False
+        return result
+
+    def _push(self, stack, group, cost):
+        """Add a group to a stack, and drop the oldest groups until
+        the history fits the budget
+
+        :param stack: The stack
+        :type stack: list
+        :param group: Changes of the group
+        :type group: list
+        :param cost: Estimated bytes held by the changes
+        :type cost: int
+        """
+        stack.append((group, cost))
+        self._cost += cost
+        for oldest in (self._undo, self._redo):
+            while self._cost > self.budget and len(oldest) > 0:
+                self._cost -= oldest.pop(0)[1]
+
+    def _clear(self):
+        """Forget all recorded changes
+        """
+        self._undo = []
+        self._redo = []
+        self._cost = 0
+        self._take_group()
+
+    def _change_size(self, change):
+        """Estimate the memory held by a change
+
+        :param change: The change
+        :type change: :class:`History.Change`
+        :return: Estimated bytes
+        :rtype: int
+        """
+        value = change.value
+        size = self.CHANGE_COST
+        if isinstance(value, str):
+            size += len(value)
+        elif isinstance(value, Task):
+            size += len(value.body)
+        elif isinstance(value, List):
+            size += len(value.name) + len(value) * self.TASK_COST
+        return size
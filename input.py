@@ -67,11 +67,15 @@ class Command:
     :param text_arg_required: If `has_text_arg` is True, whether the command
     requires the string argument
     :type text_arg_required: bool, optional
+    :param limit_text_arg: Whether the string argument is cut off at the max
+    length of user-provided strings, which doesn't suit file paths
+    :type limit_text_arg: bool, optional
     """
 
     def __init__(self, keyword, callback, help_text,
                  has_index_arg=False, index_arg_required=False,
-                 has_text_arg=False, text_arg_required=False):
+                 has_text_arg=False, text_arg_required=False,
+                 limit_text_arg=True):
         """Constructor method
         """
         self.keyword = keyword
@@ -81,6 +85,7 @@ class Command:
         self.index_arg_required = index_arg_required
         self.has_text_arg = has_text_arg
         self.text_arg_required = text_arg_required
+        self.limit_text_arg = limit_text_arg
 
     def invocations(self):
         """Return all the possible invocations of the command
@@ -150,6 +155,9 @@ class Command:
 
 class CommandList:
     """Represents all commands that are available in a single state
+
+    Commands are looked up in a trie of their keywords, so they can also
+    be invoked by any unique prefix of the keyword.
     """
 
     class CommandNameError(ValueError):
@@ -161,13 +169,19 @@ class CommandList:
         """Constructor method
         """
         self._commands = []
+        self._trie = _TrieNode()  # Keywords of all commands
+        self._text = None  # Cached result of __str__
 
     def __str__(self):
         """Return a list of all command invocations in the list
 
+        The text is cached until another command is added.
+
         :return: Multi-line string of command invocations
         :rtype: str
         """
+        if self._text is not None:
+            return self._text
         result = ""
         for i in range(len(self._commands)):
             command = self._commands[i]
@@ -175,6 +189,7 @@ class CommandList:
                 if i > 0:
                     result += "\n"
                 result += f"{invocation}"
+        self._text = result
         return result
 
     def add(self, command):
@@ -184,17 +199,93 @@ class CommandList:
         :type command: :class:`Command`
         """
         self._commands.append(command)
+        node = self._trie
+        node.commands.append(command)
+        for char in command.keyword:
+            node = node.children.setdefault(char, _TrieNode())
+            node.commands.append(command)
+        node.command = command
+        self._text = None
 
     def find(self, name):
-        """Return the command with the given name
+        """Return the command with the given name, or a unique prefix of it
 
-        :param name: Command name to search for
+        :param name: Command name or prefix to search for
         :type name: str
-        :raises CommandList.CommandNameError: Command not found
+        :raises CommandList.CommandNameError: Command not found, or the prefix
+        matches more than one command
         :return: Reference to the found command
         :rtype: :class:`Command`
         """
-        try:
-            return next(filter(lambda c: c.keyword == name, self._commands))
-        except StopIteration:
-            raise self.CommandNameError(f"Unknown command \"{name}\"")
+        node, matched = self._walk(name)
+        if matched == len(name):
+            if node.command is not None:  # Exact match
+                return node.command
+            if name != "" and len(node.commands) == 1:
+                return node.commands[0]
+            if name != "":
+                raise self.CommandNameError(
+                    f"Command \"{name}\" is ambiguous, did you mean "
+                    f"{self._quote(self.complete(name))}?")
+        elif matched > 0:
+            raise self.CommandNameError(
+                f"Unknown command \"{name}\", did you mean "
+                f"{self._quote(self.complete(name[:matched]))}?")
+        raise self.CommandNameError(f"Unknown command \"{name}\"")
+
+    def complete(self, prefix):
+        """Return the keywords of all commands starting with a prefix
+
+        :param prefix: Beginning of a command name
+        :type prefix: str
+        :return: Matching keywords, in the order the commands were added
+        :rtype: list
+        """
+        node, matched = self._walk(prefix)
+        if matched < len(prefix):
+            return []
+        return [c.keyword for c in node.commands if c.keyword != ""]
+
+    def _walk(self, name):
+        """Follow a name down the trie as far as possible
+
+        :param name: Command name or prefix
+        :type name: str
+        :return: Tuple of (last node reached, number of characters matched)
+        :rtype: tuple
+        """
+        node = self._trie
+        for i, char in enumerate(name):
+            child = node.children.get(char)
+            if child is None:
+                return node, i
+            node = child
+        return node, len(name)
+
+    @staticmethod
+    def _quote(keywords):
+        """Format command keywords as a readable enumeration
+
+        :param keywords: The keywords
+        :type keywords: list
+        :return: Quoted keywords, like "a", "b" or "c"
+        :rtype: str
+        """
+        quoted = [f"\"{keyword}\"" for keyword in keywords]
+        if len(quoted) == 1:
+            return quoted[0]
+        return f"{', '.join(quoted[:-1])} or {quoted[-1]}"
+
+
+class _TrieNode:
+    """A node of the command keyword trie, standing for a keyword prefix
+    """
+
+    __slots__ = ("children", "commands", "command")
+
+    def __init__(self):
+        """Constructor method
+        """
+        self.children = {}  # Next character -> node
+        self.commands = []  # All commands whose keyword has this prefix
+        self.command = None  # Command whose keyword is exactly this prefix
@@ -1,26 +1,39 @@
 from collections.abc import Sequence
-from functools import reduce
 
 from colorama import Fore, Style
 
-from config import Config
+from binary import read_str, read_varint, write_varint
+from operation import Operation
+from stats import TaskStats
 from task import Task
+from taskstore import TaskStore
 
 
 class List(Sequence):
     """An ordered, printable list of tasks
 
+    Tasks are kept in a compact :class:`TaskStore`, and retrieved as
+    copies. They can only be modified through the list's methods, which
+    keeps the task counters in `stats` accurate, and notifies the notebook
+    holding the list of every change.
+
     :param name: Name of the list
     :type name: str
     """
 
-    MAX_TASKS = 19  # Max number of tasks before layout overflow
+    LINE_CACHE_SIZE = 10_000  # Max number of printed tasks kept
 
     def __init__(self, name):
         """Constructor method
         """
         self.name = name
-        self._tasks = []
+        self._loaded = TaskStore()  # Tasks, once decoded
+        self._source = None  # (data, start, end) of tasks not decoded yet
+        self.stats = TaskStats()  # Counts of all, done and priority tasks
+        self.notebook = None  # The notebook holding this list, if any
+        # Zero-based index -> (done style the line was printed for, or None
+        # if it doesn't depend on it, printed line), see print_range()
+        self._lines = {}
 
     def __getitem__(self, index):
         """Retrieve a task at the provided index
@@ -28,33 +41,92 @@ class List(Sequence):
         :param index: one-based index of the list
         :type index: int
         :raises IndexError: Index is out of bounds
-        :return: task reference
+        :return: A copy of the task
         :rtype: :class:`Task`
         """
-        pass
         try:
+            if index < 1:
+                raise IndexError
             return self._tasks[index - 1]
         except IndexError:
             raise IndexError(f"There is no task with index {index}")
 
+    def __iter__(self):
+        """Iterate over copies of all tasks in order
+        """
+        return iter(self._tasks)
+
     def __len__(self):
         """Return the number of tasks
 
         :return: task count
         :rtype: int
         """
-        return len(self._tasks)
+        return self.stats.total
 
     def add(self, new_task):
         """Add a new task to the end of the list
 
         :param new_task: The task instance to add
         :type new_task: :class:`Task`
-        :raises RuntimeError: Too many tasks
         """
-        if len(self._tasks) >= self.MAX_TASKS:
-            raise RuntimeError("Reached the maximum allowed number of tasks")
         self._tasks.append(new_task)
+        self._count(new_task, 1)
+        self._emit(Operation.TASK_ADD, None, new_task.data())
+
+    def extend(self, new_tasks):
+        """Add several tasks to the end of the list at once
+
+        The change is passed to listeners as a single operation, which
+        makes this much faster than adding the tasks one by one.
+
+        :param new_tasks: The task instances to add
+        :type new_tasks: list
+        """
+        self._tasks.extend(new_tasks)
+        self.stats.update(len(new_tasks),
+                          sum(task.done for task in new_tasks),
+                          sum(task.prio for task in new_tasks))
+        self._emit(Operation.TASK_EXTEND, None,
+                   [task.data() for task in new_tasks])
+
+    def insert(self, index, new_task):
+        """Insert a new task at the provided position
+
+        Tasks at and after the position are shifted by one.
+
+        :param index: one-based index the new task will have
+        :type index: int
+        :param new_task: The task instance to insert
+        :type new_task: :class:`Task`
+        :raises IndexError: Index is out of bounds
+        """
+        try:
+            self._tasks.insert(index - 1, new_task)
+        except IndexError:
+            raise IndexError(f"Cannot insert a task at index {index}")
+        self._count(new_task, 1)
+        self._emit(Operation.TASK_INSERT, index, new_task.data())
+
+    def move(self, index, new_index):
+        """Move a task to a different position
+
+        :param index: one-based index of the task
+        :type index: int
+        :param new_index: one-based index the task will have after the move
+        :type new_index: int
+        :raises IndexError: Either index is out of bounds
+        :return: The moved task
+        :rtype: :class:`Task`
+        """
+        if not 1 <= new_index <= len(self._tasks):
+            raise IndexError(f"Cannot move a task to index {new_index}")
+        try:
+            self._tasks.move(index - 1, new_index - 1)
+        except IndexError:
+            raise IndexError(f"There is no task with index {index}")
+        self._emit(Operation.TASK_MOVE, index, new_index)
+        return self._tasks[new_index - 1]
 
     def remove(self, index):
         """Remove the task under given index from the list
@@ -66,28 +138,171 @@ class List(Sequence):
         :rtype: :class:`Task`
         """
         try:
-            return self._tasks.pop(index - 1)
+            removed_task = self._tasks.pop(index - 1)
         except IndexError:
             raise IndexError(f"There is no task with index {index}")
+        self._count(removed_task, -1)
+        self._emit(Operation.TASK_REMOVE, index, previous=removed_task)
+        return removed_task
+
+    def set_body(self, index, body):
+        """Change the text of the task under given index
+
+        :param index: one-based index of the task
+        :type index: int
+        :param body: The new body text
+        :type body: str
+        :raises IndexError: Index is out of bounds
+        :return: The modified task
+        :rtype: :class:`Task`
+        """
+        task = self[index]
+        previous = task.body
+        task.body = body
+        self._tasks[index - 1] = task
+        self._emit(Operation.TASK_RENAME, index, body, previous)
+        return task
+
+    def set_done(self, index, done):
+        """Mark the task under given index as done or not done
+
+        :param index: one-based index of the task
+        :type index: int
+        :param done: The new done state
+        :type done: bool
+        :raises IndexError: Index is out of bounds
+        :return: The modified task
+        :rtype: :class:`Task`
+        """
+        task = self[index]
+        previous = task.done
+        self.stats.update(done=int(done) - int(previous))
+        task.done = done
+        self._tasks[index - 1] = task
+        self._emit(Operation.TASK_DONE, index, done, previous)
+        return task
+
+    def set_prio(self, index, prio):
+        """Mark the task under given index as priority or normal priority
+
+        :param index: one-based index of the task
+        :type index: int
+        :param prio: The new priority state
+        :type prio: bool
+        :raises IndexError: Index is out of bounds
+        :return: The modified task
+        :rtype: :class:`Task`
+        """
+        task = self[index]
+        previous = task.prio
+        self.stats.update(prio=int(prio) - int(previous))
+        task.prio = prio
+        self._tasks[index - 1] = task
+        self._emit(Operation.TASK_PRIO, index, prio, previous)
+        return task
+
+    def _count(self, task, sign):
+        """Add or subtract a task from the counters
+
+        :param task: The task being added or removed
+        :type task: :class:`Task`
+        :param sign: 1 if the task was added, -1 if removed
+        :type sign: int
+        """
+        self.stats.update(sign, sign * int(task.done), sign * int(task.prio))
+
+    def _emit(self, kind, task_index, value=None, previous=None):
+        """Notify the notebook holding the list about a change
+
+        :param kind: Kind of the change, see :class:`Operation`
+        :type kind: str
+        :param task_index: Index of the affected task, if any
+        :type task_index: int
+        :param value: New value set by the change, if any
+        :param previous: Value replaced or removed by the change, if any
+        """
+        if kind in (Operation.TASK_RENAME, Operation.TASK_DONE,
+                    Operation.TASK_PRIO):
+            self._lines.pop(task_index - 1, None)
+        elif kind in (Operation.TASK_INSERT, Operation.TASK_REMOVE,
+                      Operation.TASK_MOVE):
+            # Tasks after the change are numbered differently
+            first = task_index - 1
+            if kind == Operation.TASK_MOVE:
+                first = min(first, value - 1)
+            self._lines = {i: line for i, line in self._lines.items()
+                           if i < first}
+        if self.notebook is not None:
+            self.notebook.notify(self, kind, task_index, value, previous)
 
     def __str__(self):
         """Print the list as numbered tasks, one per line
 
         Done tasks are greyed out.
         """
-        result = ""
-        for i in range(len(self._tasks)):
-            task = self._tasks[i]
-            if Config.get("print_done_tasks") == "no" and task.done:
-                continue
+        return self.print_range(1, len(self._tasks))
+
+    def print_range(self, first, count, done_style="yes"):
+        """Print a range of the list as numbered tasks, one per line
+
+        Printed lines are cached, and printed again only after their task
+        changes, or moves to a different index. Lines of done tasks are
+        also printed again for a different done style.
+
+        :param first: one-based index of the first task to print
+        :type first: int
+        :param count: Maximum number of tasks to print
+        :type count: int
+        :param done_style: How done tasks are shown, as in the
+        print_done_tasks setting: "yes", "no" or "hidden"
+        :type done_style: str, optional
+        :return: The printed tasks
+        :rtype: str
+        """
+        lines = self._lines
+        result = []
+        tasks = None  # Iterator over the tasks from index `pos`, if any
+        pos = None
+        last = min(first - 1 + count, len(self._tasks))
+        for i in range(max(first - 1, 0), last):
+            cached = lines.get(i)
+            if cached is None or cached[0] not in (None, done_style):
+                if pos != i:
+                    tasks = self._tasks.iter_from(i)
+                cached = self._print_line(i, next(tasks), done_style)
+                pos = i + 1
+            if cached[1] != "":
+                result.append(cached[1])
+
+        return "".join(result)
+
+    def _print_line(self, index, task, done_style):
+        """Print a single task, and cache the line
+
+        :param index: zero-based index of the task
+        :type index: int
+        :param task: The task
+        :type task: :class:`Task`
+        :param done_style: How done tasks are shown, see print_range()
+        :type done_style: str
+        :return: The cache entry of the line, a tuple of (done style it was
+        printed for, or None if it doesn't depend on it, printed line)
+        :rtype: tuple
+        """
+        line = ""
+        if not task.done or done_style != "no":
             color = ""
             if task.done:
                 color = Fore.LIGHTBLACK_EX
             elif task.prio:
                 color = Fore.LIGHTCYAN_EX
-            result += f"{color}#{i + 1} {task}{Style.RESET_ALL}\n"
-
-        return result
+            line = (f"{color}#{index + 1} {task.print(done_style)}"
+                    f"{Style.RESET_ALL}\n")
+        if len(self._lines) >= self.LINE_CACHE_SIZE:
+            self._lines.clear()
+        entry = (done_style if task.done else None, line)
+        self._lines[index] = entry
+        return entry
 
     def count_done(self):
         """Count how many tasks are done
@@ -95,7 +310,7 @@ class List(Sequence):
         :return: The number of tasks in the list that are done
         :rtype: int
         """
-        return reduce(lambda acc, t: acc + 1 if t.done else acc, self._tasks, 0)
+        return self.stats.done
 
     def data(self):
         """Return the dict representation of the list
@@ -118,5 +333,176 @@ class List(Sequence):
         :rtype: :class:`List`
         """
         result = List(data["name"])
-        result._tasks = [Task.from_data(task) for task in data["tasks"]]
+        result._loaded.extend(Task.from_data(task) for task in data["tasks"])
+        result._count_loaded()
+        return result
+
+    def encode_tasks(self):
+        """Return the binary representation of the list's tasks
+
+        Each task is stored as a varint holding the byte length of its body
+        shifted left by two bits, with the done and prio flags in the low
+        bits, followed by the UTF-8 body. If the tasks were never loaded,
+        the data they would be loaded from is returned as-is.
+
+        :return: Encoded tasks
+        :rtype: bytes
+        """
+        if self._source is not None:
+            data, start, end = self._source
+            return data[start:end]
+        out = bytearray()
+        for body, flags in self._tasks.iter_encoded():
+            header = len(body) << 2 | flags  # Flag bits match TaskStore
+            if header < 0x80:
+                out.append(header)
+            else:
+                write_varint(out, header)
+            out += body
+        return bytes(out)
+
+    @classmethod
+    def from_binary(cls, name, stats, data, start, end, lazy=False):
+        """Create a new list from binary representation of its tasks
+
+        :param name: Name of the list
+        :type name: str
+        :param stats: Tuple of (total, done, prio) task counts
+        :type stats: tuple
+        :param data: Buffer holding tasks encoded with encode_tasks()
+        :type data: bytes
+        :param start: Position of the first task in the buffer
+        :type start: int
+        :param end: Position after the last task in the buffer
+        :type end: int
+        :param lazy: Keep a reference to the data, and only decode
+        the tasks once they are accessed
+        :type lazy: bool, optional
+        :raises ValueError: The data is truncated
+        :return: A new list instance
+        :rtype: :class:`List`
+        """
+        if end > len(data):
+            raise ValueError("Unexpected end of binary data")
+        result = List(name)
+        result.stats.update(*stats)
+        result._source = (data, start, end)
+        if not lazy:
+            result.hydrate()
         return result
+
+    @classmethod
+    def read_binary(cls, data, pos):
+        """Create a new list from the binary representation of format
+        version 2, where each list's tasks follow its name and task count
+
+        :param data: Buffer holding the list
+        :type data: bytes
+        :param pos: Position of the list in the buffer
+        :type pos: int
+        :raises ValueError: The data is truncated
+        :return: Tuple of (new list instance, position after the list)
+        :rtype: tuple
+        """
+        name, pos = read_str(data, pos)
+        count, pos = read_varint(data, pos)
+        result = List(name)
+        pos = result._decode_tasks(data, pos, count)
+        result._count_loaded()
+        return result, pos
+
+    def copy(self):
+        """Return a copy of the list, which later changes of the list
+        don't affect
+
+        The copy doesn't belong to any notebook. If the tasks were never
+        loaded, the copy decodes them from the same data when accessed.
+
+        :return: The copy
+        :rtype: :class:`List`
+        """
+        result = List(self.name)
+        result.stats.update(self.stats.total, self.stats.done,
+                            self.stats.prio)
+        if self._source is not None:
+            result._source = self._source
+        else:
+            result._loaded = self._loaded.copy()
+        return result
+
+    def hydrate(self):
+        """Decode the tasks, if the list was loaded lazily
+
+        This happens automatically once the tasks are accessed.
+
+        :raises ValueError: The data is truncated
+        """
+        if self._source is None:
+            return
+        data, start, end = self._source
+        pos = self._decode_tasks(data, start, self.stats.total)
+        if pos != end:
+            self._loaded.clear()
+            raise ValueError("Binary data of the list has the wrong length")
+        self._source = None
+
+    def is_hydrated(self):
+        """Check whether the tasks were decoded
+
+        :return: `False` if the list was loaded lazily and not accessed yet
+        :rtype: bool
+        """
+        return self._source is None
+
+    @property
+    def _tasks(self):
+        """All tasks of the list, decoded on first access
+
+        :return: The tasks
+        :rtype: :class:`TaskStore`
+        """
+        if self._source is not None:
+            self.hydrate()
+        return self._loaded
+
+    def _count_loaded(self):
+        """Set the counters from the decoded tasks of a new list
+        """
+        self.stats.update(len(self._loaded),
+                          self._loaded.count(TaskStore.DONE),
+                          self._loaded.count(TaskStore.PRIO))
+
+    def _decode_tasks(self, data, pos, count):
+        """Decode tasks encoded with encode_tasks(), and add them to the list
+        without changing the counters
+
+        :param data: Buffer holding the tasks
+        :type data: bytes
+        :param pos: Position of the first task
+        :type pos: int
+        :param count: Number of tasks to decode
+        :type count: int
+        :raises ValueError: The data is truncated
+        :return: Position after the last task
+        :rtype: int
+        """
+        bodies = [None] * count
+        flags = bytearray(count)
+        size = len(data)
+        try:
+            for i in range(count):
+                header = data[pos]
+                if header < 0x80:
+                    pos += 1
+                else:
+                    header, pos = read_varint(data, pos)
+                end = pos + (header >> 2)
+                if end > size:
+                    raise IndexError
+                bodies[i] = data[pos:end]
+                flags[i] = header & 3
+                pos = end
+        except IndexError:
+            raise ValueError("Unexpected end of binary data")
+        self._loaded.extend_encoded(bodies, flags)
+        return pos
@@ -0,0 +1,293 @@
+import json
+import os
+
+from notebook import Notebook
+from operation import Operation
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Not available on Windows
+
+
+class LocalStorage:
+    """Keeps the notebook on the local disk, with a write-ahead journal
+
+    The directory is locked while it is used, so that two sessions never
+    write the same journal. The lock is released by close(), or when
+    the process ends. Systems without `fcntl`, like Windows, don't lock
+    the directory.
+
+    Once a notebook is tracked, each change is appended to a journal file
+    as a line of JSON holding a sequence number and the operation.
+    Changes are buffered, and written with a single `fsync` by flush().
+    Every few hundred task changes, or once the journal holds as many task
+    changes as the notebook has tasks, the notebook is written as a binary
+    snapshot, which remembers the sequence number of the last change it
+    includes, and the journal is started over. Large imports thus take
+    a snapshot only each time the notebook has doubled. Loading replays
+    the changes in the journal that are newer than the snapshot. A change
+    cut short by a crash is dropped.
+
+    :param directory: Directory holding the files
+    :type directory: str
+    :raises LocalStorage.LockedError: Another session uses the directory
+    :raises RuntimeError: Any failure to create or lock the directory
+    """
+
+    class LockedError(RuntimeError):
+        """The directory is used by another session
+        """
+
+    SNAPSHOT_PATH = "/snapshot.bin"  # Notebook as of the last snapshot
+    SETTINGS_PATH = "/settings.json"  # Settings of the app
+    JOURNAL_NAME = "journal.log"  # Changes made after the last snapshot
+    LOCK_NAME = "lock"  # File locked while a session uses the directory
+    DIRECTORY_ENV = "LISTS_HOME"  # Environment variable with the directory
+    SNAPSHOT_EVERY = 500  # Number of journaled changes before a snapshot
+
+    def __init__(self, directory):
+        """Constructor method
+        """
+        self.directory = directory
+        self._notebook = None  # The notebook being journaled
+        self._buffer = []  # Journal lines not written yet
+        self._buffered = 0  # Number of task changes in _buffer
+        self._seq = 0  # Sequence number of the last journaled change
+        self._journaled = 0  # Changes written since the last snapshot
+        self._lock = None  # Open lock file, while the directory is locked
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self._lock = open(os.path.join(directory, self.LOCK_NAME), "ab")
+            if fcntl is not None:
+                fcntl.flock(self._lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.close()
+            raise self.LockedError(
+                f"Lists in {directory} are open in another session")
+        except OSError as e:
+            self.close()
+            raise RuntimeError(f"Failed to open lists on disk: {e}")
+
+    @classmethod
+    def default_directory(cls):
+        """Return the directory to keep lists in
+
+        This is the value of the LISTS_HOME environment variable, or
+        the ".lists" folder in the user's home directory if it's not set.
+
+        :return: Path of the directory, or `None` if LISTS_HOME is set but
+        empty, which disables local storage
+        :rtype: str
+        """
+        directory = os.environ.get(cls.DIRECTORY_ENV)
+        if directory is None:
+            return os.path.join(os.path.expanduser("~"), ".lists")
+        if directory == "":
+            return None
+        return directory
+
+    def close(self):
+        """Release the lock on the directory
+        """
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+    def download(self, path):
+        """Read a file
+
+        :param path: File to read, like SNAPSHOT_PATH
+        :type path: str
+        :return: Contents of the file
+        :rtype: bytes
+        :raises RuntimeError: Any failure to read the data
+        """
+        try:
+            with open(self._local_path(path), "rb") as file:
+                return file.read()
+        except OSError as e:
+            raise RuntimeError(f"Failed to read data from disk: {e}")
+
+    def upload(self, data, path):
+        """Write a file, replacing previous data
+
+        The data is written to a temporary file first, which then replaces
+        the previous file, so the file is never left half written.
+
+        :param data: Data to store, text is stored as UTF-8
+        :type data: str or bytes
+        :param path: File to write, like SNAPSHOT_PATH
+        :type path: str
+        :raises RuntimeError: Any failure to write the data
+        """
+        if isinstance(data, str):
+            data = data.encode()
+        local_path = self._local_path(path)
+        try:
+            with open(local_path + ".tmp", "wb") as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(local_path + ".tmp", local_path)
+        except OSError as e:
+            raise RuntimeError(f"Failed to write data to disk: {e}")
+
+    def load_settings(self):
+        """Read the stored settings
+
+        :return: Dict of setting name -> value, as returned by
+        :meth:`Config.data`, empty if no settings were stored, or they
+        can't be read
+        :rtype: dict
+        """
+        try:
+            data = json.loads(self.download(self.SETTINGS_PATH))
+        except (RuntimeError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def save_settings(self, data):
+        """Store the settings
+
+        :param data: Dict of setting name -> value
+        :type data: dict
+        :raises RuntimeError: Any failure to write the data
+        """
+        self.upload(json.dumps(data), self.SETTINGS_PATH)
+
+    def has_notebook(self):
+        """Check whether a notebook was stored in the directory before
+
+        :return: `True` if there is a notebook to load
+        :rtype: bool
+        """
+        return os.path.exists(self._local_path(self.SNAPSHOT_PATH))
+
+    def load(self):
+        """Read the notebook from disk, and start journaling its changes
+
+        :return: The notebook as of the last flush
+        :rtype: :class:`Notebook`
+        :raises RuntimeError: Any failure to read the data
+        :raises ValueError: The snapshot is damaged
+        """
+        notebook = Notebook.load(self.download(self.SNAPSHOT_PATH), lazy=True)
+        seq = notebook.properties.get("journal_seq", 0)
+        journal_path = self._local_path(self.JOURNAL_NAME)
+        valid_length = 0
+        count = 0
+        try:
+            with open(journal_path, "rb") as file:
+                for line in file:
+                    try:
+                        line_seq, operation = json.loads(line)
+                    except ValueError:
+                        break  # Cut short by a crash, nothing follows
+                    if line_seq > seq:
+                        operation = Operation.from_data(operation)
+                        notebook.apply(operation)
+                        seq = line_seq
+                        count += operation.size()
+                    valid_length += len(line)
+            if valid_length < os.path.getsize(journal_path):
+                os.truncate(journal_path, valid_length)
+        except FileNotFoundError:
+            pass  # Nothing changed since the snapshot
+        except OSError as e:
+            raise RuntimeError(f"Failed to read data from disk: {e}")
+
+        self._attach(notebook)
+        self._seq = seq
+        self._journaled = count
+        return notebook
+
+    def track(self, notebook):
+        """Start journaling the changes made to a notebook
+
+        The notebook replaces whatever was stored before, and is written
+        as a new snapshot right away.
+
+        :param notebook: The notebook to journal
+        :type notebook: :class:`Notebook`
+        :raises RuntimeError: Any failure to write the data
+        """
+        self._attach(notebook)
+        self.snapshot()
+
+    def flush(self):
+        """Write the buffered changes to the journal, and wait until they
+        reach the disk
+
+        A snapshot is taken instead, once enough changes were journaled.
+
+        :raises RuntimeError: Any failure to write the data
+        """
+        if len(self._buffer) == 0:
+            return
+        limit = max(self.SNAPSHOT_EVERY, self._notebook.stats.total)
+        if self._journaled + self._buffered >= limit:
+            self.snapshot()
+            return
+        try:
+            with open(self._local_path(self.JOURNAL_NAME), "ab") as file:
+                file.write("".join(self._buffer).encode())
+                file.flush()
+                os.fsync(file.fileno())
+        except OSError as e:
+            raise RuntimeError(f"Failed to write data to disk: {e}")
+        self._journaled += self._buffered
+        self._buffer = []
+        self._buffered = 0
+
+    def snapshot(self):
+        """Write the whole notebook, and start the journal over
+
+        :raises RuntimeError: Any failure to write the data
+        """
+        self._notebook.properties["journal_seq"] = self._seq
+        self.upload(self._notebook.encode(), self.SNAPSHOT_PATH)
+        # A crash before the journal is emptied is harmless, as the snapshot
+        # tells which changes it already includes
+        try:
+            with open(self._local_path(self.JOURNAL_NAME), "wb") as file:
+                os.fsync(file.fileno())
+        except OSError as e:
+            raise RuntimeError(f"Failed to write data to disk: {e}")
+        self._journaled = 0
+        self._buffer = []
+        self._buffered = 0
+
+    def _attach(self, notebook):
+        """Move the journal listener to a notebook
+
+        :param notebook: The notebook to journal
+        :type notebook: :class:`Notebook`
+        """
+        if self._notebook is not None:
+            self._notebook.listeners.remove(self._record)
+        self._notebook = notebook
+        notebook.listeners.append(self._record)
+        self._buffer = []
+        self._buffered = 0
+
+    def _record(self, operation):
+        """Buffer a change until the next flush
+
+        :param operation: The change made to the notebook
+        :type operation: :class:`Operation`
+        """
+        self._seq += 1
+        self._buffered += operation.size()
+        self._buffer.append(
+            json.dumps([self._seq, operation.data()]) + "\n")
+
+    def _local_path(self, path):
+        """Translate a storage path to a path on disk
+
+        :param path: Path within the directory, like SNAPSHOT_PATH
+        :type path: str
+        :return: Path of the file within the directory
+        :rtype: str
+        """
+        return os.path.join(self.directory, *path.strip("/").split("/"))
@@ -0,0 +1,456 @@
+from collections import namedtuple
+from difflib import SequenceMatcher
+
+from list import List
+from notebook import Notebook
+from task import Task
+
+# A part of three versions of a sequence, as slices of each. In a stable
+# region, all three hold the same items.
+Region = namedtuple("Region", ["stable", "base", "local", "remote"])
+
+
+def merge(base, local, remote):
+    """Merge the changes made to two copies of a notebook
+
+    Lists are matched by name, and by their order among lists of the same
+    name, and tasks by their contents. Changes made on one side only are
+    kept. Where both sides changed the same part of a list, tasks changed
+    or added by either are kept, and flags of a task are merged with each
+    other. A task renamed differently on each side
+    is kept in both versions, and a list renamed differently keeps
+    the local name. A list or task removed on one side, but changed on
+    the other, is kept.
+
+    :param base: The notebook both copies started from
+    :type base: :class:`Notebook`
+    :param local: The copy changed locally
+    :type local: :class:`Notebook`
+    :param remote: The copy changed by someone else
+    :type remote: :class:`Notebook`
+    :raises RuntimeError: The merged notebook would have too many lists
+    :return: The merged lists, as (name, tasks) tuples, with every task as
+    a (body, done, prio) tuple
+    :rtype: list
+    """
+    base, local, remote = map(contents, (base, local, remote))
+    if remote == base:
+        return local
+    if local == base:
+        return remote
+    result = []
+    for region in diff3(*([name for name, _ in lists]
+                          for lists in (base, local, remote))):
+        if region.stable:
+            for (_, b), (name, lt), (_, r) in zip(base[region.base],
+                                                  local[region.local],
+                                                  remote[region.remote]):
+                result.append((name, merge_tasks(b, lt, r)))
+        else:
+            result += _resolve_lists(base[region.base], local[region.local],
+                                     remote[region.remote])
+    if len(result) > Notebook.MAX_LISTS:
+        raise RuntimeError(
+            f"Lists saved by another session can't be merged, as there "
+            f"would be more than {Notebook.MAX_LISTS} lists. Remove some "
+            f"lists, and save again.")
+    return result
+
+
+def merge_tasks(base, local, remote):
+    """Merge the changes made to two copies of a list's tasks
+
+    :param base: Tasks both copies started from
+    :type base: list
+    :param local: Tasks changed locally
+    :type local: list
+    :param remote: Tasks changed by someone else
+    :type remote: list
+    :return: The merged tasks
+    :rtype: list
+    """
+    if local == remote or remote == base:
+        return local
+    if local == base:
+        return remote
+    result = []
+    for region in diff3(base, local, remote):
+        if region.stable:
+            result += local[region.local]
+        else:
+            result += _resolve_tasks(base[region.base], local[region.local],
+                                     remote[region.remote])
+    return result
+
+
+def contents(notebook):
+    """Return the contents of a notebook, for comparing with others
+
+    :param notebook: The notebook
+    :type notebook: :class:`Notebook`
+    :return: The lists, as (name, tasks) tuples, with every task as
+    a (body, done, prio) tuple
+    :rtype: list
+    """
+    return [(lst.name, [(task.body, task.done, task.prio) for task in lst])
+            for lst in notebook]
+
+
+def reconcile(notebook, target):
+    """Change a notebook to hold the provided lists
+
+    Only what differs is changed, through the methods of the notebook and
+    its lists, so its listeners see every change.
+
+    :param notebook: The notebook to change
+    :type notebook: :class:`Notebook`
+    :param target: The lists, as returned by merge()
+    :type target: list
+    """
+    opcodes = _opcodes([lst.name for lst in notebook],
+                       [name for name, _ in target])
+    # Lists are removed first, from the end, so the notebook never holds
+    # more lists than it may, and then inserted from the start
+    for tag, i1, i2, j1, j2 in reversed(opcodes):
+        if tag == "equal" or (tag == "replace" and i2 - i1 == j2 - j1):
+            for offset in range(i2 - i1):
+                index = i1 + offset + 1
+                name, tasks = target[j1 + offset]
+                if notebook[index].name != name:
+                    notebook.rename(index, name)
+                _reconcile_tasks(notebook[index], tasks)
+        else:
+            for index in range(i2, i1, -1):
+                notebook.remove(index)
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal" or (tag == "replace" and i2 - i1 == j2 - j1):
+            continue
+        for index in range(j1, j2):
+            name, tasks = target[index]
+            new_list = List(name)
+            new_list.extend([Task(*task) for task in tasks])
+            notebook.insert(index + 1, new_list)
+
+
+def _reconcile_tasks(lst, target):
+    """Change a list to hold the provided tasks
+
+    :param lst: The list to change
+    :type lst: :class:`List`
+    :param target: The tasks, as (body, done, prio) tuples
+    :type target: list
+    """
+    current = [(task.body, task.done, task.prio) for task in lst]
+    if current == target:
+        return
+    # Changed from the end, so the indices of earlier tasks stay valid
+    for tag, i1, i2, j1, j2 in reversed(_opcodes(current, target)):
+        if tag == "equal":
+            continue
+        if tag == "replace" and i2 - i1 == j2 - j1:
+            for offset in range(i2 - i1):
+                index = i1 + offset + 1
+                body, done, prio = current[i1 + offset]
+                new_body, new_done, new_prio = target[j1 + offset]
+                if body != new_body:
+                    lst.set_body(index, new_body)
+                if done != new_done:
+                    lst.set_done(index, new_done)
+                if prio != new_prio:
+                    lst.set_prio(index, new_prio)
+            continue
+        for index in range(i2, i1, -1):
+            lst.remove(index)
+        new_tasks = [Task(*task) for task in target[j1:j2]]
+        if i1 == len(lst):
+            lst.extend(new_tasks)
+        else:
+            for offset, task in enumerate(new_tasks):
+                lst.insert(i1 + offset + 1, task)
+
+
+def diff3(base, local, remote):
+    """Split three versions of a sequence into stable regions, where all
+    versions hold the same items, and the regions between them
+
+    :param base: The version both others started from
+    :type base: list
+    :param local: A changed version
+    :type local: list
+    :param remote: Another changed version
+    :type remote: list
+    :return: The regions, in order
+    :rtype: list
+    """
+    regions = []
+    i = j = k = 0
+    for b, lt, r, size in _stable_runs(_matching_blocks(base, local),
+                                       _matching_blocks(base, remote)):
+        if (i, j, k) != (b, lt, r):
+            regions.append(Region(False, slice(i, b), slice(j, lt),
+                                  slice(k, r)))
+        regions.append(Region(True, slice(b, b + size), slice(lt, lt + size),
+                              slice(r, r + size)))
+        i, j, k = b + size, lt + size, r + size
+    if (i, j, k) != (len(base), len(local), len(remote)):
+        regions.append(Region(False, slice(i, None), slice(j, None),
+                              slice(k, None)))
+    return regions
+
+
+def _resolve_lists(base, local, remote):
+    """Merge lists in a part of the notebook changed on both sides
+
+    :param base: Lists both sides started from, as (name, tasks) tuples
+    :type base: list
+    :param local: Lists changed locally
+    :type local: list
+    :param remote: Lists changed by someone else
+    :type remote: list
+    :return: The merged lists
+    :rtype: list
+    """
+    if local == remote:  # Changed the same way on both sides
+        return local
+    if (len(base) == len(local) == len(remote) and _aligned(base, local)
+            and _aligned(base, remote)):  # Renamed in place
+        return [(_pick(b[0], lt[0], r[0]), merge_tasks(b[1], lt[1], r[1]))
+                for b, lt, r in zip(base, local, remote)]
+
+    base_tasks = _by_occurrence(base)
+    local_tasks = _by_occurrence(local)
+    remote_tasks = _by_occurrence(remote)
+    first, second = local_tasks, remote_tasks
+    if _moved(base, remote) and not _moved(base, local):
+        first, second = second, first  # Keep the order of the only move
+    result = []
+    for key, tasks in first.items():
+        if key in second:  # Kept, or added on both sides
+            result.append((key[0], merge_tasks(base_tasks.get(key, []),
+                                               local_tasks[key],
+                                               remote_tasks[key])))
+        elif key not in base_tasks or tasks != base_tasks[key]:
+            result.append((key[0], tasks))  # Added, or changed but removed
+    for key, tasks in second.items():
+        if key in first:
+            continue
+        if key not in base_tasks or tasks != base_tasks[key]:
+            result.append((key[0], tasks))
+    return result
+
+
+def _by_occurrence(lists):
+    """Key lists by their name, and how many lists of that name precede
+    them, so that lists sharing a name are told apart
+
+    :param lists: Lists as (name, tasks) tuples
+    :type lists: list
+    :return: Dict of (name, occurrence) -> tasks, in the order of lists
+    :rtype: dict
+    """
+    seen = {}  # Name -> number of lists of that name so far
+    result = {}
+    for name, tasks in lists:
+        occurrence = seen.get(name, 0)
+        seen[name] = occurrence + 1
+        result[name, occurrence] = tasks
+    return result
+
+
+def _resolve_tasks(base, local, remote):
+    """Merge tasks in a part of a list changed on both sides
+
+    Tasks are paired up by position if neither side moved any, and
+    otherwise by body, so that changes of their flags can be merged.
+    If only one side moved tasks, its order is kept.
+
+    :param base: Tasks both sides started from
+    :type base: list
+    :param local: Tasks changed locally
+    :type local: list
+    :param remote: Tasks changed by someone else
+    :type remote: list
+    :return: The merged tasks
+    :rtype: list
+    """
+    if local == remote:  # Changed the same way on both sides
+        return local
+    if (len(base) == len(local) == len(remote) and _aligned(base, local)
+            and _aligned(base, remote)):  # Changed in place
+        result = []
+        for b, lt, r in zip(base, local, remote):
+            if lt[0] != b[0] and r[0] != b[0] and lt[0] != r[0]:
+                result += [lt, r]  # Renamed differently, keep both
+            else:
+                result.append(tuple(map(_pick, b, lt, r)))
+        return result
+
+    local_first = not (_moved(base, remote) and not _moved(base, local))
+    # The order of the side that moved tasks is kept, or else the local one
+    first, second = (local, remote) if local_first else (remote, local)
+    first_base = _pair_by_body(base, first)
+    second_base = _pair_by_body(base, second)
+    base_second = {b: i for i, b in second_base.items()}
+    kept = set()  # Base tasks kept on the first side
+    result = []
+    for i, task in enumerate(first):
+        b = first_base.get(i)
+        if b is None:  # Added on the first side
+            result.append(task)
+        elif b in base_second:
+            kept.add(b)
+            other = second[base_second[b]]
+            lt, r = (task, other) if local_first else (other, task)
+            result.append(tuple(map(_pick, base[b], lt, r)))
+        elif task != base[b]:  # Changed on the first side, removed
+            result.append(task)
+    for i, task in enumerate(second):
+        b = second_base.get(i)
+        if b is None or (b not in kept and task != base[b]):
+            result.append(task)  # Added, or changed but removed
+    return result
+
+
+def _aligned(base, other):
+    """Check whether every item of a version that has the same first field,
+    the body of a task or the name of a list, as an item of another, is
+    at the same position, so that items can be paired up by position
+
+    :param base: Items of one version
+    :type base: list
+    :param other: Items of the other
+    :type other: list
+    :return: `True` if no paired item was moved
+    :rtype: bool
+    """
+    return all(i == b for i, b in _pair_by_body(base, other).items())
+
+
+def _moved(base, other):
+    """Check whether items of a version that have the same first field as
+    an item of another are in a different order
+
+    :param base: Items of one version
+    :type base: list
+    :param other: Items of the other
+    :type other: list
+    :return: `True` if any paired item was moved
+    :rtype: bool
+    """
+    indices = list(_pair_by_body(base, other).values())
+    return indices != sorted(indices)
+
+
+def _pair_by_body(base, other):
+    """Pair up tasks of two versions that have the same body
+
+    :param base: Tasks of one version
+    :type base: list
+    :param other: Tasks of the other
+    :type other: list
+    :return: Dict of index in other -> index in base
+    :rtype: dict
+    """
+    unpaired = {}  # Body -> indices in base not paired yet
+    for i, task in enumerate(base):
+        unpaired.setdefault(task[0], []).append(i)
+    pairs = {}
+    for i, task in enumerate(other):
+        indices = unpaired.get(task[0])
+        if indices:
+            pairs[i] = indices.pop(0)
+    return pairs
+
+
+def _pick(base, local, remote):
+    """Merge a single value
+
+    :return: The remote value if only it was changed, or the local one
+    """
+    return remote if local == base else local
+
+
+def _matching_blocks(a, b):
+    """Find the matching runs of items of two sequences
+
+    Common items at the start and end are matched right away, so only
+    the part between them is compared item by item.
+
+    :param a: A sequence
+    :type a: list
+    :param b: Another sequence
+    :type b: list
+    :return: (start in a, start in b, length) of every run, in order
+    :rtype: list
+    """
+    size = min(len(a), len(b))
+    start = 0
+    while start < size and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < size - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    matcher = SequenceMatcher(None, a[start:len(a) - end],
+                              b[start:len(b) - end], autojunk=False)
+    blocks = [(start + i, start + j, n)
+              for i, j, n in matcher.get_matching_blocks() if n > 0]
+    if start > 0:
+        blocks.insert(0, (0, 0, start))
+    if end > 0:
+        blocks.append((len(a) - end, len(b) - end, end))
+    return blocks
+
+
+def _opcodes(a, b):
+    """Find how to change one sequence into another
+
+    :param a: The sequence to change
+    :type a: list
+    :param b: The sequence to change it into
+    :type b: list
+    :return: Opcodes as returned by SequenceMatcher.get_opcodes()
+    :rtype: list
+    """
+    opcodes = []
+    i = j = 0
+    end = (len(a), len(b), 0)
+    for a_start, b_start, size in _matching_blocks(a, b) + [end]:
+        if i < a_start and j < b_start:
+            opcodes.append(("replace", i, a_start, j, b_start))
+        elif i < a_start:
+            opcodes.append(("delete", i, a_start, j, b_start))
+        elif j < b_start:
+            opcodes.append(("insert", i, a_start, j, b_start))
+        if size > 0:
+            opcodes.append(("equal", a_start, a_start + size,
+                            b_start, b_start + size))
+        i, j = a_start + size, b_start + size
+    return opcodes
+
+
+def _stable_runs(local_blocks, remote_blocks):
+    """Find the runs of base items matched on both sides
+
+    :param local_blocks: Matching blocks of the base and local versions
+    :type local_blocks: list
+    :param remote_blocks: Matching blocks of the base and remote versions
+    :type remote_blocks: list
+    :return: (start in base, start in local, start in remote, length)
+    of every run, in order
+    :rtype: list
+    """
+    runs = []
+    i = j = 0
+    while i < len(local_blocks) and j < len(remote_blocks):
+        base_l, start_l, size_l = local_blocks[i]
+        base_r, start_r, size_r = remote_blocks[j]
+        first = max(base_l, base_r)
+        last = min(base_l + size_l, base_r + size_r)
+        if first < last:
+            runs.append((first, start_l + first - base_l,
+                         start_r + first - base_r, last - first))
+        if base_l + size_l < base_r + size_r:
+            i += 1
+        else:
+            j += 1
+    return runs
@@ -0,0 +1,321 @@
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+
+class Histogram:
+    """Distribution of recorded values, in buckets of powers of two
+
+    Values are counted in the bucket of their bit length, so a histogram
+    holds at most a few dozen counters however many values are recorded.
+    Percentiles are estimated as the upper bound of their bucket, which is
+    at most twice the actual value.
+    """
+
+    def __init__(self):
+        """Constructor method
+        """
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = []  # Bit length -> number of values
+
+    def add(self, value):
+        """Record a value
+
+        :param value: The value, rounded down to an integer
+        :type value: int
+        """
+        value = max(int(value), 0)
+        bucket = value.bit_length()
+        if bucket >= len(self.buckets):
+            self.buckets.extend([0] * (bucket + 1 - len(self.buckets)))
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        """Add the values recorded by another histogram
+
+        :param other: The other histogram
+        :type other: :class:`Histogram`
+        """
+        if len(other.buckets) > len(self.buckets):
+            self.buckets.extend([0] * (len(other.buckets) - len(self.buckets)))
+        for bucket, count in enumerate(other.buckets):
+            self.buckets[bucket] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, fraction):
+        """Estimate the value that the provided fraction of values are at
+        or below
+
+        :param fraction: The fraction, between 0 and 1
+        :type fraction: float
+        :return: Upper bound of the bucket holding the percentile, or 0 if
+        nothing was recorded
+        :rtype: int
+        """
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count > 0 and seen >= fraction * self.count:
+                return min((1 << bucket) - 1, self.max)
+        return 0
+
+    def data(self):
+        """Return a dict representation of the histogram
+
+        :return: A dictionary with the count, total, max and estimated
+        percentiles of the values, and the bucket counts
+        :rtype: dict
+        """
+        return {
+            "count": self.count,
+            "total": self.total,
+            "max": self.max,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+            "buckets": self.buckets
+        }
+
+
+class Metrics:
+    """Latency and size histograms of a single session
+
+    Recording is off by default. While off, measure() returns a shared
+    context manager that does nothing, and record_size() returns right away,
+    so instrumented code costs about as much as a function call. Latencies
+    are recorded in microseconds, sizes in bytes. Values may be recorded
+    from any thread.
+    """
+
+    DUMP_ENV = "LISTS_STATS"  # Environment variable with the dump path
+
+    _OFF = nullcontext()  # Returned by measure() while recording is off
+
+    def __init__(self):
+        """Constructor method
+        """
+        self.enabled = False  # Whether values are recorded
+        self.latencies = {}  # Name -> :class:`Histogram` of microseconds
+        self.sizes = {}  # Name -> :class:`Histogram` of bytes
+        self._lock = threading.Lock()
+
+    @classmethod
+    def dump_path(cls):
+        """Return the file to write the recorded values to on exit
+
+        This is the value of the LISTS_STATS environment variable.
+
+        :return: Path of the file, or `None` if the variable is not set
+        or empty
+        :rtype: str
+        """
+        return os.environ.get(cls.DUMP_ENV) or None
+
+    def measure(self, name):
+        """Return a context manager recording how long its block takes
+
+        :param name: Name of the latency histogram
+        :type name: str
+        :return: The context manager
+        :rtype: contextlib.AbstractContextManager
+        """
+        if not self.enabled:
+            return self._OFF
+        return _Timer(self, name)
+
+    def record_latency(self, name, seconds):
+        """Record a latency
+
+        :param name: Name of the latency histogram
+        :type name: str
+        :param seconds: The latency
+        :type seconds: float
+        """
+        self._add(self.latencies, name, seconds * 1e6)
+
+    def record_size(self, name, size):
+        """Record a size, if recording is on
+
+        :param name: Name of the size histogram
+        :type name: str
+        :param size: The size in bytes
+        :type size: int
+        """
+        if self.enabled:
+            self._add(self.sizes, name, size)
+
+    def reset(self):
+        """Forget all recorded values
+        """
+        with self._lock:
+            self.latencies = {}
+            self.sizes = {}
+
+    def data(self):
+        """Return a dict representation of the recorded values
+
+        :return: A dictionary with "latency_us" and "size_bytes" dicts,
+        each of name -> histogram data
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                "latency_us": {name: histogram.data() for name, histogram
+                               in sorted(self.latencies.items())},
+                "size_bytes": {name: histogram.data() for name, histogram
+                               in sorted(self.sizes.items())}
+            }
+
+    def dump(self, path):
+        """Write the recorded values to a JSON file
+
+        :param path: Path of the file
+        :type path: str
+        :raises RuntimeError: Any failure to write the file
+        """
+        try:
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump(self.data(), file, indent=2)
+                file.write("\n")
+        except OSError as e:
+            raise RuntimeError(f"Failed to write stats: {e}")
+
+    def print(self):
+        """Return the recorded values as human-readable lines
+
+        :return: One line per histogram, with the number of values,
+        the estimated percentiles, the max and the total, followed by
+        the compression ratio and throughput of transfers
+        :rtype: list
+        """
+        with self._lock:
+            return (self._table("latency (ms)", self.latencies, 1e3) + [""] +
+                    self._table("size (KB)", self.sizes, 1024) + [""] +
+                    self._transfers())
+
+    def pages(self, rows):
+        """Return the recorded values as pages of human-readable lines
+
+        There is a page per table. Tables longer than a page show the
+        histograms with the largest totals, and a last "(other)" line
+        with the rest of the values.
+
+        :param rows: Max number of lines of a page
+        :type rows: int
+        :return: List of pages, each a list of lines
+        :rtype: list
+        """
+        with self._lock:
+            return [self._table("latency (ms)", self.latencies, 1e3, rows),
+                    self._table("size (KB)", self.sizes, 1024, rows),
+                    self._transfers()]
+
+    def _transfers(self):
+        """Print the compression ratio and throughput of transfers
+
+        A transfer is a size histogram of the data, with a latency
+        histogram of the same name, and a size histogram of the bytes
+        actually sent or received, named after it with ".wire" added.
+        Must be called while holding the lock.
+
+        :return: Header line, followed by a line per transfer
+        :rtype: list
+        """
+        lines = [f"{'transfer':<24}{'count':>8}{'ratio':>9}{'MB/s':>9}"
+                 f"{'wire MB/s':>11}"]
+        for name, wire in sorted(self.sizes.items()):
+            if not name.endswith(".wire"):
+                continue
+            name = name[:-len(".wire")]
+            data = self.sizes.get(name)
+            latency = self.latencies.get(name)
+            if data is None or latency is None or data.total == 0:
+                continue
+            seconds = max(latency.total, 1) / 1e6
+            lines.append(f"{name:<24}{wire.count:>8}"
+                         f"{wire.total / data.total:>9.2f}"
+                         f"{data.total / seconds / 1e6:>9.2f}"
+                         f"{wire.total / seconds / 1e6:>11.2f}")
+        return lines
+
+    @staticmethod
+    def _table(title, histograms, scale, rows=None):
+        """Print histograms as the lines of a table
+
+        :param title: Title of the name column
+        :type title: str
+        :param histograms: Dict of name -> :class:`Histogram`
+        :type histograms: dict
+        :param scale: Recorded units per shown unit
+        :type scale: float
+        :param rows: Max number of lines, or `None` for a line per histogram
+        :type rows: int, optional
+        :return: Header line, followed by a line per histogram
+        :rtype: list
+        """
+        lines = [f"{title:<24}{'count':>8}{'p50':>9}{'p90':>9}{'p99':>9}"
+                 f"{'max':>9}{'total':>9}"]
+        items = sorted(histograms.items())
+        if rows is not None and len(items) > rows - 1:
+            # Keep the largest totals, and merge the rest into one line
+            items.sort(key=lambda item: item[1].total, reverse=True)
+            other = Histogram()
+            for _, histogram in items[rows - 2:]:
+                other.merge(histogram)
+            items = sorted(items[:rows - 2]) + [("(other)", other)]
+        for name, histogram in items:
+            values = [histogram.percentile(0.5), histogram.percentile(0.9),
+                      histogram.percentile(0.99), histogram.max,
+                      histogram.total]
+            lines.append(f"{name:<24}{histogram.count:>8}" +
+                         "".join(f"{value / scale:>9.2f}" for value in values))
+        return lines
+
+    def _add(self, histograms, name, value):
+        """Add a value to a histogram, creating it if needed
+
+        :param histograms: Dict of name -> :class:`Histogram`
+        :type histograms: dict
+        :param name: Name of the histogram
+        :type name: str
+        :param value: The value
+        :type value: float
+        """
+        with self._lock:
+            histogram = histograms.get(name)
+            if histogram is None:
+                histogram = histograms[name] = Histogram()
+            histogram.add(value)
+
+
+class _Timer:
+    """Context manager recording the time taken by its block, see
+    :meth:`Metrics.measure`
+    """
+
+    __slots__ = ("_metrics", "_name", "_start")
+
+    def __init__(self, metrics, name):
+        """Constructor method
+        """
+        self._metrics = metrics
+        self._name = name
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        self._metrics.record_latency(self._name,
+                                     time.perf_counter() - self._start)
+        return False
@@ -1,20 +1,36 @@
 import json
 from collections.abc import Sequence
 
+from binary import read_str, read_varint, write_str, write_varint
 from list import List
+from operation import Operation
+from stats import TaskStats
+from task import Task
 
 
 class Notebook(Sequence):
     """Container class for all lists owned by the user
+
+    Every change made to the notebook or its lists is passed on
+    as an :class:`Operation` to the functions in `listeners`.
+
+    The notebook can be stored as JSON, or in a compact binary format.
+    Both keep any values stored in `properties` along with the lists.
     """
 
-    DATA_VERSION = 1
+    DATA_VERSION = 1  # JSON format
+    BINARY_VERSION = 3  # Binary format
+    BINARY_READABLE = (2, 3)  # Binary format versions that can be loaded
+    BINARY_MAGIC = b"LSTB"  # Start of binary data, followed by the version
     MAX_LISTS = 19  # Max number of lists before layout overflow
 
     def __init__(self):
         """Constructor method
         """
         self._lists = []
+        self.stats = TaskStats()  # Task counts across all lists
+        self.listeners = []  # Functions called with every Operation
+        self.properties = {}  # Additional values saved with the notebook
 
     def __getitem__(self, index):
         """Retrieve a list at the provided index
@@ -26,10 +42,17 @@ class Notebook(Sequence):
         :rtype: :class:`List`
         """
         try:
+            if index < 1:
+                raise IndexError
             return self._lists[index - 1]
         except IndexError:
             raise IndexError(f"There is no list with index {index}")
 
+    def __iter__(self):
+        """Iterate over all lists in order
+        """
+        return iter(self._lists)
+
     def __len__(self):
         """Return the number of lists
 
@@ -48,6 +71,33 @@ class Notebook(Sequence):
         if len(self._lists) >= self.MAX_LISTS:
             raise RuntimeError("Reached the maximum allowed number of lists")
         self._lists.append(new_list)
+        new_list.stats.attach(self.stats)
+        new_list.notebook = self
+        if len(self.listeners) > 0:
+            self.notify(new_list, Operation.LIST_ADD, value=new_list.data())
+
+    def insert(self, index, new_list):
+        """Insert a list at the provided position
+
+        Lists at and after the position are shifted by one.
+
+        :param index: one-based index the new list will have
+        :type index: int
+        :param new_list: The list instance to insert
+        :type new_list: :class:`List`
+        :raises IndexError: Index is out of bounds
+        :raises RuntimeError: Too many lists
+        """
+        if len(self._lists) >= self.MAX_LISTS:
+            raise RuntimeError("Reached the maximum allowed number of lists")
+        if not 1 <= index <= len(self._lists) + 1:
+            raise IndexError(f"Cannot insert a list at index {index}")
+        self._lists.insert(index - 1, new_list)
+        new_list.stats.attach(self.stats)
+        new_list.notebook = self
+        if len(self.listeners) > 0:
+            self.notify(new_list, Operation.LIST_INSERT,
+                        value=new_list.data())
 
     def remove(self, index):
         """Remove the list under given index from the notebook
@@ -58,31 +108,113 @@ class Notebook(Sequence):
         :return: The removed list
         :rtype: :class:`List`
         """
-        try:
-            return self._lists.pop(index - 1)
-        except IndexError:
-            raise IndexError(f"There is no list with index {index}")
+        removed_list = self[index]
+        self.notify(removed_list, Operation.LIST_REMOVE,
+                    previous=removed_list)
+        self._lists.pop(index - 1)
+        removed_list.stats.detach()
+        removed_list.notebook = None
+        return removed_list
+
+    def rename(self, index, name):
+        """Change the name of the list under given index
+
+        :param index: one-based index of the list
+        :type index: int
+        :param name: The new name
+        :type name: str
+        :raises IndexError: Index is out of bounds
+        :return: The renamed list
+        :rtype: :class:`List`
+        """
+        renamed_list = self[index]
+        previous = renamed_list.name
+        renamed_list.name = name
+        self.notify(renamed_list, Operation.LIST_RENAME, value=name,
+                    previous=previous)
+        return renamed_list
+
+    def notify(self, lst, kind, task_index=None, value=None, previous=None):
+        """Pass a change of the notebook to all listeners
+
+        :param lst: The list that was changed
+        :type lst: :class:`List`
+        :param kind: Kind of the change, see :class:`Operation`
+        :type kind: str
+        :param task_index: Index of the affected task, if any
+        :type task_index: int, optional
+        :param value: New value set by the change, if any
+        :param previous: Value replaced or removed by the change, if any
+        """
+        if len(self.listeners) == 0:
+            return
+        list_index = self._lists.index(lst) + 1
+        operation = Operation(kind, list_index, task_index, value, previous)
+        for listener in self.listeners:
+            listener(operation)
+
+    def apply(self, operation):
+        """Repeat a change previously made to another notebook
+
+        :param operation: The change to apply
+        :type operation: :class:`Operation`
+        :raises IndexError: The operation refers to an item that doesn't
+        exist in this notebook
+        """
+        kind = operation.kind
+        value = operation.value
+        if kind == Operation.LIST_ADD:
+            self.add(List.from_data(value))
+            return
+        if kind == Operation.LIST_INSERT:
+            self.insert(operation.list_index, List.from_data(value))
+            return
+        if kind == Operation.LIST_REMOVE:
+            self.remove(operation.list_index)
+            return
+        if kind == Operation.LIST_RENAME:
+            self.rename(operation.list_index, value)
+            return
+
+        lst = self[operation.list_index]
+        index = operation.task_index
+        if kind == Operation.TASK_ADD:
+            lst.add(Task.from_data(value))
+        elif kind == Operation.TASK_EXTEND:
+            lst.extend([Task.from_data(task) for task in value])
+        elif kind == Operation.TASK_INSERT:
+            lst.insert(index, Task.from_data(value))
+        elif kind == Operation.TASK_REMOVE:
+            lst.remove(index)
+        elif kind == Operation.TASK_RENAME:
+            lst.set_body(index, value)
+        elif kind == Operation.TASK_DONE:
+            lst.set_done(index, value)
+        elif kind == Operation.TASK_PRIO:
+            lst.set_prio(index, value)
+        elif kind == Operation.TASK_MOVE:
+            lst.move(index, value)
+        else:
+            raise ValueError(f"Unknown operation \"{kind}\"")
 
     def __str__(self):
         """Return printable form of the notebook as numbered list of lists
         """
-        result = ""
+        result = []
         for i in range(len(self._lists)):
             lst = self._lists[i]
             idx = f"#{i + 1}"
             name = lst.name
-            done_count = lst.count_done()
-            task_count = len(lst)
+            done_count = lst.stats.done
+            task_count = lst.stats.total
             if task_count == 0:
                 badge = "empty"
             else:
                 badge = f"{done_count}/{task_count}"
                 if done_count == task_count:
                     badge += ", done!"
-            if i != 0:
-                result += "\n"
-            result += f"{idx} {name} ({badge})"
-        return result
+            result.append(f"{idx} {name} ({badge})")
+        return "\n".join(result)
 
     def data(self):
         """Return the dict representation of the notebook
@@ -90,10 +222,13 @@ class Notebook(Sequence):
         :return: A dictionary holding the notebook contents
         :rtype: dict
         """
-        return {
+        result = {
             "version": self.DATA_VERSION,  # For future backwards compatibility
             "lists": [lst.data() for lst in self._lists]
         }
+        if len(self.properties) > 0:
+            result["properties"] = self.properties
+        return result
 
     @classmethod
     def from_data(cls, data):
@@ -107,6 +242,10 @@ class Notebook(Sequence):
         result = Notebook()
         assert data["version"] == cls.DATA_VERSION  # Compatibility check
         result._lists = [List.from_data(lst) for lst in data["lists"]]
+        result.properties = data.get("properties", {})
+        for lst in result._lists:
+            lst.stats.attach(result.stats)
+            lst.notebook = result
         return result
 
     def serialize(self):
@@ -127,3 +266,100 @@ class Notebook(Sequence):
         :rtype: :class:`Notebook`
         """
         return Notebook.from_data(json.loads(json_data))
+
+    def encode(self):
+        """Return the notebook contents in the compact binary format
+
+        The data starts with a magic string and the format version,
+        followed by the properties as a JSON string and an index of
+        the lists. Each index entry holds the list's name, task counts and
+        the byte length of its tasks. The tasks of all lists follow
+        the index, in the same order, so the offset of any list's tasks
+        is known from the index alone.
+
+        :return: The binary representation of the notebook
+        :rtype: bytes
+        """
+        blocks = [lst.encode_tasks() for lst in self._lists]
+        out = bytearray(self.BINARY_MAGIC)
+        out.append(self.BINARY_VERSION)
+        write_str(out, json.dumps(self.properties))
+        write_varint(out, len(self._lists))
+        for lst, block in zip(self._lists, blocks):
+            write_str(out, lst.name)
+            write_varint(out, lst.stats.total)
+            write_varint(out, lst.stats.done)
+            write_varint(out, lst.stats.prio)
+            write_varint(out, len(block))
+        for block in blocks:
+            out += block
+        return bytes(out)
+
+    @classmethod
+    def decode(cls, binary_data, lazy=False):
+        """Create a new notebook instance from binary representation
+
+        In lazy mode, only the index is read up front. The tasks of each
+        list are decoded once they are first accessed, so the time to load
+        doesn't depend on the number of tasks.
+
+        :param binary_data: Data previously generated with encode()
+        :type binary_data: bytes
+        :param lazy: Decode the tasks of each list only when needed
+        :type lazy: bool, optional
+        :raises ValueError: The data is not a valid notebook
+        :return: A new notebook instance
+        :rtype: :class:`Notebook`
+        """
+        data = bytes(binary_data)
+        magic_length = len(cls.BINARY_MAGIC)
+        if (data[:magic_length] != cls.BINARY_MAGIC or
+                len(data) <= magic_length or
+                data[magic_length] not in cls.BINARY_READABLE):
+            raise ValueError("Data is not a notebook in a supported format")
+        version = data[magic_length]
+        result = Notebook()
+        try:
+            properties, pos = read_str(data, magic_length + 1)
+            count, pos = read_varint(data, pos)
+            if version == 2:  # Tasks follow each list's name
+                for _ in range(count):
+                    lst, pos = List.read_binary(data, pos)
+                    result._lists.append(lst)
+            else:  # Index of all lists, followed by the tasks
+                index = []
+                for _ in range(count):
+                    name, pos = read_str(data, pos)
+                    total, pos = read_varint(data, pos)
+                    done, pos = read_varint(data, pos)
+                    prio, pos = read_varint(data, pos)
+                    length, pos = read_varint(data, pos)
+                    index.append((name, (total, done, prio), length))
+                for name, stats, length in index:
+                    result._lists.append(List.from_binary(
+                        name, stats, data, pos, pos + length, lazy))
+                    pos += length
+        except IndexError:
+            raise ValueError("Unexpected end of binary data")
+        result.properties = json.loads(properties)
+        for lst in result._lists:
+            lst.stats.attach(result.stats)
+            lst.notebook = result
+        return result
+
+    @classmethod
+    def load(cls, data, lazy=False):
+        """Create a new notebook instance from either JSON or binary data
+
+        :param data: Data generated with serialize() or encode()
+        :type data: str or bytes
+        :param lazy: Decode the tasks of each list only when needed.
+        Only supported by the binary format
+        :type lazy: bool, optional
+        :raises ValueError: The data is not a valid notebook
+        :return: A new notebook instance
+        :rtype: :class:`Notebook`
+        """
+        if isinstance(data, bytes) and data.startswith(cls.BINARY_MAGIC):
+            return cls.decode(data, lazy)
+        return cls.from_json(data)
@@ -0,0 +1,72 @@
+class Operation:
+    """A single change made to a notebook
+
+    Operations are emitted by :class:`Notebook` and :class:`List` as they
+    are modified, and can be replayed on another notebook with
+    :meth:`Notebook.apply` to repeat the change. Indices are one-based,
+    and refer to the state of the notebook right before the change.
+
+    :param kind: What kind of change it is, one of the constants below
+    :type kind: str
+    :param list_index: Index of the affected list
+    :type list_index: int
+    :param task_index: Index of the affected task, if any
+    :type task_index: int, optional
+    :param value: New value set by the change, if any
+    :type value: str or bool or int or dict, optional
+    :param previous: Value replaced or removed by the change, if any, kept
+    in memory for undoing the change, but not stored
+    :type previous: str or bool or :class:`Task` or :class:`List`, optional
+    """
+
+    LIST_ADD = "list_add"  # value: list data
+    LIST_INSERT = "list_insert"  # value: list data
+    LIST_REMOVE = "list_remove"
+    LIST_RENAME = "list_rename"  # value: new name
+    TASK_ADD = "task_add"  # value: task data
+    TASK_EXTEND = "task_extend"  # value: list of task data
+    TASK_INSERT = "task_insert"  # value: task data
+    TASK_REMOVE = "task_remove"
+    TASK_RENAME = "task_rename"  # value: new body
+    TASK_DONE = "task_done"  # value: new done state
+    TASK_PRIO = "task_prio"  # value: new prio state
+    TASK_MOVE = "task_move"  # value: new task index
+
+    def __init__(self, kind, list_index, task_index=None, value=None,
+                 previous=None):
+        """Constructor method
+        """
+        self.kind = kind
+        self.list_index = list_index
+        self.task_index = task_index
+        self.value = value
+        self.previous = previous
+
+    def size(self):
+        """Return the number of tasks the operation changes, at least one
+
+        :return: The number of tasks
+        :rtype: int
+        """
+        if self.kind == self.TASK_EXTEND:
+            return max(1, len(self.value))
+        return 1
+
+    def data(self):
+        """Return a compact representation of the operation
+
+        :return: A list of [kind, list index, task index, value]
+        :rtype: list
+        """
+        return [self.kind, self.list_index, self.task_index, self.value]
+
+    @classmethod
+    def from_data(cls, data):
+        """Create an operation from its compact representation
+
+        :param data: A list as previously returned by data()
+        :type data: list
+        :return: A new operation instance
+        :rtype: :class:`Operation`
+        """
+        return Operation(*data)
@@ -1,3 +1,48 @@
+import argparse
+import sys
+
+from colorama import just_fix_windows_console
+
+from localstorage import LocalStorage
+from metrics import Metrics
 from tui import TUI
 
-TUI.run()
+parser = argparse.ArgumentParser(description="Manage to-do lists.")
+parser.add_argument("--blocking", action="store_true",
+                    help="wait for each command to finish before reading "
+                         "the next one, without asyncio")
+parser.add_argument("--batch", metavar="SCRIPT",
+                    type=argparse.FileType("r", encoding="utf-8"),
+                    help="run the commands in a file, one per line, without "
+                         "showing the interface, or from stdin if SCRIPT "
+                         "is \"-\"")
+args = parser.parse_args()
+
+just_fix_windows_console()
+tui = TUI(directory=LocalStorage.default_directory(), files=True)
+stats_path = Metrics.dump_path()
+tui.metrics.enabled = stats_path is not None
+status = 0
+try:
+    if args.batch is not None:
+        with args.batch:
+            failures = tui.run_batch(args.batch)
+        status = 1 if failures > 0 else 0
+    elif args.blocking:
+        tui.run()
+    else:
+        tui.start()
+        # Imported once the first frame is shown, as it takes a large share
+        # of the startup time
+        import asyncio
+        asyncio.run(tui.run_async())
+except LocalStorage.LockedError as e:
+    print(e, file=sys.stderr)
+    sys.exit(1)
+
+if stats_path is not None:
+    try:
+        tui.metrics.dump(stats_path)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+sys.exit(status)
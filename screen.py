@@ -0,0 +1,249 @@
+import re
+import unicodedata
+
+from colorama import Cursor, Style, ansi
+
+from console import default_console
+
+
+class Screen:
+    """Off-screen frame buffer which only sends changes to the terminal
+
+    Text is drawn into a grid of cells, each holding a character and
+    the color codes it is printed with. Presenting the frame compares it
+    with the previously presented one, and writes only the spans of cells
+    that changed, using cursor positioning. The bottom row is made
+    the terminal's scrolling region, so that the newline submitted with
+    user input scrolls only the prompt, and not the rest of the screen.
+
+    :param size: Size of the console as (columns, rows)
+    :type size: tuple
+    :param console: The console to present frames on, defaults to
+    the standard output
+    :type console: :class:`Console`, optional
+    """
+
+    BLANK = (" ", "")  # An empty cell, as (character, color codes)
+    WIDE_TAIL = ""  # Second cell of a double-width character
+    MIN_GAP = 8  # Unchanged cells that are cheaper to skip than to rewrite
+    SAVE_CURSOR = "\x1b7"  # Remember the cursor position and colors
+    RESTORE_CURSOR = "\x1b8"  # Return to the remembered cursor position
+    _TOKEN = re.compile(r"\x1b\[([0-9;]*)([A-Za-z])|([^\x1b])", re.DOTALL)
+
+    def __init__(self, size, console=None):
+        """Constructor method
+        """
+        self._width, self._height = size
+        self._console = default_console if console is None else console
+        self._cells = []
+        self._previous = None  # Cells as last presented, None if unknown
+        self._x = 0
+        self._y = 0
+        self._style = ""
+        self.frame_bytes = 0  # Bytes written by the most recent present()
+        self.total_bytes = 0  # Bytes written by all calls to present()
+        self.frame_count = 0
+        self.clear()
+
+    def clear(self):
+        """Start a new blank frame, with the cursor at the top
+        """
+        self._cells = [[self.BLANK] * self._width
+                       for _ in range(self._height)]
+        self._x = 0
+        self._y = 0
+        self._style = ""
+
+    def put(self, text):
+        """Draw a string at the cursor position
+
+        Newlines and color codes are interpreted the same way the terminal
+        would, and long lines wrap around to the next row.
+
+        :param text: The string to draw
+        :type text: str
+        """
+        for match in self._TOKEN.finditer(str(text)):
+            params, command, char = match.groups()
+            if char is None:
+                self._escape(params, command)
+            elif char == "\n":
+                self._x = 0
+                self._y += 1
+            elif char == "\r":
+                self._x = 0
+            elif unicodedata.combining(char):
+                self._combine(char)
+            elif char.isprintable():
+                self._print(char)
+
+    def put_at(self, x, y, text):
+        """Draw a string at a specific position
+
+        :param x: Horizontal position
+        :type x: int
+        :param y: Vertical position
+        :type y: int
+        :param text: The string to draw
+        :type text: str
+        """
+        self._x = x
+        self._y = y
+        self.put(text)
+
+    def present(self, keep_cursor=False):
+        """Write the changes since the previous frame to the terminal
+
+        The cursor is left where drawing of the frame ended.
+
+        :param keep_cursor: Put the cursor back where it was before,
+        instead. Nothing is written if the frame didn't change
+        :type keep_cursor: bool, optional
+        :return: The number of bytes written
+        :rtype: int
+        """
+        output = []
+        previous = self._previous
+        if previous is None:
+            # Unknown terminal contents - start over from a blank screen
+            output.append(ansi.clear_screen())
+            output.append(f"{ansi.CSI}{self._height};{self._height}r")
+            previous = [[self.BLANK] * self._width
+                        for _ in range(self._height)]
+        for y in range(self._height):
+            if self._cells[y] != previous[y]:
+                self._diff_row(output, y, previous[y], self._cells[y])
+        if not keep_cursor:
+            output.append(Cursor.POS(min(self._x, self._width - 1) + 1,
+                                     min(self._y, self._height - 1) + 1))
+        elif len(output) > 0:
+            output.insert(0, self.SAVE_CURSOR)
+            output.append(self.RESTORE_CURSOR)
+
+        text = "".join(output)
+        self._console.put(text)
+        self._previous = self._cells
+        self.clear()
+        self.frame_bytes = len(text.encode())
+        self.total_bytes += self.frame_bytes
+        self.frame_count += 1
+        return self.frame_bytes
+
+    def invalidate(self):
+        """Forget the terminal contents, so that the next frame is redrawn
+        in full
+
+        Use this after anything else has printed to the terminal.
+        """
+        self._previous = None
+
+    def discard_input(self):
+        """Account for the newline the user submitted input with
+
+        Because of the scrolling region, the newline clears the bottom
+        row of the terminal, and leaves the rest of the screen intact.
+        """
+        if self._previous is not None:
+            self._previous[-1] = [self.BLANK] * self._width
+
+    def release(self):
+        """Restore normal terminal scrolling, and place the cursor
+        on the bottom row
+
+        Nothing is written if no frame was presented.
+        """
+        if self.frame_count == 0:
+            return
+        self._console.put(f"{ansi.CSI}r{Cursor.POS(1, self._height)}")
+        self._previous = None
+
+    def _escape(self, params, command):
+        """Interpret an escape sequence
+
+        :param params: Numeric parameters, separated with semicolons
+        :type params: str
+        :param command: The final character of the sequence
+        :type command: str
+        """
+        if command == "m":
+            if params in ("", "0"):
+                self._style = ""
+            else:
+                self._style += f"{ansi.CSI}{params}m"
+        elif command == "H":
+            row, _, column = params.partition(";")
+            self._y = int(row or 1) - 1
+            self._x = int(column or 1) - 1
+
+    def _print(self, char):
+        """Place a printable character at the cursor and advance it
+
+        :param char: The character
+        :type char: str
+        """
+        width = 2 if unicodedata.east_asian_width(char) in "WF" else 1
+        if self._x + width > self._width:
+            self._x = 0
+            self._y += 1
+        if 0 <= self._y < self._height and self._x >= 0:
+            row = self._cells[self._y]
+            row[self._x] = (char, self._style)
+            if width == 2:
+                row[self._x + 1] = (self.WIDE_TAIL, self._style)
+        self._x += width
+
+    def _combine(self, char):
+        """Attach a combining character to the previously printed cell
+
+        :param char: The combining character
+        :type char: str
+        """
+        if 0 < self._x <= self._width and 0 <= self._y < self._height:
+            row = self._cells[self._y]
+            x = self._x - 1
+            if row[x][0] == self.WIDE_TAIL and x > 0:
+                x -= 1
+            row[x] = (row[x][0] + char, row[x][1])
+
+    def _diff_row(self, output, y, old, new):
+        """Append the output needed to turn one row into another
+
+        :param output: List of strings to append to
+        :type output: list
+        :param y: Row index
+        :type y: int
+        :param old: Cells currently in the terminal
+        :type old: list
+        :param new: Cells that should be displayed
+        :type new: list
+        """
+        # Group changed cells into spans, joining those with small gaps
+        spans = []
+        for x in range(self._width):
+            if old[x] == new[x]:
+                continue
+            if new[x][0] == self.WIDE_TAIL and x > 0:
+                x -= 1  # Never start printing in the middle of a character
+            if spans and x - spans[-1][1] < self.MIN_GAP:
+                spans[-1][1] = max(spans[-1][1], x + 1)
+            else:
+                spans.append([x, x + 1])
+
+        # Anything after the last non-blank cell can be erased instead
+        tail = self._width
+        while tail > 0 and new[tail - 1] == self.BLANK:
+            tail -= 1
+
+        for start, end in spans:
+            output.append(Cursor.POS(start + 1, y + 1))
+            style = ""
+            for char, char_style in new[start:min(end, max(tail, start))]:
+                if char_style != style:
+                    output.append(Style.RESET_ALL + char_style)
+                    style = char_style
+                output.append(char)
+            if style != "":
+                output.append(Style.RESET_ALL)
+            if end > tail:
+                output.append(ansi.clear_line(0))
+                break
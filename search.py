@@ -0,0 +1,433 @@
+import re
+import threading
+from array import array
+
+from blocklist import BlockList
+from operation import Operation
+
+
+class SearchIndex:
+    """Inverted index of the words in list names and task bodies
+
+    The index follows the changes of a notebook as a listener. Once
+    a notebook is tracked, its lists are indexed in a background thread,
+    from copies of their tasks, so lists loaded lazily stay encoded and
+    the notebook is only locked while copying. Changes made to a list
+    while it is indexed are applied to its index once it is done.
+    A list searched before that is indexed right away.
+
+    Every indexed task gets an id, and each word maps to an array of
+    the ids of tasks containing it. Renamed and removed tasks leave their
+    ids behind in these arrays, and are skipped during lookups. The index
+    of a list is rebuilt once most of its ids are stale.
+
+    :param lock: Lock held while the notebook is changed, defaults to
+    a new lock
+    :type lock: :class:`threading.RLock`, optional
+    """
+
+    WORD = re.compile(r"\w+")  # Pattern of a searchable word
+
+    def __init__(self, lock=None):
+        """Constructor method
+        """
+        self._lock = threading.RLock() if lock is None else lock
+        self._notebook = None  # The notebook being indexed
+        self._indexes = {}  # List -> _ListIndex, for lists already indexed
+        self._changes = {}  # List being indexed -> operations made since
+        self._thread = None  # Thread indexing the lists, if started
+
+    def track(self, notebook):
+        """Start following the changes made to a notebook, and index its
+        lists in the background
+
+        :param notebook: The notebook to index
+        :type notebook: :class:`Notebook`
+        """
+        with self._lock:
+            if self._notebook is not None:
+                self._notebook.listeners.remove(self._update)
+            self._notebook = notebook
+            self._indexes = {}
+            self._changes = {}
+            notebook.listeners.append(self._update)
+        self._thread = threading.Thread(target=self._index_all,
+                                        args=(notebook,), daemon=True)
+        self._thread.start()
+
+    def wait(self):
+        """Wait until the lists of the tracked notebook are indexed
+        """
+        if self._thread is not None:
+            self._thread.join()
+
+    def find(self, text, limit):
+        """Find the lists and tasks containing all words of a text
+
+        :param text: Words to search for, in any order and case
+        :type text: str
+        :param limit: Maximum number of matching tasks to return
+        :type limit: int
+        :return: Tuple of (list indices of lists with matching names,
+        (list index, task index) tuples of matching tasks in order,
+        total number of matching tasks)
+        :rtype: tuple
+        """
+        words = self.words(text)
+        lists = []
+        tasks = []
+        total = 0
+        if len(words) == 0:
+            return lists, tasks, total
+        with self._lock:
+            for list_index, lst in enumerate(self._notebook, 1):
+                if words <= self.words(lst.name):
+                    lists.append(list_index)
+                index = self._indexes.get(lst)
+                if index is None:
+                    index = _ListIndex(lst)
+                    self._indexes[lst] = index
+                count, positions = index.find(words, limit - len(tasks))
+                total += count
+                tasks.extend((list_index, position + 1)
+                             for position in positions)
+        return lists, tasks, total
+
+    @classmethod
+    def words(cls, text):
+        """Split a text into searchable words
+
+        :param text: The text
+        :type text: str
+        :return: Distinct lower-case words
+        :rtype: set
+        """
+        return set(cls.WORD.findall(text.lower()))
+
+    def _update(self, operation):
+        """Apply a change of the notebook to the index
+
+        :param operation: The change made to the notebook
+        :type operation: :class:`Operation`
+        """
+        kind = operation.kind
+        if kind == Operation.LIST_REMOVE:
+            lst = self._notebook[operation.list_index]
+            self._indexes.pop(lst, None)
+            self._changes.pop(lst, None)
+            return
+        if kind in (Operation.LIST_ADD, Operation.LIST_INSERT,
+                    Operation.LIST_RENAME):
+            return  # Names are few, and are matched during lookups
+        lst = self._notebook[operation.list_index]
+        index = self._indexes.get(lst)
+        if index is not None:
+            index.update(operation)
+        changes = self._changes.get(lst)
+        if changes is not None:
+            changes.append(operation)
+
+    def _index_all(self, notebook):
+        """Index the lists of a notebook that were not indexed yet, one by
+        one, until another notebook is tracked
+
+        :param notebook: The tracked notebook
+        :type notebook: :class:`Notebook`
+        """
+        with self._lock:
+            lists = list(notebook)
+        for lst in lists:
+            with self._lock:
+                if self._notebook is not notebook:
+                    return
+                if lst.notebook is not notebook or lst in self._indexes:
+                    continue
+                tasks = lst.copy()
+                self._changes[lst] = []
+            index = _ListIndex(lst, tasks)
+            with self._lock:
+                if self._notebook is not notebook:
+                    return
+                changes = self._changes.pop(lst, None)
+                if changes is None or lst in self._indexes:
+                    continue  # Removed, or searched meanwhile
+                for operation in changes:
+                    index.update(operation)
+                self._indexes[lst] = index
+
+
+class _UidList(BlockList):
+    """A BlockList of task ids, stored in arrays, which can find the
+    position of any id it holds
+
+    The block of each id is recorded as it is stored, and blocks are
+    numbered in order. An id is located by summing the lengths of the
+    blocks before its own in the Fenwick tree, and searching its block.
+    """
+
+    SCAN_SIZE = 8  # Ids of a block worth a single pass over the block
+
+    def __init__(self):
+        """Constructor method
+        """
+        self._homes = []  # Block holding each id, or None
+        super().__init__()
+
+    def first(self, uids, limit):
+        """Count the ids still in the sequence, and find the first
+        positions among them
+
+        Only the blocks holding the first ids are searched, each at
+        most once.
+
+        :param uids: The ids
+        :type uids: collection
+        :param limit: Max number of positions to find
+        :type limit: int
+        :return: Tuple of (number of ids still in the sequence, sorted
+        zero-based positions of up to `limit` of them)
+        :rtype: tuple
+        """
+        homes = list(map(self._homes.__getitem__, uids))
+        count = len(homes) - homes.count(None)
+        if count == 0 or limit <= 0:
+            return count, []
+        numbers = sorted({block.number for block in homes
+                          if block is not None})[:limit]
+        groups = {number: [] for number in numbers}  # Block number -> ids
+        for uid, block in zip(uids, homes):
+            if block is not None and block.number <= numbers[-1]:
+                groups[block.number].append(uid)
+        positions = []
+        for number, group in groups.items():
+            block = self._blocks[number]
+            start = self._offset(number)
+            if len(group) < self.SCAN_SIZE:
+                positions.extend(start + block.index(uid) for uid in group)
+            else:
+                group = set(group)
+                positions.extend(start + offset
+                                 for offset, uid in enumerate(block)
+                                 if uid in group)
+        positions.sort()
+        return count, positions[:limit]
+
+    def __setitem__(self, index, value):
+        """Replace the id at the provided position
+
+        :param index: zero-based position
+        :type index: int
+        :param value: The new id
+        :type value: int
+        :raises IndexError: Index is out of bounds
+        """
+        block, offset = self._locate(index)
+        self._homes[self._blocks[block][offset]] = None
+        self._blocks[block][offset] = value
+        self._place(value, self._blocks[block])
+
+    def insert(self, index, value):
+        """Insert an id before the provided position
+
+        :param index: zero-based position, 0 <= index <= len(self)
+        :type index: int
+        :param value: The id to insert
+        :type value: int
+        :raises IndexError: Index is out of bounds
+        """
+        super().insert(index, value)
+        self._place(value, self._blocks[self._locate(index)[0]])
+
+    def append(self, value):
+        """Add an id to the end of the sequence
+
+        :param value: The id to add
+        :type value: int
+        """
+        super().append(value)
+        self._place(value, self._blocks[-1])
+
+    def extend(self, values):
+        """Add many ids to the end of the sequence
+
+        :param values: The ids to add
+        :type values: iterable
+        """
+        first = max(len(self._blocks) - 1, 0)
+        super().extend(values)
+        for block in self._blocks[first:]:
+            for uid in block:
+                self._place(uid, block)
+
+    def pop(self, index=None):
+        """Remove and return the id at the provided position
+
+        :param index: zero-based position, defaults to the last id
+        :type index: int, optional
+        :raises IndexError: Index is out of bounds
+        :return: The removed id
+        :rtype: int
+        """
+        uid = super().pop(index)
+        self._homes[uid] = None
+        return uid
+
+    def clear(self):
+        """Remove all ids
+        """
+        super().clear()
+        self._homes = []
+
+    def _new_block(self, values):
+        """Create a block holding the provided ids, after the last block
+
+        :param values: The ids
+        :type values: list
+        :return: The new block
+        :rtype: :class:`_UidBlock`
+        """
+        block = _UidBlock("I", values)
+        block.number = len(self._blocks)
+        return block
+
+    def _rebuild(self):
+        """Recreate the Fenwick tree, and number the blocks again
+        """
+        super()._rebuild()
+        for number, block in enumerate(self._blocks):
+            block.number = number
+
+    def _split(self, block):
+        """Split an oversized block in two halves
+
+        :param block: zero-based block index
+        :type block: int
+        """
+        old = self._blocks[block]
+        half = len(old) // 2
+        new = _UidBlock("I", old[half:])
+        self._blocks.insert(block + 1, new)
+        del old[half:]
+        self._rebuild()
+        for uid in new:
+            self._place(uid, new)
+
+    def _place(self, uid, block):
+        """Record the block holding an id
+
+        :param uid: The id
+        :type uid: int
+        :param block: The block
+        :type block: :class:`_UidBlock`
+        """
+        homes = self._homes
+        if uid >= len(homes):
+            homes.extend([None] * (uid + 1 - len(homes)))
+        homes[uid] = block
+
+
+class _UidBlock(array):
+    """A block of a :class:`_UidList`, which knows its position among
+    the blocks
+    """
+
+    __slots__ = ("number",)
+
+
+class _ListIndex:
+    """Word index of the tasks of a single list
+
+    :param lst: The list to index
+    :type lst: :class:`List`
+    :param tasks: Tasks to index, defaults to those of the list. Changes
+    made to the list since are applied with update() afterwards
+    :type tasks: iterable, optional
+    """
+
+    def __init__(self, lst, tasks=None):
+        """Constructor method, indexes all tasks of the list
+        """
+        self._list = lst
+        self._build(lst if tasks is None else tasks)
+
+    def _build(self, tasks):
+        """Index all tasks from scratch
+
+        :param tasks: The tasks of the list
+        :type tasks: iterable
+        """
+        self._postings = {}  # Word -> array of ids of tasks containing it
+        self._uids = _UidList()  # Id of the task at each position
+        self._dead = 0  # Number of ids no longer in the list
+        self._next_uid = 0
+        self._uids.extend([self._add_words(task.body) for task in tasks])
+
+    def find(self, words, limit):
+        """Find the tasks containing all provided words
+
+        :param words: Lower-case words
+        :type words: set
+        :param limit: Max number of positions to return
+        :type limit: int
+        :return: Tuple of (number of matching tasks, sorted zero-based
+        positions of up to `limit` of them)
+        :rtype: tuple
+        """
+        postings = []
+        for word in words:
+            uids = self._postings.get(word)
+            if uids is None:
+                return 0, []
+            postings.append(uids)
+        postings.sort(key=len)
+        if len(postings) == 1:
+            candidates = postings[0]
+        else:
+            candidates = set(postings[0]).intersection(*postings[1:])
+        return self._uids.first(candidates, limit)
+
+    def update(self, operation):
+        """Apply a change of the list to the index
+
+        :param operation: The change made to the list
+        :type operation: :class:`Operation`
+        """
+        kind = operation.kind
+        position = (operation.task_index or 0) - 1
+        if kind == Operation.TASK_ADD:
+            self._uids.append(self._add_words(operation.value["body"]))
+        elif kind == Operation.TASK_EXTEND:
+            self._uids.extend([self._add_words(task["body"])
+                               for task in operation.value])
+        elif kind == Operation.TASK_INSERT:
+            uid = self._add_words(operation.value["body"])
+            self._uids.insert(position, uid)
+        elif kind == Operation.TASK_REMOVE:
+            self._uids.pop(position)
+            self._dead += 1
+        elif kind == Operation.TASK_RENAME:
+            self._uids[position] = self._add_words(operation.value)
+            self._dead += 1
+        elif kind == Operation.TASK_MOVE:
+            self._uids.move(position, operation.value - 1)
+
+        if self._dead > len(self._uids):  # Drop the stale ids
+            self._build(self._list)
+
+    def _add_words(self, body):
+        """Index the words of a new task
+
+        :param body: Body text of the task
+        :type body: str
+        :return: Id of the task
+        :rtype: int
+        """
+        uid = self._next_uid
+        self._next_uid += 1
+        for word in SearchIndex.words(body):
+            uids = self._postings.get(word)
+            if uids is None:
+                self._postings[word] = array("I", (uid,))
+            else:
+                uids.append(uid)
+        return uid
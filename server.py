@@ -0,0 +1,132 @@
+import asyncio
+import os
+import selectors
+import socketserver
+import sys
+import tempfile
+import threading
+
+from console import Console
+from tui import TUI
+
+
+class Session(socketserver.BaseRequestHandler):
+    """Runs a session of the app for a single connection
+
+    The session gets its own pseudo-terminal, so typed input is echoed and
+    edited by the terminal driver, the same way as in a terminal window.
+    Bytes received on the connection are typed into the terminal, and
+    everything the session prints is sent back. The session ends when
+    either side closes.
+    """
+
+    READ_SIZE = 4096
+
+    def handle(self):
+        """Start the session, and relay data until it ends
+        """
+        master, terminal = os.openpty()
+        threading.Thread(target=self._run_tui, args=(terminal,),
+                         daemon=True).start()
+        try:
+            self._relay(master)
+        except OSError:
+            pass  # The connection was reset
+        finally:
+            os.close(master)  # Ends the session if it's still running
+
+    def _run_tui(self, terminal):
+        """Run the app on the terminal, then close it
+
+        :param terminal: File descriptor of the terminal
+        :type terminal: int
+        """
+        input_stream = open(terminal, "r", encoding="utf-8",
+                            errors="replace", closefd=False)
+        output_stream = open(terminal, "w", encoding="utf-8", closefd=False)
+        try:
+            asyncio.run(TUI(Console(input_stream, output_stream)).run_async())
+        except OSError:
+            pass  # The connection was closed
+        finally:
+            for stream in (input_stream, output_stream):
+                try:
+                    stream.close()
+                except OSError:
+                    pass  # Output that couldn't be sent anymore
+            os.close(terminal)
+
+    def _relay(self, master):
+        """Pass data between the connection and the terminal
+
+        :param master: File descriptor of the terminal's controlling side
+        :type master: int
+        :raises OSError: The connection failed
+        """
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.request, selectors.EVENT_READ)
+            selector.register(master, selectors.EVENT_READ)
+            while True:
+                for key, _ in selector.select():
+                    if key.fileobj == master:
+                        try:
+                            data = os.read(master, self.READ_SIZE)
+                        except OSError:
+                            return  # The session ended
+                        if len(data) == 0:
+                            return
+                        self.request.sendall(data)
+                    else:
+                        data = self.request.recv(self.READ_SIZE)
+                        if len(data) == 0:
+                            return  # The other side disconnected
+                        os.write(master, data)
+
+
+class SessionServer(socketserver.ThreadingUnixStreamServer):
+    """Hosts sessions of the app in a single process, one per connection
+    to a Unix socket
+
+    Sessions keep their lists in memory only, and never share them.
+
+    :param path: Path of the socket
+    :type path: str
+    """
+
+    PATH_ENV = "LISTS_SOCKET"  # Environment variable with the socket path
+    daemon_threads = True  # Don't wait for sessions when shutting down
+
+    def __init__(self, path):
+        """Constructor method, starts listening on the socket
+        """
+        if os.path.exists(path):
+            os.remove(path)  # Left over by a previous server
+        super().__init__(path, Session)
+        os.chmod(path, 0o600)
+
+    @classmethod
+    def default_path(cls):
+        """Return the path of the socket
+
+        This is the value of the LISTS_SOCKET environment variable, or
+        "lists.sock" in the temporary directory if it's not set.
+
+        :return: Path of the socket
+        :rtype: str
+        """
+        path = os.environ.get(cls.PATH_ENV)
+        if path is None:
+            return os.path.join(tempfile.gettempdir(), "lists.sock")
+        return path
+
+
+if __name__ == "__main__":
+    socket_path = sys.argv[1] if len(sys.argv) > 1 else \
+        SessionServer.default_path()
+    with SessionServer(socket_path) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(socket_path)
@@ -0,0 +1,55 @@
+class TaskStats:
+    """Running task counters of a list or a whole notebook
+
+    The counters are kept up to date by their owner on every change, so
+    reading them never requires walking the tasks. Counters may be chained,
+    so that the changes of a list's stats are also applied to the stats of
+    the notebook holding it.
+
+    :param parent: Stats that every change is also applied to, if any
+    :type parent: :class:`TaskStats`, optional
+    """
+
+    def __init__(self, parent=None):
+        """Constructor method
+        """
+        self.total = 0
+        self.done = 0
+        self.prio = 0
+        self.parent = parent
+
+    def update(self, total=0, done=0, prio=0):
+        """Adjust the counters by the provided amounts
+
+        :param total: Change of the task count
+        :type total: int, optional
+        :param done: Change of the done task count
+        :type done: int, optional
+        :param prio: Change of the priority task count
+        :type prio: int, optional
+        """
+        self.total += total
+        self.done += done
+        self.prio += prio
+        if self.parent is not None:
+            self.parent.update(total, done, prio)
+
+    def attach(self, parent):
+        """Start applying changes to the provided parent stats
+
+        The current counts are added to the parent.
+
+        :param parent: The new parent stats
+        :type parent: :class:`TaskStats`
+        """
+        self.parent = parent
+        parent.update(self.total, self.done, self.prio)
+
+    def detach(self):
+        """Stop applying changes to the parent stats
+
+        The current counts are subtracted from the parent.
+        """
+        if self.parent is not None:
+            self.parent.update(-self.total, -self.done, -self.prio)
+        self.parent = None
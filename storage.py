@@ -1,81 +1,389 @@
 import os
+import time
 
 import dropbox
-import gdshortener
 from colorama import Fore, Style
-from dropbox.files import WriteMode
+from dropbox.files import (CommitInfo, DeleteArg, UploadSessionCursor,
+                           WriteMode)
 
-from console import put
+from compression import Decoder, compress
+from console import default_console
+from metrics import Metrics
+from sync import Sync
 
 
 class Storage:
     """Class for storing and loading of data in the cloud
+
+    The revision of every file read or written is remembered, so that
+    a write can be made only if nobody else wrote the file since.
+
+    Data is compressed while it is uploaded, and starts with a marker
+    telling the method, so downloads decompress it as it arrives. Data
+    larger than a chunk is sent in an upload session, a chunk per request,
+    rather than in a single request, which Dropbox limits in size. A chunk
+    that fails is sent again a few times, from the offset Dropbox reports
+    as received. Finishing the session is not retried, since it can't be
+    told apart from a finish that wrote the file but failed to respond.
     """
 
     REMOTE_PATH = "/lists.json"
+    LOG_PATH = "/log"  # Folder holding operation log segments
+    COMPRESSION = "zlib"  # Method used for uploads, see compression.METHODS
+    MIN_COMPRESS_SIZE = 1024  # Smaller data is uploaded as it is
+    CHUNK_SIZE = 8 * 1024 * 1024  # Bytes sent per request of a session
+    MAX_RETRIES = 3  # Attempts to send a chunk again after a failure
+    RETRY_DELAY = 0.5  # Seconds before the first retry, doubling after
 
-    def __init__(self):
+    # Failures of a request worth making it again for. Connection errors
+    # of the HTTP library derive from OSError.
+    _TRANSIENT_ERRORS = (OSError, dropbox.exceptions.InternalServerError,
+                         dropbox.exceptions.RateLimitError)
+
+    def __init__(self, token_cache=None, reuse=True, console=None,
+                 metrics=None):
         """Constructor method, authenticates the user with Dropbox
+
+        A cached authorization is reused if possible, which takes a single
+        request. Otherwise, the user is taken through the authorization
+        wizard.
+
+        :param token_cache: Cache of the refresh token, defaults to none
+        :type token_cache: :class:`TokenCache`, optional
+        :param reuse: Reuse the cached authorization, rather than letting
+        the user pick an account
+        :type reuse: bool, optional
+        :param console: The console to run the wizard on, defaults to
+        the standard input and output
+        :type console: :class:`Console`, optional
+        :param metrics: Records the sizes sent and received, after
+        compression, defaults to a new one that is off
+        :type metrics: :class:`Metrics`, optional
+        :raises RuntimeError: Any failure to authenticate
+        """
+        key = os.environ['APP_KEY']
+        self._dbx = None
+        # HTTP session of this connection only, as sessions of the requests
+        # package are not guaranteed to be thread-safe
+        self._session = dropbox.create_session()
+        self._revs = {}  # Path -> revision of the file as last seen
+        self.metrics = Metrics() if metrics is None else metrics
+        if reuse and token_cache is not None:
+            token = token_cache.load()
+            if token is not None:
+                self._dbx = self._connect(key, token)
+                try:
+                    self._dbx.check_and_refresh_access_token()
+                except dropbox.exceptions.AuthError:
+                    self._dbx = None  # Access was revoked
+                    token_cache.clear()
+                except Exception as e:
+                    raise RuntimeError(f"Failed to connect to Dropbox: {e}")
+
+        if self._dbx is None:
+            if console is None:
+                console = default_console
+            token = self._authorize(key, console)
+            self._dbx = self._connect(key, token)
+            if token_cache is not None:
+                token_cache.save(token)
+
+    def _connect(self, key, token):
+        """Create a Dropbox client, using the HTTP session of this connection
+
+        :param key: Dropbox app key
+        :type key: str
+        :param token: Refresh token of the account
+        :type token: str
+        :return: The client
+        :rtype: :class:`dropbox.Dropbox`
+        """
+        return dropbox.Dropbox(oauth2_refresh_token=token, app_key=key,
+                               session=self._session)
+
+    @staticmethod
+    def _authorize(key, console):
+        """Run the authorization wizard
+
+        :param key: Dropbox app key
+        :type key: str
+        :param console: The console to interact with the user on
+        :type console: :class:`Console`
+        :raises RuntimeError: Any failure to authenticate
+        :return: Refresh token of the authorized account
+        :rtype: str
         """
         # Adapted from example code at:
         # https://github.com/dropbox/dropbox-sdk-python/blob/main/example/oauth/commandline-oauth-pkce.py
-        key = os.environ['APP_KEY']
         auth_flow = dropbox.DropboxOAuth2FlowNoRedirect(
             key, use_pkce=True, token_access_type='offline')
         authorize_url = auth_flow.start()
 
-        # Shorten the URL for easier copypaste from console
-        shortener = gdshortener.ISGDShortener()
-        short_url = shortener.shorten(authorize_url)[0]
-
+        put = console.put
         put("=== DROPBOX WIZARD ===\n")
         put("\n")
         put("To authenticate with Dropbox, please open this URL in your ")
         put("web browser: \n")
         put("\n")
-        put(f"{Fore.LIGHTGREEN_EX}{short_url}{Style.RESET_ALL}\n")
-        put("\n")
-        put("(The link has been shortened for convenience, and should lead\n")
-        put("to a URL beginning with ")
-        put("\"https://www.dropbox.com/oauth2/authorize\".\n")
-        put("If the link matches this pattern, proceed past the is.gd ")
-        put("warning page.)\n")
+        put(f"{Fore.LIGHTGREEN_EX}{authorize_url}{Style.RESET_ALL}\n")
         put("\n")
         put("On the page, log in to Dropbox if needed, and click \"Allow\".\n")
-        put("Once you receive the authorization code, please paste it below:\n")
-        put("> ")
-        auth_code = input().strip()
+        put("Once you receive the authorization code, please paste it below.\n")
+        put("If the link is hard to copy, type \"short\" to get a shorter ")
+        put("one.\n")
+        while True:
+            put("> ")
+            auth_code = console.input().strip()
+            if auth_code.lower() != "short":
+                break
+            put(f"{Fore.LIGHTGREEN_EX}{Storage._shorten(authorize_url)}"
+                f"{Style.RESET_ALL}\n")
+            put("(The link should lead to a URL beginning with\n")
+            put("\"https://www.dropbox.com/oauth2/authorize\". If it does, ")
+            put("proceed past the is.gd\nwarning page.)\n")
 
         try:
             oauth_result = auth_flow.finish(auth_code)
         except Exception as e:
             raise RuntimeError(f"Failed to authenticate with Dropbox: {e}")
+        return oauth_result.refresh_token
 
-        self._dbx = dropbox.Dropbox(
-            oauth2_refresh_token=oauth_result.refresh_token, app_key=key)
-
-    def download(self):
-        """Retrieve data from storage, and return as text
+    @staticmethod
+    def _shorten(url):
+        """Shorten a URL with is.gd
 
-        :return: Data downloaded from online storage
+        :param url: The URL
+        :type url: str
+        :return: The short URL, or a message if it couldn't be shortened
         :rtype: str
-        :raises RuntimeError: Any failure to upload the data
         """
         try:
-            _, response = self._dbx.files_download(self.REMOTE_PATH)
-            return response.text
+            import gdshortener
+            return gdshortener.ISGDShortener().shorten(url)[0]
+        except Exception as e:
+            return f"Failed to shorten the link: {e}"
+
+    def download(self, path=REMOTE_PATH):
+        """Retrieve data from storage
+
+        :param path: Remote file to download, defaults to the notebook
+        :type path: str, optional
+        :return: Data downloaded from online storage, decompressed
+        :rtype: bytes
+        :raises RuntimeError: Any failure to download the data
+        """
+        decoder = Decoder()
+        received = 0
+        chunks = []
+        try:
+            metadata, response = self._dbx.files_download(path)
+            with response:
+                for chunk in response.iter_content(self.CHUNK_SIZE):
+                    received += len(chunk)
+                    chunks.append(decoder.feed(chunk))
+            chunks.append(decoder.finish())
+            self._revs[path] = metadata.rev
         except Exception as e:
             raise RuntimeError(f"Failed to download data from Dropbox: {e}")
+        self.metrics.record_size("storage.download.wire", received)
+        return b"".join(chunks)
 
-    def upload(self, text_data):
+    def upload(self, data, path=REMOTE_PATH, update=False):
         """Store data in the storage, replacing previous data
 
-        :param text_data: Data to store as UTF-8 plaintext
-        :type text_data: str
+        :param data: Data to store, text is stored as UTF-8
+        :type data: str or bytes
+        :param path: Remote file to write, defaults to the notebook
+        :type path: str, optional
+        :param update: Only write the file if it wasn't changed since it
+        was last read or written here, or if it still doesn't exist when
+        it wasn't seen yet
+        :type update: bool, optional
+        :raises Sync.ConflictError: The file was changed by someone else
         :raises RuntimeError: Any failure to upload the data
         """
+        if isinstance(data, str):
+            data = data.encode()
+        mode = WriteMode.overwrite
+        if update:
+            rev = self._revs.get(path)
+            mode = WriteMode.add if rev is None else WriteMode.update(rev)
+        chunks = [data]
+        if len(data) >= self.MIN_COMPRESS_SIZE:
+            chunks = compress(data, self.COMPRESSION)
         try:
-            self._dbx.files_upload(text_data.encode(), self.REMOTE_PATH,
-                                   WriteMode.overwrite)
+            metadata, sent = self._send(chunks, CommitInfo(path, mode))
+        except dropbox.exceptions.ApiError as e:
+            if update and self._is_conflict(e.error):
+                raise Sync.ConflictError(
+                    f"Lists were changed by another session: {path}")
+            raise RuntimeError(f"Failed to upload data to Dropbox: {e}")
         except Exception as e:
             raise RuntimeError(f"Failed to upload data to Dropbox: {e}")
+        self._revs[path] = metadata.rev
+        self.metrics.record_size("storage.upload.wire", sent)
+
+    def _send(self, chunks, commit):
+        """Upload data as it is produced, in a single request if it fits
+        in a chunk, or else in an upload session
+
+        :param chunks: The data, in pieces of any size
+        :type chunks: iterable
+        :param commit: The file to write, and the write mode
+        :type commit: :class:`dropbox.files.CommitInfo`
+        :return: Tuple of (metadata of the written file, bytes sent)
+        :rtype: tuple
+        :raises dropbox.exceptions.ApiError: Dropbox refused the upload
+        :raises Exception: Any other failure to upload the data
+        """
+        buffer = bytearray()
+        session_id = None
+        offset = 0  # Bytes already sent in the session
+        for chunk in chunks:
+            buffer += chunk
+            while len(buffer) > self.CHUNK_SIZE:
+                data = bytes(buffer[:self.CHUNK_SIZE])
+                del buffer[:self.CHUNK_SIZE]
+                if session_id is None:
+                    session_id = self._retry(
+                        self._dbx.files_upload_session_start,
+                        data).session_id
+                else:
+                    self._append(session_id, data, offset)
+                offset += len(data)
+        if session_id is None:
+            metadata = self._dbx.files_upload(bytes(buffer), commit.path,
+                                              commit.mode)
+        else:
+            # Not made again, as a finish that failed after the file was
+            # written would then fail for the missing session
+            metadata = self._dbx.files_upload_session_finish(
+                bytes(buffer), UploadSessionCursor(session_id, offset),
+                commit)
+        return metadata, offset + len(buffer)
+
+    def _append(self, session_id, data, offset):
+        """Send a chunk of an upload session, resuming after failures
+
+        A chunk may have been received even though its request failed.
+        Sending it again then fails as well, with the offset received so
+        far, and the rest of the chunk is sent from there.
+
+        :param session_id: ID of the upload session
+        :type session_id: str
+        :param data: The chunk
+        :type data: bytes
+        :param offset: Bytes sent in the session before the chunk
+        :type offset: int
+        :raises dropbox.exceptions.ApiError: Dropbox refused the chunk
+        :raises Exception: Any other failure to send the chunk
+        """
+        received = offset  # Offset received by Dropbox, as last reported
+        for attempt in range(self.MAX_RETRIES + 1):
+            try:
+                self._dbx.files_upload_session_append_v2(
+                    data[received - offset:],
+                    UploadSessionCursor(session_id, received))
+                return
+            except dropbox.exceptions.ApiError as e:
+                if not e.error.is_incorrect_offset():
+                    raise
+                received = e.error.get_incorrect_offset().correct_offset
+                if not offset <= received <= offset + len(data):
+                    raise
+                if received == offset + len(data):
+                    return  # Received before the request failed
+            except self._TRANSIENT_ERRORS:
+                if attempt == self.MAX_RETRIES:
+                    raise
+                time.sleep(self.RETRY_DELAY * 2 ** attempt)
+        raise RuntimeError("Dropbox keeps reporting a different offset")
+
+    def _retry(self, request, *args):
+        """Make a request, making it again a few times after failures
+        of the connection or of Dropbox
+
+        :param request: Method of the Dropbox client
+        :type request: function
+        :return: Result of the request
+        :rtype: object
+        :raises Exception: Any failure of the last attempt, or any other
+        failure
+        """
+        for attempt in range(self.MAX_RETRIES):
+            try:
+                return request(*args)
+            except self._TRANSIENT_ERRORS:
+                time.sleep(self.RETRY_DELAY * 2 ** attempt)
+        return request(*args)
+
+    @staticmethod
+    def _is_conflict(error):
+        """Check whether an upload failed because the file was changed
+
+        :param error: Error of a single upload or of finishing a session
+        :type error: :class:`dropbox.files.UploadError` or
+        :class:`dropbox.files.UploadSessionFinishError`
+        :return: `True` if the file was changed by someone else
+        :rtype: bool
+        """
+        if not error.is_path():
+            return False
+        reason = error.get_path()
+        # A single upload wraps the reason in UploadWriteFailed
+        return getattr(reason, "reason", reason).is_conflict()
+
+    def check(self, path=REMOTE_PATH):
+        """Check that a file wasn't written by someone else since it was
+        last read or written here
+
+        :param path: Remote file to check, defaults to the notebook
+        :type path: str, optional
+        :raises Sync.ConflictError: The file was changed by someone else
+        :raises RuntimeError: Any failure to look up the file
+        """
+        try:
+            rev = self._dbx.files_get_metadata(path).rev
+        except Exception as e:
+            raise RuntimeError(f"Failed to look up data in Dropbox: {e}")
+        if rev != self._revs.get(path):
+            raise Sync.ConflictError(
+                f"Lists were changed by another session: {path}")
+
+    def list_log(self):
+        """Return the paths of all operation log segments
+
+        :return: Paths of the segments in storage, sorted by name
+        :rtype: list
+        :raises RuntimeError: Any failure to list the segments
+        """
+        try:
+            result = self._dbx.files_list_folder(self.LOG_PATH)
+            entries = result.entries
+            while result.has_more:
+                result = self._dbx.files_list_folder_continue(result.cursor)
+                entries += result.entries
+        except dropbox.exceptions.ApiError as e:
+            if e.error.is_path() and e.error.get_path().is_not_found():
+                return []  # No segments were written yet
+            raise RuntimeError(f"Failed to list data in Dropbox: {e}")
+        except Exception as e:
+            raise RuntimeError(f"Failed to list data in Dropbox: {e}")
+        return sorted(entry.path_lower for entry in entries)
+
+    def delete(self, paths):
+        """Remove files from the storage
+
+        The removal happens in the background, and its failure is ignored.
+
+        :param paths: Remote files to remove
+        :type paths: list
+        """
+        if len(paths) == 0:
+            return
+        for path in paths:
+            self._revs.pop(path, None)
+        try:
+            self._dbx.files_delete_batch([DeleteArg(path) for path in paths])
+        except Exception:
+            pass  # Leftover files are harmless, and are deleted next time
@@ -0,0 +1,407 @@
+import json
+import posixpath
+import threading
+
+from merge import merge, reconcile
+from metrics import Metrics
+from notebook import Notebook
+from operation import Operation
+
+
+class Sync:
+    """Keeps the notebook in storage up to date by uploading only changes
+
+    Storage holds a snapshot of the whole notebook, and a log of numbered
+    segments, each holding the operations recorded between two saves.
+    The snapshot remembers the number of the last segment it already
+    includes. Loading replays the newer segments on top of the snapshot.
+    Every few saves, the log is compacted into a new snapshot.
+
+    If too many changes pile up before a save, they are dropped, and
+    the next save uploads a snapshot instead, which costs less than
+    keeping them.
+
+    Segments are only written if they don't exist yet, and snapshots only
+    if nobody else wrote one since it was last read or written. Before
+    a snapshot, the next segment is written, so that the number of
+    the segment is claimed. When another session saved first, its version
+    is downloaded, and merged with the notebook, using the version of
+    the last load or save as the common base. That version is kept for
+    this purpose, as the data of the snapshot, and the operations of
+    the segments since. A segment only counts as saved once the snapshot
+    is known to be unchanged after writing it. The notebook is changed to
+    the merged version, and what turns the other session's version into it
+    is uploaded instead.
+
+    Saving may run in a background thread. The notebook is only read while
+    holding `lock`, which should also be held by whoever modifies
+    the notebook. Network requests are made without holding it.
+
+    :param storage: Connected storage to sync with
+    :type storage: :class:`Storage`
+    :param lock: Lock guarding the notebook, defaults to a new one
+    :type lock: :class:`threading.RLock`, optional
+    :param metrics: Records the time taken by conversions and transfers,
+    and the transferred sizes, defaults to a new one that is off
+    :type metrics: :class:`Metrics`, optional
+    """
+
+    COMPACT_EVERY = 16  # Number of segments before a new snapshot is made
+    MAX_PENDING = 10_000  # Number of pending task changes kept for a save
+    MAX_MERGES = 3  # Number of merges per save before giving up
+
+    class ConflictError(RuntimeError):
+        """Raised by storage when a file to write was changed by someone
+        else
+        """
+        pass
+
+    def __init__(self, storage, lock=None, metrics=None):
+        """Constructor method
+        """
+        self._storage = storage
+        self.lock = threading.RLock() if lock is None else lock
+        self.metrics = Metrics() if metrics is None else metrics
+        self._notebook = None  # The notebook being recorded
+        self._pending = []  # Operations not uploaded yet
+        self._pending_size = 0  # Number of task changes in _pending
+        self._overflow = False  # Changes were dropped, a snapshot is needed
+        # Number of the last segment in storage, or None if it's not known
+        # to be an earlier version of the recorded notebook
+        self._seq = None
+        self._segments = 0  # Segments written since the last snapshot
+        # Notebook as of _seq, as (snapshot data, operations of the segments
+        # after the snapshot), if _seq is known
+        self._base = None
+        # Functions called with the lock held, after changes saved by
+        # another session were merged into the notebook
+        self.merge_listeners = []
+
+    def track(self, notebook):
+        """Start recording the changes made to a notebook
+
+        Until the notebook is saved as a snapshot, storage is assumed
+        to hold unrelated contents.
+
+        :param notebook: The notebook to record
+        :type notebook: :class:`Notebook`
+        """
+        with self.lock:
+            if self._notebook is not None:
+                self._notebook.listeners.remove(self._record)
+            self._notebook = notebook
+            notebook.listeners.append(self._record)
+            self._pending = []
+            self._pending_size = 0
+            self._overflow = False
+            self._seq = None
+            self._segments = 0
+            self._base = None
+
+    def has_changes(self):
+        """Check whether there are changes that were not uploaded yet
+
+        :return: `True` if there are unsaved changes
+        :rtype: bool
+        """
+        with self.lock:
+            return len(self._pending) > 0 or self._overflow
+
+    def has_base(self):
+        """Check whether storage holds an earlier version of the notebook
+
+        This is the case once the notebook was loaded from, or saved to
+        storage.
+
+        :return: `True` if saving can upload just the changes
+        :rtype: bool
+        """
+        with self.lock:
+            return self._seq is not None
+
+    def save(self, everything=False, binary=False):
+        """Upload the changes made since the last save
+
+        A full snapshot is uploaded instead if storage doesn't hold
+        an earlier version of the notebook, or if the log is due for
+        compaction. Changes saved by another session in the meantime are
+        merged first.
+
+        :param everything: Always upload a full snapshot
+        :type everything: bool, optional
+        :param binary: Store snapshots in the binary format, rather than JSON
+        :type binary: bool, optional
+        :raises RuntimeError: Any failure to upload the data, or other
+        sessions saving all the time
+        """
+        for _ in range(self.MAX_MERGES):
+            try:
+                self._save(everything, binary)
+                return
+            except self.ConflictError:
+                self._merge()
+        raise RuntimeError("Lists keep being saved by another session, "
+                           "try again later.")
+
+    def _save(self, everything, binary):
+        """Upload the changes made since the last save, see save()
+
+        :param everything: Always upload a full snapshot
+        :type everything: bool
+        :param binary: Store snapshots in the binary format
+        :type binary: bool
+        :raises Sync.ConflictError: Another session saved first
+        :raises RuntimeError: Any failure to upload the data
+        """
+        with self.lock:
+            if (everything or self._seq is None or self._overflow or
+                    self._segments + 1 >= self.COMPACT_EVERY):
+                snapshot = True
+            elif len(self._pending) == 0:
+                return
+            else:
+                snapshot = False
+                seq = self._seq + 1
+                operations = self._take_pending()
+        if snapshot:
+            self._save_snapshot(binary)
+        else:
+            self._save_segment(seq, operations)
+
+    def _save_segment(self, seq, operations):
+        """Upload operations as a new log segment
+
+        :param seq: Number of the segment
+        :type seq: int
+        :param operations: Operations taken with _take_pending()
+        :type operations: list
+        :raises Sync.ConflictError: The segment already exists, or a new
+        snapshot was written
+        :raises RuntimeError: Any failure to upload the data
+        """
+        text = json.dumps([op.data() for op in operations])
+        try:
+            self._upload(text, self._segment_path(seq), update=True)
+            # A snapshot written meanwhile may have removed an earlier segment
+            # of the same number, and then it doesn't include this one
+            self._storage.check()
+        except RuntimeError:
+            self._restore_pending(operations)
+            raise
+        with self.lock:
+            self._seq = seq
+            self._segments += 1
+            self._base[1].extend(operations)
+
+    def load(self):
+        """Download the notebook, and start recording its changes
+
+        :return: The notebook as of the most recent save
+        :rtype: :class:`Notebook`
+        :raises RuntimeError: Any failure to download the data
+        """
+        notebook, seq, segments, base = self._download_notebook()
+        with self.lock:
+            self.track(notebook)
+            self._seq = seq
+            self._segments = segments
+            self._base = base
+        return notebook
+
+    def _download_notebook(self):
+        """Download the notebook, with the changes of all log segments
+
+        :return: Tuple of (notebook, number of the last segment, number of
+        segments, notebook as kept in `_base`)
+        :rtype: tuple
+        :raises RuntimeError: Any failure to download the data
+        """
+        data = self._download()
+        with self.metrics.measure("notebook.load"):
+            notebook = Notebook.load(data, lazy=True)
+        seq = notebook.properties.get("log_seq", 0)
+        segments = [path for path in self._storage.list_log()
+                    if self._segment_seq(path) > seq]
+        operations = []
+        for path in segments:
+            for operation in json.loads(self._download(path)):
+                operations.append(Operation.from_data(operation))
+                notebook.apply(operations[-1])
+            seq = self._segment_seq(path)
+        return notebook, seq, len(segments), (data, operations)
+
+    def _merge(self):
+        """Merge the notebook in storage, saved by another session, into
+        the recorded one
+
+        The recorded operations are replaced by the ones turning the stored
+        notebook into the merged one, so the next save uploads them.
+
+        :raises RuntimeError: Any failure to download the data, or the lists
+        can't be merged
+        """
+        remote, seq, segments, base = self._download_notebook()
+        with self.lock:
+            if self._base is None:
+                common = Notebook()
+            else:
+                common = Notebook.load(self._base[0], lazy=True)
+                for operation in self._base[1]:
+                    common.apply(operation)
+            merged = merge(common, self._notebook, remote)
+
+            operations = []
+            remote.listeners.append(operations.append)
+            reconcile(remote, merged)
+            reconcile(self._notebook, merged)
+            self._pending = []
+            self._pending_size = 0
+            self._overflow = False
+            for operation in operations:
+                self._record(operation)
+            self._seq = seq
+            self._segments = segments
+            self._base = base
+            for listener in self.merge_listeners:
+                listener()
+
+    def _record(self, operation):
+        """Remember an operation until the next save
+
+        :param operation: The change made to the notebook
+        :type operation: :class:`Operation`
+        """
+        if self._overflow:
+            return  # The next save uploads a snapshot anyway
+        self._pending_size += operation.size()
+        self._pending.append(operation)
+        if self._pending_size > self.MAX_PENDING:
+            self._pending = []
+            self._pending_size = 0
+            self._overflow = True
+
+    def _take_pending(self):
+        """Remove and return all recorded operations
+
+        Must be called while holding the lock.
+
+        :return: The recorded operations
+        :rtype: list
+        """
+        operations = self._pending
+        self._pending = []
+        self._pending_size = 0
+        return operations
+
+    def _restore_pending(self, operations):
+        """Put back operations that failed to upload
+
+        :param operations: Operations previously taken with _take_pending()
+        :type operations: list
+        """
+        with self.lock:
+            self._pending = operations + self._pending
+            self._pending_size += sum(op.size() for op in operations)
+
+    def _save_snapshot(self, binary):
+        """Upload the whole notebook, and remove the log segments
+        it includes
+
+        :param binary: Use the binary format, rather than JSON
+        :type binary: bool
+        :raises Sync.ConflictError: Another session saved first
+        :raises RuntimeError: Any failure to upload the data
+        """
+        segments = self._storage.list_log()
+        with self.lock:
+            claim = self._seq is not None
+            if claim:  # The snapshot takes the place of the next segment
+                seq = self._seq + 1
+            else:  # Cover every segment written by anyone so far
+                seq = max((self._segment_seq(path) for path in segments),
+                          default=0)
+            self._notebook.properties["log_seq"] = seq
+            if binary:
+                with self.metrics.measure("notebook.encode"):
+                    text = self._notebook.encode()
+            else:
+                with self.metrics.measure("notebook.serialize"):
+                    text = self._notebook.serialize()
+            operations = self._take_pending()
+            overflow = self._overflow
+            self._overflow = False
+
+        try:
+            if claim:
+                self._upload(json.dumps([op.data() for op in operations]),
+                             self._segment_path(seq), update=True)
+                segments.append(self._segment_path(seq))
+            self._upload(text, update=claim)
+        except RuntimeError:
+            self._restore_pending(operations)
+            with self.lock:
+                self._overflow = self._overflow or overflow
+            raise
+        with self.lock:
+            self._seq = seq
+            self._segments = 0
+            self._base = (text, [])
+        self._storage.delete([path for path in segments
+                              if self._segment_seq(path) <= seq])
+
+    def _segment_path(self, seq):
+        """Return the storage path of a log segment
+
+        :param seq: Number of the segment
+        :type seq: int
+        :return: Path of the segment
+        :rtype: str
+        """
+        return f"{self._storage.LOG_PATH}/{seq:08d}.json"
+
+    @staticmethod
+    def _segment_seq(path):
+        """Return the number of a log segment from its path
+
+        :param path: Path of the segment
+        :type path: str
+        :return: Number of the segment, or -1 for unrelated files
+        :rtype: int
+        """
+        name, _ = posixpath.splitext(posixpath.basename(path))
+        return int(name) if name.isdecimal() else -1
+
+    def _upload(self, data, path=None, update=False):
+        """Upload a file, recording the time taken and its size
+
+        :param data: Data to store
+        :type data: str or bytes
+        :param path: File to write, defaults to the notebook
+        :type path: str, optional
+        :param update: Only write the file if nobody else did since it was
+        last read or written
+        :type update: bool, optional
+        :raises Sync.ConflictError: The file was changed by someone else
+        :raises RuntimeError: Any failure to upload the data
+        """
+        if path is None:
+            path = self._storage.REMOTE_PATH
+        with self.metrics.measure("storage.upload"):
+            self._storage.upload(data, path, update)
+        self.metrics.record_size("storage.upload", len(data))
+
+    def _download(self, path=None):
+        """Download a file, recording the time taken and its size
+
+        :param path: File to read, defaults to the notebook
+        :type path: str, optional
+        :return: Contents of the file
+        :rtype: bytes
+        :raises RuntimeError: Any failure to download the data
+        """
+        if path is None:
+            path = self._storage.REMOTE_PATH
+        with self.metrics.measure("storage.download"):
+            data = self._storage.download(path)
+        self.metrics.record_size("storage.download", len(data))
+        return data
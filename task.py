@@ -1,6 +1,3 @@
-from config import Config
-
-
 class Task:
     """A single entry of a to-do list
 
@@ -12,6 +9,8 @@ class Task:
     :type prio: bool, optional
     """
 
+    __slots__ = ("body", "done", "prio")
+
     def __init__(self, body, done=False, prio=False):
         """Constructor method
         """
@@ -20,20 +19,24 @@ class Task:
         self.prio = prio
 
     def __str__(self):
-        """Make tasks printable
+        """Make tasks printable, with done tasks shown as they are
+        """
+        return self.print()
 
-        Follows the print_done_tasks config var to adjust returned contents.
+    def print(self, done_style="yes"):
+        """Return the text shown for the task
+
+        :param done_style: How done tasks are shown, as in the
+        print_done_tasks setting: "yes", "no" or "hidden"
+        :type done_style: str, optional
+        :return: The task's text
+        :rtype: str
         """
-        if not self.done:
+        if not self.done or done_style == "yes":
             return self.body
-
-        print_type = Config.get("print_done_tasks")
-        if print_type == "no":
+        if done_style == "no":
             return ""
-        elif print_type == "hidden":
-            return "==="
-        else:  # print_type == "yes"
-            return self.body
+        return "==="  # done_style == "hidden"
 
     def data(self):
         """Return a dict representation of the task
@@ -0,0 +1,229 @@
+from array import array
+
+from blocklist import BlockList
+from task import Task
+
+
+class TaskStore(BlockList):
+    """A zero-based sequence of tasks, stored column by column
+
+    Rather than keeping a :class:`Task` object per task, each block stores
+    the UTF-8 bodies of its tasks back to back in a single string table,
+    their byte lengths in an array, and the done and prio flags of each task
+    as bits of a byte array. Tasks are created on access, as copies of
+    the stored values, so changing a retrieved task has no effect on
+    the store. Assign it back to store the change.
+
+    :param iterable: Initial tasks, defaults to empty
+    :type iterable: iterable, optional
+    :param block_size: Target number of tasks per block
+    :type block_size: int, optional
+    """
+
+    DEFAULT_BLOCK_SIZE = 128
+    DONE = 1  # Flag bit of done tasks
+    PRIO = 2  # Flag bit of priority tasks
+
+    def __init__(self, iterable=(), block_size=DEFAULT_BLOCK_SIZE):
+        """Constructor method
+        """
+        super().__init__(iterable, block_size)
+
+    def extend_encoded(self, bodies, flags):
+        """Add many tasks to the end of the sequence, without creating
+        a :class:`Task` object for each
+
+        :param bodies: UTF-8 encoded bodies of the tasks
+        :type bodies: list
+        :param flags: Flag bits of the tasks, in the same order
+        :type flags: bytearray
+        """
+        if len(bodies) == 0:
+            return
+        start = 0
+        if (len(self._blocks) > 0 and
+                len(self._blocks[-1]) < self._block_size):
+            start = self._block_size - len(self._blocks[-1])
+            self._blocks[-1].extend_encoded(bodies[:start], flags[:start])
+        for i in range(start, len(bodies), self._block_size):
+            block = _TaskChunk()
+            block.extend_encoded(bodies[i:i + self._block_size],
+                                 flags[i:i + self._block_size])
+            self._blocks.append(block)
+        self._len += len(bodies)
+        self._rebuild()
+
+    def iter_encoded(self):
+        """Iterate over all tasks in their stored form
+
+        :return: Iterator of (UTF-8 encoded body, flag bits) tuples
+        :rtype: iterator
+        """
+        for block in self._blocks:
+            bodies = block.bodies
+            pos = 0
+            for length, flags in zip(block.lengths, block.flags):
+                end = pos + length
+                yield bodies[pos:end], flags
+                pos = end
+
+    def count(self, flag):
+        """Count the tasks that have the provided flag set
+
+        :param flag: `DONE` or `PRIO`
+        :type flag: int
+        :return: Number of tasks with the flag
+        :rtype: int
+        """
+        both = self.DONE | self.PRIO
+        return sum(block.flags.count(flag) + block.flags.count(both)
+                   for block in self._blocks)
+
+    @classmethod
+    def flags_of(cls, task):
+        """Return the flag bits of a task
+
+        :param task: The task
+        :type task: :class:`Task`
+        :return: Flag bits, combining `DONE` and `PRIO`
+        :rtype: int
+        """
+        return (cls.DONE if task.done else 0) | (cls.PRIO if task.prio else 0)
+
+    def _new_block(self, values):
+        """Create a block holding the provided tasks
+
+        :param values: The tasks of the block
+        :type values: list
+        :return: The new block
+        :rtype: :class:`_TaskChunk`
+        """
+        block = _TaskChunk()
+        block.extend(values)
+        return block
+
+
+class _TaskChunk:
+    """A single block of a :class:`TaskStore`
+
+    Supports the subset of list methods used by :class:`BlockList`.
+    The start of a body in the string table is found by summing the lengths
+    of the bodies before it, so blocks are kept smaller than in a plain
+    :class:`BlockList`.
+    """
+
+    __slots__ = ("bodies", "lengths", "flags")
+
+    def __init__(self):
+        """Constructor method
+        """
+        self.bodies = bytearray()  # Bodies of all tasks, back to back
+        self.lengths = array("I")  # Byte length of each body
+        self.flags = bytearray()  # Flag bits of each task
+
+    def __len__(self):
+        """Return the number of tasks
+        """
+        return len(self.flags)
+
+    def __iter__(self):
+        """Iterate over copies of the tasks in order
+        """
+        bodies = self.bodies
+        pos = 0
+        for length, flags in zip(self.lengths, self.flags):
+            end = pos + length
+            yield Task(bodies[pos:end].decode(), flags & TaskStore.DONE != 0,
+                       flags & TaskStore.PRIO != 0)
+            pos = end
+
+    def __getitem__(self, index):
+        """Return a copy of a task, or a new block holding a slice
+        """
+        if isinstance(index, slice):
+            start, stop, _ = index.indices(len(self))
+            first, last = self._span(start, stop)
+            result = _TaskChunk()
+            result.bodies = self.bodies[first:last]
+            result.lengths = self.lengths[start:stop]
+            result.flags = self.flags[start:stop]
+            return result
+        first, last = self._span(index, index + 1)
+        flags = self.flags[index]
+        return Task(self.bodies[first:last].decode(),
+                    flags & TaskStore.DONE != 0, flags & TaskStore.PRIO != 0)
+
+    def __setitem__(self, index, task):
+        """Replace the task at an offset
+        """
+        first, last = self._span(index, index + 1)
+        body = task.body.encode()
+        self.bodies[first:last] = body
+        self.lengths[index] = len(body)
+        self.flags[index] = TaskStore.flags_of(task)
+
+    def __delitem__(self, index):
+        """Remove the task at an offset, or a slice of tasks
+        """
+        if isinstance(index, slice):
+            start, stop, _ = index.indices(len(self))
+        else:
+            start, stop = index, index + 1
+        first, last = self._span(start, stop)
+        del self.bodies[first:last]
+        del self.lengths[start:stop]
+        del self.flags[start:stop]
+
+    def insert(self, index, task):
+        """Insert a task before an offset
+        """
+        first, _ = self._span(index, index)
+        body = task.body.encode()
+        self.bodies[first:first] = body
+        self.lengths.insert(index, len(body))
+        self.flags.insert(index, TaskStore.flags_of(task))
+
+    def append(self, task):
+        """Add a task to the end of the block
+        """
+        body = task.body.encode()
+        self.bodies += body
+        self.lengths.append(len(body))
+        self.flags.append(TaskStore.flags_of(task))
+
+    def extend(self, tasks):
+        """Add many tasks to the end of the block
+        """
+        tasks = list(tasks)
+        self.extend_encoded([task.body.encode() for task in tasks],
+                            bytearray(map(TaskStore.flags_of, tasks)))
+
+    def extend_encoded(self, bodies, flags):
+        """Add many encoded tasks to the end of the block
+        """
+        self.bodies += b"".join(bodies)
+        self.lengths.extend(map(len, bodies))
+        self.flags += flags
+
+    def pop(self, index):
+        """Remove and return the task at an offset
+        """
+        first, last = self._span(index, index + 1)
+        flags = self.flags[index]
+        task = Task(self.bodies[first:last].decode(),
+                    flags & TaskStore.DONE != 0, flags & TaskStore.PRIO != 0)
+        del self[index]
+        return task
+
+    def _span(self, start, stop):
+        """Find the byte range of a range of tasks in the string table
+
+        :param start: Offset of the first task
+        :type start: int
+        :param stop: Offset after the last task
+        :type stop: int
+        :return: Tuple of (first byte, byte after the last)
+        :rtype: tuple
+        """
+        first = sum(self.lengths[:start])
+        return first, first + sum(self.lengths[start:stop])
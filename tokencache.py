@@ -0,0 +1,109 @@
+import os
+
+
+class TokenCache:
+    """Keeps the Dropbox refresh token on the local disk, encrypted
+
+    The token is encrypted with Fernet from the `cryptography` package.
+    The key is taken from the LISTS_TOKEN_KEY environment variable if set,
+    otherwise it's generated on first use, and stored in a separate file
+    readable only by the user. That file is kept next to the token, so
+    anyone who can read the directory can decrypt the token. Encryption
+    then only keeps the token from being read by someone who sees the
+    token file alone. Setting the environment variable keeps the key off
+    the disk. If `cryptography` is not installed, nothing is cached.
+
+    :param directory: Directory holding the cache files
+    :type directory: str
+    """
+
+    TOKEN_NAME = "dropbox.token"
+    KEY_NAME = "dropbox.key"
+    KEY_ENV = "LISTS_TOKEN_KEY"  # Environment variable with the key
+
+    def __init__(self, directory):
+        """Constructor method
+        """
+        self._token_path = os.path.join(directory, self.TOKEN_NAME)
+        self._key_path = os.path.join(directory, self.KEY_NAME)
+
+    def load(self):
+        """Return the cached token
+
+        :return: The refresh token, or `None` if there is no usable token
+        :rtype: str
+        """
+        fernet = self._fernet(create=False)
+        if fernet is None:
+            return None
+        try:
+            with open(self._token_path, "rb") as file:
+                return fernet.decrypt(file.read()).decode()
+        except Exception:  # Missing, damaged, or encrypted with another key
+            return None
+
+    def save(self, token):
+        """Store a token, replacing the cached one
+
+        Failures are ignored, the token is then just not cached.
+
+        :param token: The refresh token
+        :type token: str
+        """
+        try:
+            fernet = self._fernet(create=True)
+            if fernet is None:
+                return
+            self._write(self._token_path, fernet.encrypt(token.encode()))
+        except OSError:
+            pass
+
+    def clear(self):
+        """Remove the cached token
+        """
+        try:
+            os.remove(self._token_path)
+        except OSError:
+            pass
+
+    def _fernet(self, create):
+        """Return the cipher used for the token
+
+        :param create: Generate and store a key if there is none
+        :type create: bool
+        :raises OSError: Failure to store a new key
+        :return: The cipher, or `None` if it's not available
+        :rtype: :class:`cryptography.fernet.Fernet`
+        """
+        try:
+            from cryptography.fernet import Fernet
+        except ImportError:
+            return None
+        key = os.environ.get(self.KEY_ENV)
+        if key is None:
+            try:
+                with open(self._key_path, "rb") as file:
+                    key = file.read()
+            except OSError:
+                if not create:
+                    return None
+                key = Fernet.generate_key()
+                self._write(self._key_path, key)
+        try:
+            return Fernet(key)
+        except ValueError:  # Not a valid key
+            return None
+
+    @staticmethod
+    def _write(path, data):
+        """Write a file readable only by the user
+
+        :param path: Path of the file
+        :type path: str
+        :param data: Contents of the file
+        :type data: bytes
+        :raises OSError: Failure to write the file
+        """
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
@@ -0,0 +1,492 @@
+import csv
+import json
+import os
+import re
+from itertools import islice
+
+from notebook import Notebook
+from task import Task
+
+FORMATS = {".json": "json", ".csv": "csv", ".txt": "todo"}  # By extension
+CHUNK_SIZE = 1000  # Number of tasks written or added at once
+READ_SIZE = 65536  # Number of characters read from a file at once
+CSV_FIELDS = ["list", "body", "done", "prio"]
+DATE = re.compile(r"\d{4}-\d{2}-\d{2}")  # Creation or completion date
+PRIORITY = re.compile(r"\([A-Z]\)")  # Priority of a todo.txt task
+
+
+def file_format(path):
+    """Return the format of a file, from its extension
+
+    :param path: Path of the file
+    :type path: str
+    :raises ValueError: The extension is not supported
+    :return: "json", "csv" or "todo"
+    :rtype: str
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Unknown file type \"{extension}\", use "
+                         f"{', '.join(FORMATS)}")
+    return FORMATS[extension]
+
+
+def export_lists(lists, file, fmt):
+    """Write lists to a file, list by list
+
+    Text is generated in chunks of a few tasks, so the lists are never
+    converted to a single string.
+
+    :param lists: The lists to write
+    :type lists: iterable of :class:`List`
+    :param file: Text file to write to
+    :type file: :class:`io.TextIOBase`
+    :param fmt: Format of the file, as returned by file_format()
+    :type fmt: str
+    """
+    if fmt == "csv":
+        writer = csv.writer(file)
+        writer.writerow(CSV_FIELDS)
+        for rows in _csv_rows(lists):
+            writer.writerows(rows)
+        return
+    chunks = _json_chunks(lists) if fmt == "json" else _todo_chunks(lists)
+    for chunk in chunks:
+        file.write(chunk)
+
+
+def import_lists(file, fmt, default_name, max_length=None):
+    """Read lists from a file, a few tasks at a time
+
+    Yields tuples of (key, name, tasks). Tasks with the same key belong
+    to the same list, and the first tuple with a new key starts the list,
+    possibly without any tasks. In JSON files, every list gets its own
+    key, while in the other formats, tasks are grouped by list name.
+
+    :param file: Text file to read from
+    :type file: :class:`io.TextIOBase`
+    :param fmt: Format of the file, as returned by file_format()
+    :type fmt: str
+    :param default_name: Name of the list for todo.txt tasks without
+    a project
+    :type default_name: str
+    :param max_length: Max length of list names and task bodies, longer
+    ones are cut off, defaults to no limit
+    :type max_length: int, optional
+    :raises ValueError: The file is not valid
+    :return: Generator of (key, name, list of :class:`Task`)
+    :rtype: generator
+    """
+    if fmt == "json":
+        chunks = _read_json(file)
+    elif fmt == "csv":
+        chunks = _read_csv(file)
+    else:
+        chunks = _read_todo(file, default_name)
+    for key, name, tasks in chunks:
+        if max_length is not None:
+            name = name[:max_length]
+            for task in tasks:
+                task.body = task.body[:max_length]
+        yield key, name, tasks
+
+
+def _json_chunks(lists):
+    """Generate the notebook JSON format, as in :meth:`Notebook.data`
+
+    :param lists: The lists to write
+    :type lists: iterable of :class:`List`
+    :return: Generator of text chunks
+    :rtype: generator
+    """
+    yield f"{{\"version\": {Notebook.DATA_VERSION}, \"lists\": ["
+    for i, lst in enumerate(lists):
+        separator = ", " if i > 0 else ""
+        yield f"{separator}{{\"name\": {json.dumps(lst.name)}, \"tasks\": ["
+        first = True
+        for tasks in _chunks(lst):
+            text = ", ".join(json.dumps(task.data()) for task in tasks)
+            yield text if first else f", {text}"
+            first = False
+        yield "]}"
+    yield "]}\n"
+
+
+def _csv_rows(lists):
+    """Generate CSV rows, one per task, or one per empty list
+
+    :param lists: The lists to write
+    :type lists: iterable of :class:`List`
+    :return: Generator of lists of rows
+    :rtype: generator
+    """
+    for lst in lists:
+        if len(lst) == 0:
+            yield [[lst.name, "", "", ""]]
+        for tasks in _chunks(lst):
+            yield [[lst.name, task.body, "yes" if task.done else "no",
+                    "yes" if task.prio else "no"] for task in tasks]
+
+
+def _todo_chunks(lists):
+    """Generate todo.txt lines, with each list as a project
+
+    Empty lists are left out, as the format has no place for them.
+
+    :param lists: The lists to write
+    :type lists: iterable of :class:`List`
+    :return: Generator of text chunks
+    :rtype: generator
+    """
+    for lst in lists:
+        project = "+" + "_".join(lst.name.split())
+        for tasks in _chunks(lst):
+            lines = []
+            for task in tasks:
+                parts = []
+                if task.done:
+                    parts.append("x")
+                if task.prio:
+                    parts.append("(A)")
+                parts.append(" ".join(task.body.split()))
+                parts.append(project)
+                lines.append(" ".join(parts) + "\n")
+            yield "".join(lines)
+
+
+def _chunks(lst):
+    """Split the tasks of a list into chunks
+
+    :param lst: The list
+    :type lst: :class:`List`
+    :return: Generator of lists of at most CHUNK_SIZE tasks
+    :rtype: generator
+    """
+    tasks = iter(lst)
+    while True:
+        chunk = list(islice(tasks, CHUNK_SIZE))
+        if len(chunk) == 0:
+            return
+        yield chunk
+
+
+def _read_json(file):
+    """Read lists from the notebook JSON format
+
+    The file is parsed incrementally. A list's name must come before its
+    tasks, as written by :meth:`Notebook.serialize`.
+
+    :param file: Text file to read from
+    :type file: :class:`io.TextIOBase`
+    :raises ValueError: The file is not valid
+    :return: Generator of (key, name, tasks)
+    :rtype: generator
+    """
+    reader = _JsonReader(file)
+    for key in reader.keys():
+        if key == "version":
+            version = reader.value()
+            if version != Notebook.DATA_VERSION:
+                raise ValueError(f"Unsupported version {version}")
+        elif key == "lists":
+            for index in reader.items():
+                name = None
+                for list_key in reader.keys():
+                    if list_key == "name":
+                        name = reader.value()
+                        if not isinstance(name, str):
+                            raise ValueError("List name is not text")
+                        yield index, name, []
+                    elif list_key == "tasks":
+                        if name is None:
+                            raise ValueError("List tasks come before its name")
+                        tasks = []
+                        for _ in reader.items():
+                            tasks.append(_task(reader.value()))
+                            if len(tasks) == CHUNK_SIZE:
+                                yield index, name, tasks
+                                tasks = []
+                        if len(tasks) > 0:
+                            yield index, name, tasks
+                    else:
+                        reader.value()  # Unknown, skipped
+                if name is None:
+                    raise ValueError("List has no name")
+        else:
+            reader.value()  # Properties, not imported
+    reader.end()
+
+
+def _task(data):
+    """Create a task from its JSON representation, checking its contents
+
+    :param data: The task, as returned by :meth:`Task.data`
+    :type data: dict
+    :raises ValueError: The task is not valid
+    :return: The task
+    :rtype: :class:`Task`
+    """
+    if isinstance(data, dict):
+        body = data.get("body")
+        done = data.get("done", False)
+        prio = data.get("prio", False)
+        if (isinstance(body, str) and isinstance(done, bool) and
+                isinstance(prio, bool)):
+            return Task(body, done, prio)
+    raise ValueError(f"Task is not valid: {json.dumps(data)[:40]}")
+
+
+def _read_csv(file):
+    """Read lists from CSV rows, grouping tasks by list name
+
+    :param file: Text file to read from
+    :type file: :class:`io.TextIOBase`
+    :raises ValueError: The file is not valid
+    :return: Generator of (key, name, tasks)
+    :rtype: generator
+    """
+    reader = csv.DictReader(file)
+    if reader.fieldnames is None or not {"list", "body"}.issubset(
+            reader.fieldnames):
+        raise ValueError("CSV file must have \"list\" and \"body\" columns")
+    seen = set()
+    name = None
+    tasks = []
+    for row in reader:
+        if row["list"] != name or len(tasks) == CHUNK_SIZE:
+            if len(tasks) > 0:
+                yield name, name, tasks
+                tasks = []
+            name = row["list"]
+            if name not in seen:
+                seen.add(name)
+                yield name, name, []
+        if row["body"] not in ("", None):
+            tasks.append(Task(row["body"], _flag(row, "done", reader.line_num),
+                              _flag(row, "prio", reader.line_num)))
+    if len(tasks) > 0:
+        yield name, name, tasks
+
+
+def _flag(row, field, line):
+    """Read a yes/no column of a CSV row
+
+    :param row: The row
+    :type row: dict
+    :param field: Name of the column
+    :type field: str
+    :param line: Line number of the row, for errors
+    :type line: int
+    :raises ValueError: The value is not "yes" or "no"
+    :return: The value
+    :rtype: bool
+    """
+    value = (row.get(field) or "no").strip().lower()
+    if value not in ("yes", "no"):
+        raise ValueError(f"Line {line}: \"{field}\" must be yes or no")
+    return value == "yes"
+
+
+def _read_todo(file, default_name):
+    """Read lists from todo.txt lines, with each project as a list
+
+    A task without a project goes to the default list. Dates are dropped,
+    and a task of any priority is marked as priority.
+
+    :param file: Text file to read from
+    :type file: :class:`io.TextIOBase`
+    :param default_name: Name of the list for tasks without a project
+    :type default_name: str
+    :return: Generator of (key, name, tasks)
+    :rtype: generator
+    """
+    pending = {}  # List name -> tasks not added yet
+    for line in file:
+        words = line.split()
+        if len(words) == 0:
+            continue
+        done = words[0] == "x"
+        if done:
+            words.pop(0)
+        prio = len(words) > 0 and PRIORITY.fullmatch(words[0]) is not None
+        if prio:
+            words.pop(0)
+        while len(words) > 0 and DATE.fullmatch(words[0]):
+            words.pop(0)
+        name = default_name
+        for i in range(len(words) - 1, -1, -1):  # Written last by export
+            if words[i].startswith("+") and len(words[i]) > 1:
+                name = words[i][1:].replace("_", " ")
+                del words[i]
+                break
+
+        if name not in pending:
+            pending[name] = []
+            yield name, name, []
+        tasks = pending[name]
+        tasks.append(Task(" ".join(words), done, prio))
+        if len(tasks) == CHUNK_SIZE:
+            yield name, name, tasks
+            pending[name] = []
+    for name, tasks in pending.items():
+        if len(tasks) > 0:
+            yield name, name, tasks
+
+
+class _JsonReader:
+    """Reads a JSON document from a file a piece at a time
+
+    Objects and arrays are walked with keys() and items(), so only
+    the values read with value() are held in memory at once.
+
+    :param file: Text file to read from
+    :type file: :class:`io.TextIOBase`
+    """
+
+    _decoder = json.JSONDecoder()
+    _whitespace = re.compile(r"\s*")
+    # Characters from the end of the buffer that an error may be found at,
+    # and still be caused by a literal that continues in the next read
+    _SLACK = 16
+    _number_tail = re.compile(r"[-+.eE0-9]*")  # Rest of a number cut short
+
+    def __init__(self, file):
+        """Constructor method
+        """
+        self._file = file
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def keys(self):
+        """Walk an object, yielding each key before its value is read
+
+        :raises ValueError: There is no object, or it is not valid
+        :return: Generator of keys
+        :rtype: generator
+        """
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise ValueError(self._error("Expected a key"))
+            self._expect(":")
+            yield key
+            if not self._separator("}"):
+                return
+
+    def items(self):
+        """Walk an array, yielding the index of each item before it is read
+
+        :raises ValueError: There is no array, or it is not valid
+        :return: Generator of indices
+        :rtype: generator
+        """
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            if not self._separator("]"):
+                return
+
+    def value(self):
+        """Read a whole value
+
+        :raises ValueError: The value is not valid
+        :return: The value
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                # Reading more only helps if the error is at the end of
+                # the buffer, or in a string that is still open there
+                if self._eof or (
+                        len(self._buffer) - e.pos > self._SLACK and
+                        not e.msg.startswith("Unterminated string")):
+                    raise ValueError(self._error(e.msg))
+                self._fill()
+                continue
+            if not self._eof and (
+                    end == len(self._buffer) or
+                    type(value) in (int, float) and
+                    self._number_tail.fullmatch(self._buffer, end)):
+                self._fill()  # A number may continue in the next read
+                continue
+            self._pos = end
+            return value
+
+    def end(self):
+        """Make sure nothing but whitespace follows
+
+        :raises ValueError: There is more data
+        """
+        if self._peek() != "":
+            raise ValueError(self._error("Unexpected data"))
+
+    def _separator(self, closing):
+        """Read the separator after an item of an object or array
+
+        :param closing: Character closing the object or array
+        :type closing: str
+        :raises ValueError: Neither a comma nor the closing character follows
+        :return: `True` if another item follows
+        :rtype: bool
+        """
+        char = self._peek()
+        self._pos += 1
+        if char == ",":
+            return True
+        if char == closing:
+            return False
+        raise ValueError(self._error(f"Expected \",\" or \"{closing}\""))
+
+    def _expect(self, char):
+        """Read a single expected character
+
+        :param char: The character
+        :type char: str
+        :raises ValueError: Another character follows
+        """
+        if self._peek() != char:
+            raise ValueError(self._error(f"Expected \"{char}\""))
+        self._pos += 1
+
+    def _peek(self):
+        """Skip whitespace, and return the next character
+
+        :return: The character, or "" at the end of the file
+        :rtype: str
+        """
+        while True:
+            self._pos = self._whitespace.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer) or self._eof:
+                return self._buffer[self._pos:self._pos + 1]
+            self._fill()
+
+    def _fill(self):
+        """Read more of the file, dropping what was already parsed
+        """
+        data = self._file.read(READ_SIZE)
+        self._buffer = self._buffer[self._pos:] + data
+        self._pos = 0
+        self._eof = data == ""
+
+    def _error(self, message):
+        """Describe a parsing error
+
+        :param message: What went wrong
+        :type message: str
+        :return: The message, with the text around the position
+        :rtype: str
+        """
+        near = self._buffer[self._pos:self._pos + 20]
+        return f"{message} near \"{near}\"" if near else f"{message} at end"
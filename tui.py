@@ -1,19 +1,46 @@
 import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import namedtuple
 from enum import Enum, auto
 
-from colorama import just_fix_windows_console, Fore, Style
+from colorama import Fore, Style
 
 from config import Config
-from console import put, clear, put_at
+from console import Console
+from history import History
 from input import UserInput, Command, CommandList
 from list import List
+from localstorage import LocalStorage
+from metrics import Metrics
 from notebook import Notebook
-from storage import Storage
+from screen import Screen
+from search import SearchIndex
+from sync import Sync
 from task import Task
+from tokencache import TokenCache
+from transfer import export_lists, file_format, import_lists
+from worker import UploadWorker
 
 
 class TUI:
-    """Runs the interactive terminal-based interface for the app
+    """Runs the interactive terminal-based interface for a single session
+
+    Each session has its own notebook, state and settings, so a process
+    can serve many sessions at once, each on its own console.
+
+    :param console: The console of the session, defaults to the standard
+    input and output
+    :type console: :class:`Console`, optional
+    :param directory: Directory to keep lists in, defaults to none, which
+    keeps lists in memory only
+    :type directory: str, optional
+    :param files: Whether lists can be imported from, and exported to files
+    of the user's choice, which sessions served to others must not allow
+    :type files: bool, optional
     """
 
     class State(Enum):
@@ -21,17 +48,27 @@ class TUI:
         """
         NONE = 0  # Initial state
         HELP = auto()  # Help screen
+        SEARCH = auto()  # Search results
         LIST_VIEW = auto()  # Displaying list overview
         TASK_VIEW = auto()  # Displaying entries of a single list
         SETTINGS = auto()  # Program configuration
+        STATS = auto()  # Performance stats
         SHUTDOWN = auto()  # Shutdown requested
 
+    # Slow part of a command, deferred until the command returns. `run` is
+    # called without holding the lock, and may wait for the network. Its
+    # result is passed to `finish`, called with the lock held. If `wait` is
+    # set, no other command is read until the job is done.
+    Job = namedtuple("Job", ["run", "finish", "wait"])
+
     CONSOLE_SIZE = (80, 24)  # (w,h) column/row count
     SIDE_PANE_WIDTH = 16
     GENERAL_HELP = [
         "Lists is controlled with text commands. You can see the list of",
         "available commands in the pane on the right. Commands begin with",
-        "a keyword, sometimes followed by arguments.",
+        "a keyword, sometimes followed by arguments. Keywords can be",
+        "shortened, as long as only one command begins with the same",
+        f"letters, for example {Fore.GREEN}ren{Style.RESET_ALL} for rename.",
         "",
         "The argument \"#\" refers to an item index, for example the number",
         "of a list or a task. You can see the index next to each item",
@@ -56,50 +93,345 @@ class TUI:
         " commands."
     ]
     MAX_NAME_LENGTH = 40  # Max length of any user-provided string
+    TASKS_PER_PAGE = 19  # Max number of tasks before layout overflow
+    STATS_PER_PAGE = 19  # Max number of stats lines before layout overflow
+    EXIT_SAVE_TIMEOUT = 15  # Max seconds to wait for saving on exit
+    REFRESH_INTERVAL = 0.5  # Seconds between checks of the status line
+    # Errors that a command can fail with, shown to the user
+    COMMAND_ERRORS = (IndexError, ValueError, TypeError, RuntimeError,
+                      CommandList.CommandNameError)
+    ANSI_CODE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")  # Color or cursor code
+    # States showing lines of text, which any input exits
+    TEXT_STATES = (State.HELP, State.SEARCH, State.STATS)
+
+    def __init__(self, console=None, directory=None, files=False):
+        """Constructor method
+        """
+        self.console = Console() if console is None else console
+        self.directory = directory
+        self.files = files
+        self.state = self.State.NONE  # Current view of the state machine
+        self.previous_states = []  # State "undo" support
+        self.active_list = None  # Currently viewed list in task view
+        self.active_page = 1  # Page of the active list shown in task view
+        # Whether the user was shown the error about unsaved changes
+        self.upload_warning_shown = False
+
+        # Commands available in each state
+        self.list_view_commands = CommandList()
+        self.task_view_commands = CommandList()
+        self.settings_commands = CommandList()
+
+        # Feedback from the most recent command
+        self.last_result = "Welcome to Lists. Type \"help\" for assistance."
+        self.help_text = []  # Lines shown on the screen in the help state
+        self.search_results = []  # Lines shown in the search state
+        self.stats_text = []  # Lines printed in the stats state of a batch
+        self.stats_pages = []  # Compacted tables shown in the stats state
+        self.stats_page = 0  # Index of the stats page shown
+
+        self.config = Config()  # Settings of this session
+        self.notebook = Notebook()  # All to-do lists owned by the user
+        self.storage = None  # Dropbox connection
+        self.local = None  # Copy of the notebook on the local disk, if enabled
+        self.sync = None  # Uploads changes of the notebook to storage
+        self.worker = None  # Runs uploads in the background
+        self.lock = threading.RLock()  # Held while the notebook is modified
+        self.search = SearchIndex(self.lock)  # Word index of the notebook
+        self.history = History(self._undo_budget())  # Undo and redo support
+        self.metrics = Metrics()  # Timings and sizes, once recording is on
+        # Frame buffer, sends only changed cells
+        self.screen = Screen(self.CONSOLE_SIZE, self.console)
+        self._loop = None  # Event loop running the session, if any
+        self._deferred = None  # Job deferred by the running command
+        self._background = None  # Task of the job running in the background
+        self._busy = False  # Whether a job is using the console
+        self._shown_status = None  # Status line as last drawn
+        self.config.listeners.append(self._setting_changed)
+        self._add_commands()
+
+    def run(self):
+        """Run the main loop, until the user exits or the input ends
+
+        Commands that wait for the network, like "load", hold up the loop
+        until they're done. This is the fallback for :meth:`run_async`.
+        """
+        if self.state == self.State.NONE:
+            self.start()
+        while self.state != self.State.SHUTDOWN:
+            self._render()
+            try:
+                command = self.console.input()
+            except EOFError:
+                break  # The terminal was closed
+            job = self._handle(command)
+            if job is not None:
+                self._run_job(job)
+        if self.worker is not None:
+            self.worker.stop()
+
+    async def run_async(self):
+        """Run the main loop as a coroutine, until the user exits or
+        the input ends
+
+        Input is read, and network requests are made, in the executor of
+        the event loop. Lists are loaded in the background, while other
+        commands can be used. The status line is redrawn periodically,
+        so the progress of saving shows up without waiting for input.
+        """
+        import asyncio  # Imported by the caller already, after startup
+        self._loop = asyncio.get_running_loop()
+        if self.state == self.State.NONE:
+            self.start()
+        refresher = self._loop.create_task(
+            self._refresh_periodically())
+        try:
+            while self.state != self.State.SHUTDOWN:
+                self._render()
+                try:
+                    command = await self._loop.run_in_executor(
+                        None, self.console.input)
+                except EOFError:
+                    break  # The terminal was closed
+                job = self._handle(command)
+                if job is None:
+                    continue
+                if job.wait:
+                    self._busy = True
+                    try:
+                        await self._run_job_async(job)
+                    finally:
+                        self._busy = False
+                else:
+                    self._background = self._loop.create_task(
+                        self._run_in_background(job))
+        finally:
+            refresher.cancel()
+            if self.worker is not None:
+                self.worker.stop()
+
+    def run_batch(self, lines, errors=None):
+        """Run commands from a script, one per line, without drawing
+        anything
+
+        Commands are dispatched the same way as in the main loop. Empty
+        lines, and lines starting with "#", are skipped. Screens that would
+        wait for input, like help or search results, are printed to
+        the console and closed right away. Failed commands are reported
+        with their line number, followed by a summary once the script ends.
+        Changes are written to the local disk at the end, and pending saves
+        are waited for.
+
+        :param lines: The script, as an iterable of lines
+        :type lines: iterable
+        :param errors: Stream to report failures and the summary to,
+        defaults to stderr
+        :type errors: :class:`io.TextIOBase`, optional
+        :return: Number of commands that failed
+        :rtype: int
+        """
+        errors = sys.stderr if errors is None else errors
+        self._load_lists()
+        count = 0
+        failures = 0
+        started = time.perf_counter()
+        for number, line in enumerate(lines, 1):
+            command = line.strip()
+            if command == "" or command.startswith("#"):
+                continue
+            count += 1
+            with self.lock:
+                try:
+                    self._execute(command)
+                    error = None
+                except self.COMMAND_ERRORS as e:
+                    error = e
+                job, self._deferred = self._deferred, None
+            if job is not None:
+                try:
+                    result = job.run()
+                    with self.lock:
+                        job.finish(result)
+                except self.COMMAND_ERRORS as e:
+                    error = e
+            with self.lock:
+                self.history.commit()
+            if error is not None:
+                failures += 1
+                errors.write(f"{number}: {command}: {error}\n")
+            if self.state in self.TEXT_STATES:
+                lines_shown = self._text_lines()
+                for shown in lines_shown:
+                    self.console.put(self.ANSI_CODE.sub("", f"{shown}\n"))
+                self._undo_state()
+            if self.state == self.State.SHUTDOWN:
+                break
+
+        if self.local is not None:
+            try:
+                self.local.flush()
+            except RuntimeError as e:
+                failures += 1
+                errors.write(f"{e}\n")
+            self.local.close()
+        if self.worker is not None:
+            if not self.worker.flush(self.EXIT_SAVE_TIMEOUT):
+                failures += 1
+                reason = self.worker.error or "timed out"
+                errors.write(f"Failed to save your lists: {reason}\n")
+            self.worker.stop()
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed > 0 else 0
+        errors.write(f"Ran {count} commands in {elapsed:.2f}s "
+                     f"({rate:.0f} commands/s), {failures} failed.\n")
+        return failures
+
+    def start(self):
+        """Load lists kept on disk, or set up example content, and draw
+        the first frame
+
+        The main loops call this, unless it was called before.
+        """
+        self._load_lists()
+        self._render()
+
+    def _load_lists(self):
+        """Load lists kept on disk, or set up example content
+        """
+        self.state = self.State.LIST_VIEW
+        if self.directory is not None:
+            self.local = LocalStorage(self.directory)
+            self.config.update(self.local.load_settings())
+        if self.local is not None and self.local.has_notebook():
+            self.notebook = self.local.load()
+        else:
+            test_list = List("Example list")
+            test_list.add(Task("Incomplete task"))
+            test_list.add(Task("Important task"))
+            test_list.add(Task("Completed task"))
+            test_list.set_prio(2, True)
+            test_list.set_done(3, True)
+            self.notebook.add(test_list)
+            if self.local is not None:
+                self.local.track(self.notebook)
+        self.search.track(self.notebook)
+        self.history.track(self.notebook)
+
+    def _handle(self, command):
+        """Run a user-input command
+
+        :param command: Command as input by the user
+        :type command: str
+        :return: The job deferred by the command, if any
+        :rtype: :class:`TUI.Job`
+        """
+        self.screen.discard_input()
+        with self.lock:
+            self._parse(command)
+            self.history.commit()
+            job, self._deferred = self._deferred, None
+            if self.local is not None:
+                self._flush_local()
+        self._autosave()
+        return job
+
+    def _run_job(self, job):
+        """Run a deferred job, and finish it
+
+        :param job: The job
+        :type job: :class:`TUI.Job`
+        """
+        try:
+            result = job.run()
+        except self.COMMAND_ERRORS as e:
+            self._fail_job(e)
+            return
+        self._finish_job(job, result)
+
+    async def _run_job_async(self, job):
+        """Run a deferred job in the executor, and finish it
+
+        :param job: The job
+        :type job: :class:`TUI.Job`
+        """
+        try:
+            result = await self._loop.run_in_executor(None, job.run)
+        except self.COMMAND_ERRORS as e:
+            self._fail_job(e)
+            return
+        self._finish_job(job, result)
 
-    state = State.NONE  # Current view of the global state machine
-    previous_states = []  # State "undo" support
-    active_list = None  # Reference to currently viewed list in task view
-    # Whether the user was shown the error about unsaved changes
-    upload_warning_shown = False
+    async def _run_in_background(self, job):
+        """Run a deferred job while other commands are handled, then show
+        its result
 
-    list_view_commands = CommandList()  # Commands available in LIST_VIEW state
-    task_view_commands = CommandList()  # Commands available in TASK_VIEW state
-    settings_commands = CommandList()  # Commands available in SETTINGS state
+        :param job: The job
+        :type job: :class:`TUI.Job`
+        """
+        try:
+            await self._run_job_async(job)
+        finally:
+            self._background = None
+        self._render(keep_cursor=True)
+
+    def _finish_job(self, job, result):
+        """Apply the result of a deferred job
+
+        :param job: The job
+        :type job: :class:`TUI.Job`
+        :param result: Value returned by the job
+        """
+        with self.lock:
+            try:
+                job.finish(result)
+            except self.COMMAND_ERRORS as e:
+                self.last_result = f"{Fore.RED}{e}{Style.RESET_ALL}"
+            self.history.commit()
+            if self.local is not None:
+                self._flush_local()
 
-    # Feedback from the most recent command
-    last_result = "Welcome to Lists. Type \"help\" for assistance."
-    help_text = []  # List of lines shown on the screen in the help state
+    def _fail_job(self, error):
+        """Show the error of a deferred job
 
-    notebook = Notebook()  # All to-do lists owned by the user
-    storage = None  # Dropbox connection
+        Changes the job made before failing, like part of an import,
+        are kept, and can be undone.
 
-    @classmethod
-    def run(cls):
-        """Initialize the terminal interface and run the main loop
+        :param error: The error raised by the job
+        :type error: :class:`Exception`
         """
-        # Initialize
-        just_fix_windows_console()
-        cls.state = cls.State.LIST_VIEW
+        self.last_result = f"{Fore.RED}{error}{Style.RESET_ALL}"
+        with self.lock:
+            self.history.commit()
 
-        # Set up commands
-        exit_command = Command("exit", cls._cmd_exit, [
+    async def _refresh_periodically(self):
+        """Redraw the screen whenever the status line changes
+        """
+        import asyncio
+        while True:
+            await asyncio.sleep(self.REFRESH_INTERVAL)
+            if not self._busy and self._status() != self._shown_status:
+                self._render(keep_cursor=True)
+
+    def _add_commands(self):
+        """Set up the commands of each state
+        """
+        exit_command = Command("exit", self._cmd_exit, [
             f"Syntax: {Fore.GREEN}exit{Style.RESET_ALL}",
             "",
             "Leave the program immediately. All changes are saved."
         ])
-        cls.list_view_commands.add(exit_command)
-        cls.task_view_commands.add(exit_command)
-        cls.settings_commands.add(exit_command)
-        back_command = Command("back", cls._cmd_back, [
+        self.list_view_commands.add(exit_command)
+        self.task_view_commands.add(exit_command)
+        self.settings_commands.add(exit_command)
+        back_command = Command("back", self._cmd_back, [
             f"Syntax: {Fore.GREEN}back{Style.RESET_ALL}",
             "",
             "Return to the previous screen. For example, in task view,",
             "it will bring you back to list view."
         ])
-        cls.task_view_commands.add(back_command)
-        cls.settings_commands.add(back_command)
-        help_command = Command("help", cls._cmd_help, [
+        self.task_view_commands.add(back_command)
+        self.settings_commands.add(back_command)
+        help_command = Command("help", self._cmd_help, [
             f"Syntax (1): {Fore.GREEN}help{Style.RESET_ALL}",
             f"Syntax (2): {Fore.GREEN}help ...{Style.RESET_ALL}",
             "",
@@ -111,85 +443,172 @@ class TUI:
             "example, in task view you won't be able to get help about",
             "list-specific commands."
         ], has_text_arg=True)
-        cls.list_view_commands.add(help_command)
-        cls.task_view_commands.add(help_command)
-        cls.settings_commands.add(help_command)
-        settings_command = Command("settings", cls._cmd_settings, [
+        self.list_view_commands.add(help_command)
+        self.task_view_commands.add(help_command)
+        self.settings_commands.add(help_command)
+        settings_command = Command("settings", self._cmd_settings, [
             f"Syntax: {Fore.GREEN}settings{Style.RESET_ALL}",
             "",
             "Enter the settings. Here you can change some program behavior,",
             "as well as storage credentials. All settings are",
             "automatically saved."
         ])
-        cls.list_view_commands.add(settings_command)
-        connect_command = Command("connect", cls._cmd_connect, [
+        self.list_view_commands.add(settings_command)
+        stats_command = Command("stats", self._cmd_stats, [
+            f"Syntax (1): {Fore.GREEN}stats{Style.RESET_ALL}",
+            f"Syntax (2): {Fore.GREEN}stats on|off|reset{Style.RESET_ALL}",
+            "",
+            "In the (1) form, display how long commands, drawing the screen,",
+            "and saving and loading took, and how much data they handled.",
+            "",
+            "In the (2) form, start or stop recording these stats, or forget",
+            "the recorded ones. Recording is off until turned on."
+        ], has_text_arg=True)
+        self.list_view_commands.add(stats_command)
+        self.task_view_commands.add(stats_command)
+        self.settings_commands.add(stats_command)
+        connect_command = Command("connect", self._cmd_connect, [
             f"Syntax: {Fore.GREEN}connect{Style.RESET_ALL}",
             "",
             "Start the Dropbox connection wizard. You will need to open a URL",
             "in the browser, log in to Dropbox, and paste back",
             "an authorization code. If already authorized, the connection",
-            "will be replaced with a new one."
+            "will be replaced with a new one.",
+            "",
+            "When run locally, the authorization is remembered, so in later",
+            "sessions the first connect doesn't need the wizard."
+        ])
+        self.list_view_commands.add(connect_command)
+        undo_command = Command("undo", self._cmd_undo, [
+            f"Syntax: {Fore.GREEN}undo{Style.RESET_ALL}",
+            "",
+            "Revert the changes made by the last command that changed your",
+            "lists, like adding, removing or renaming a task or a list.",
+            "Run it again to revert earlier commands. Only the most recent",
+            "commands are remembered, up to the memory set in the settings."
+        ])
+        self.list_view_commands.add(undo_command)
+        self.task_view_commands.add(undo_command)
+        redo_command = Command("redo", self._cmd_redo, [
+            f"Syntax: {Fore.GREEN}redo{Style.RESET_ALL}",
+            "",
+            "Make the changes reverted by the last undo again. Undone changes",
+            "can be redone until another command changes your lists."
         ])
-        cls.list_view_commands.add(connect_command)
-        list_enter_command = Command("", cls._cmd_list_enter, [],
+        self.list_view_commands.add(redo_command)
+        self.task_view_commands.add(redo_command)
+        list_enter_command = Command("", self._cmd_list_enter, [],
                                      has_index_arg=True,
                                      index_arg_required=True)
-        cls.list_view_commands.add(list_enter_command)
-        list_add_command = Command("add", cls._cmd_list_add, [
+        self.list_view_commands.add(list_enter_command)
+        list_add_command = Command("add", self._cmd_list_add, [
             f"Syntax: {Fore.GREEN}add ...{Style.RESET_ALL}",
             "",
             "Add a new empty list with the provided name. After adding",
             "the list, you will probably want to enter it with",
             "the \"#\" command (just the list index), and add some tasks",
             "to it.",
-            f"The list name can be up to {cls.MAX_NAME_LENGTH} characters long."
+            f"The list name can be up to {self.MAX_NAME_LENGTH} characters long."
 
         ], has_text_arg=True, text_arg_required=True)
-        cls.list_view_commands.add(list_add_command)
-        list_remove_command = Command("remove", cls._cmd_list_remove, [
+        self.list_view_commands.add(list_add_command)
+        list_remove_command = Command("remove", self._cmd_list_remove, [
             f"Syntax: {Fore.GREEN}remove #{Style.RESET_ALL}",
             "",
-            "Remove the list under the given index. Be very careful with this",
-            "command, and always double-check the index - there is currently",
-            "no way to undo this operation."
+            "Remove the list under the given index, along with its tasks.",
+            "If you remove the wrong list, the \"undo\" command brings it",
+            "back."
         ], has_index_arg=True, index_arg_required=True)
-        cls.list_view_commands.add(list_remove_command)
-        list_rename_command = Command("rename", cls._cmd_list_rename, [
+        self.list_view_commands.add(list_remove_command)
+        list_rename_command = Command("rename", self._cmd_list_rename, [
             f"Syntax: {Fore.GREEN}rename # ...{Style.RESET_ALL}",
             "",
             "Change the name of a list under the given index. The contents",
             "of the list stay unchanged.",
-            f"The list name can be up to {cls.MAX_NAME_LENGTH} characters long."
+            f"The list name can be up to {self.MAX_NAME_LENGTH} characters long."
         ], has_index_arg=True, index_arg_required=True, has_text_arg=True,
                                       text_arg_required=True)
-        cls.list_view_commands.add(list_rename_command)
-        task_add_command = Command("add", cls._cmd_task_add, [
+        self.list_view_commands.add(list_rename_command)
+        list_find_command = Command("find", self._cmd_list_find, [
+            f"Syntax: {Fore.GREEN}find ...{Style.RESET_ALL}",
+            "",
+            "Find the lists and tasks containing all the given words, in any",
+            "order. Letter case doesn't matter, but words must be complete,",
+            "so \"milk\" finds \"Buy milk\", but \"mil\" doesn't.",
+            "",
+            "Each result shows the index of the list, followed by the index",
+            "of the task within the list."
+        ], has_text_arg=True, text_arg_required=True)
+        self.list_view_commands.add(list_find_command)
+        if self.files:
+            import_command = Command("import", self._cmd_import, [
+                f"Syntax: {Fore.GREEN}import ...{Style.RESET_ALL}",
+                "",
+                "Add the lists from a file, given by its path. The file type",
+                "is chosen by the extension: .json for the format used by",
+                "save, .csv with \"list\", \"body\", \"done\" and \"prio\"",
+                "columns, or .txt for todo.txt, with a list for each project.",
+                "Imported lists are added next to the existing ones.",
+                "",
+                "Files of any size can be imported, as they are read a few",
+                "tasks at a time."
+            ], has_text_arg=True, text_arg_required=True,
+                                     limit_text_arg=False)
+            self.list_view_commands.add(import_command)
+            export_command = Command("export", self._cmd_export, [
+                f"Syntax: {Fore.GREEN}export ...{Style.RESET_ALL}",
+                "",
+                "Write all lists to a file, given by its path. The file type",
+                "is chosen by the extension, the same way as for import.",
+                "An existing file is overwritten."
+            ], has_text_arg=True, text_arg_required=True,
+                                     limit_text_arg=False)
+            self.list_view_commands.add(export_command)
+        task_add_command = Command("add", self._cmd_task_add, [
             f"Syntax: {Fore.GREEN}add ...{Style.RESET_ALL}",
             "",
             "Add a task to the list. The task will be added at the end,",
             "in an un-done state.",
-            f"The task name can be up to {cls.MAX_NAME_LENGTH} characters long."
+            f"The task name can be up to {self.MAX_NAME_LENGTH} characters long."
         ], has_text_arg=True, text_arg_required=True)
-        cls.task_view_commands.add(task_add_command)
-        task_remove_command = Command("remove", cls._cmd_task_remove, [
+        self.task_view_commands.add(task_add_command)
+        task_remove_command = Command("remove", self._cmd_task_remove, [
             f"Syntax: {Fore.GREEN}remove #{Style.RESET_ALL}",
             "",
-            "Remove the task under the given index. Be very careful with this",
-            "command, and always double-check the index - there is currently",
-            "no way to undo this operation. Consider marking the task as done",
-            "instead."
+            "Remove the task under the given index. If you remove the wrong",
+            "task, the \"undo\" command brings it back. Consider marking",
+            "the task as done instead."
         ], has_index_arg=True, index_arg_required=True)
-        cls.task_view_commands.add(task_remove_command)
-        task_rename_command = Command("rename", cls._cmd_task_rename, [
+        self.task_view_commands.add(task_remove_command)
+        task_rename_command = Command("rename", self._cmd_task_rename, [
             f"Syntax: {Fore.GREEN}rename #{Style.RESET_ALL}",
             "",
             "Edit the task under the given index. The task will stay marked",
             "as done or priority, only the text will change.",
-            f"The task name can be up to {cls.MAX_NAME_LENGTH} characters long."
+            f"The task name can be up to {self.MAX_NAME_LENGTH} characters long."
+        ], has_index_arg=True, index_arg_required=True, has_text_arg=True,
+                                      text_arg_required=True)
+        self.task_view_commands.add(task_rename_command)
+        task_insert_command = Command("insert", self._cmd_task_insert, [
+            f"Syntax: {Fore.GREEN}insert # ...{Style.RESET_ALL}",
+            "",
+            "Add a task to the list at the given index. The task previously",
+            "at that index, and all the tasks after it, move down by one.",
+            f"The task name can be up to {self.MAX_NAME_LENGTH} characters long."
         ], has_index_arg=True, index_arg_required=True, has_text_arg=True,
                                       text_arg_required=True)
-        cls.task_view_commands.add(task_rename_command)
-        task_done_command = Command("done", cls._cmd_task_done, [
+        self.task_view_commands.add(task_insert_command)
+        task_move_command = Command("move", self._cmd_task_move, [
+            f"Syntax: {Fore.GREEN}move # ...{Style.RESET_ALL}",
+            "",
+            "Move the task under the given index to a new position.",
+            "The text argument is the index the task will have after",
+            f"the move, for example {Fore.GREEN}move 5 1{Style.RESET_ALL}"
+            " moves the fifth task to the top."
+        ], has_index_arg=True, index_arg_required=True, has_text_arg=True,
+                                    text_arg_required=True)
+        self.task_view_commands.add(task_move_command)
+        task_done_command = Command("done", self._cmd_task_done, [
             f"Syntax: {Fore.GREEN}done #{Style.RESET_ALL}",
             "",
             "Mark a task as done, or undo the mark to turn the task active",
@@ -197,8 +616,8 @@ class TUI:
             "just greyed out, printed with replacement text,",
             "or skipped entirely."
         ], has_index_arg=True, index_arg_required=True)
-        cls.task_view_commands.add(task_done_command)
-        task_prio_command = Command("prio", cls._cmd_task_prio, [
+        self.task_view_commands.add(task_done_command)
+        task_prio_command = Command("prio", self._cmd_task_prio, [
             f"Syntax: {Fore.GREEN}prio #{Style.RESET_ALL}",
             "",
             "Mark a task as priority, or undo the mark to restore normal",
@@ -206,8 +625,17 @@ class TUI:
             "printed with a color accent. It has no effect on tasks marked",
             "as done."
         ], has_index_arg=True, index_arg_required=True)
-        cls.task_view_commands.add(task_prio_command)
-        settings_set_command = Command("set", cls._cmd_settings_set, [
+        self.task_view_commands.add(task_prio_command)
+        task_page_command = Command("page", self._cmd_task_page, [
+            f"Syntax: {Fore.GREEN}page #{Style.RESET_ALL}",
+            "",
+            f"Show a different page of the list. Each page holds up to "
+            f"{self.TASKS_PER_PAGE}",
+            "tasks. The current page number is shown in the header",
+            "when the list doesn't fit on a single page."
+        ], has_index_arg=True, index_arg_required=True)
+        self.task_view_commands.add(task_page_command)
+        settings_set_command = Command("set", self._cmd_settings_set, [
             f"Syntax: {Fore.GREEN}set # ...{Style.RESET_ALL}",
             "",
             "Change a setting under the provided index to a different value.",
@@ -215,79 +643,146 @@ class TUI:
             "the value must match one of them."
         ], has_index_arg=True, index_arg_required=True, has_text_arg=True,
                                        text_arg_required=True)
-        cls.settings_commands.add(settings_set_command)
-
-        # Set up example content
-        test_list = List("Example list")
-        test_list.add(Task("Incomplete task"))
-        test_list.add(Task("Important task"))
-        test_list.add(Task("Completed task"))
-        test_list[2].prio = True
-        test_list[3].done = True
-        cls.notebook.add(test_list)
-
-        # Main loop
-        while cls.state != cls.State.SHUTDOWN:
-            cls._render()
-            put_at(0, cls.CONSOLE_SIZE[1] - 1, "> ")
-            command = input()
-            cls._parse(command)
-
-    @classmethod
-    def _render(cls):
+        self.settings_commands.add(settings_set_command)
+
+    def _render(self, keep_cursor=False):
         """Redraw the screen contents
+
+        The frame is drawn into the screen buffer, and only the differences
+        from the previous frame are written to the terminal, with a single
+        write. The lock is held meanwhile, so that changes made by other
+        threads, like merging lists saved by another session, aren't drawn
+        halfway.
+
+        :param keep_cursor: Leave the cursor where it is, rather than
+        at the prompt, so that a command being typed isn't disturbed
+        :type keep_cursor: bool, optional
+        """
+        with self.lock, self.metrics.measure("render"):
+            self._draw(keep_cursor)
+        self.metrics.record_size("frame", self.console.frame.bytes)
+
+    def _draw(self, keep_cursor):
+        """Draw a frame, see _render()
+
+        The frame is closed even if drawing fails, so later output isn't
+        held back, and the whole screen is then redrawn next time.
+
+        :param keep_cursor: Leave the cursor where it is
+        :type keep_cursor: bool
+        """
+        frame = self.console.frame
+        frame.begin()
+        try:
+            self._draw_screen(keep_cursor)
+        except BaseException:
+            self.screen.invalidate()  # Its copy may not match the terminal
+            raise
+        finally:
+            frame.end()
+
+    def _draw_screen(self, keep_cursor):
+        """Draw the contents of a frame into the screen, and present them
+
+        :param keep_cursor: Leave the cursor where it is
+        :type keep_cursor: bool
         """
-        clear(cls.CONSOLE_SIZE)
+        screen = self.screen
 
-        if cls.state == cls.State.HELP:
+        if self.state == self.State.HELP:
             # Print the header
-            put_at(0, 0, "=== HELP ===\n")
-            put("\n")
+            screen.put_at(0, 0, "=== HELP ===\n")
+            screen.put("\n")
             # Print help text
-            for line in cls.help_text:
-                put(f"{line}\n")
+            for line in self.help_text:
+                screen.put(f"{line}\n")
+
+        if self.state == self.State.SEARCH:
+            # Print the header
+            screen.put_at(0, 0, "=== SEARCH ===\n")
+            screen.put("\n")
+            # Print the results
+            for line in self.search_results:
+                screen.put(f"{line}\n")
 
-        if cls.state == cls.State.LIST_VIEW:
+        if self.state == self.State.STATS:
             # Print the header
-            put_at(0, 0, "=== LISTS ===\n")
-            put("\n")
-            put(f"{cls.notebook}\n")
+            screen.put_at(0, 0, "=== STATS ===\n")
+            screen.put("\n")
+            # Print the histograms
+            for line in self.stats_pages[self.stats_page]:
+                screen.put(f"{line}\n")
 
-        if cls.state == cls.State.SETTINGS:
+        if self.state == self.State.LIST_VIEW:
             # Print the header
-            put_at(0, 0, "=== SETTINGS ===\n")
-            put("\n")
-            put(Config.print())
+            screen.put_at(0, 0, "=== LISTS ===\n")
+            screen.put("\n")
+            screen.put(f"{self.notebook}\n")
 
-        if cls.state == cls.State.TASK_VIEW:
+        if self.state == self.State.SETTINGS:
             # Print the header
-            put_at(0, 0, "=== TASKS ===\n")
-            put("\n")
+            screen.put_at(0, 0, "=== SETTINGS ===\n")
+            screen.put("\n")
+            screen.put(self.config.print())
+
+        if self.state == self.State.TASK_VIEW:
+            # Print the header
+            page_count = self._page_count()
+            self.active_page = min(self.active_page, page_count)
+            if page_count > 1:
+                page = f"{self.active_page}/{page_count}"
+                screen.put_at(0, 0, f"=== TASKS ({page}) ===\n")
+            else:
+                screen.put_at(0, 0, "=== TASKS ===\n")
+            screen.put("\n")
 
             # Print the tasks
-            put(cls.active_list)
+            first = (self.active_page - 1) * self.TASKS_PER_PAGE + 1
+            screen.put(self.active_list.print_range(
+                first, self.TASKS_PER_PAGE,
+                self.config.get("print_done_tasks")))
 
         if (
-                cls.state == cls.State.LIST_VIEW or
-                cls.state == cls.State.TASK_VIEW or
-                cls.state == cls.State.SETTINGS):
+                self.state == self.State.LIST_VIEW or
+                self.state == self.State.TASK_VIEW or
+                self.state == self.State.SETTINGS):
             # Print the sidebar
-            sidebar_offset = cls.CONSOLE_SIZE[0] - cls.SIDE_PANE_WIDTH - 1
+            sidebar_offset = self.CONSOLE_SIZE[0] - self.SIDE_PANE_WIDTH - 1
             y_pos = 0
-            put_at(sidebar_offset, y_pos, f" === COMMANDS ===\n")
+            screen.put_at(sidebar_offset, y_pos, f" === COMMANDS ===\n")
             y_pos += 1
-            invocations = str(cls._get_command_list()).split("\n")
+            invocations = str(self._get_command_list()).split("\n")
             for invocation in invocations:
-                put_at(sidebar_offset, y_pos, f"| {invocation}\n")
+                screen.put_at(sidebar_offset, y_pos, f"| {invocation}\n")
                 y_pos += 1
 
-        # Print the result message
-        result_height = int(math.ceil(len(cls.last_result) / 80))
-        put_at(0, cls.CONSOLE_SIZE[1] - 1 - result_height,
-               f"{cls.last_result}\n")
+        # Print the result message, followed by sync status
+        result = self._status()
+        self._shown_status = result
+        result_height = int(math.ceil(len(result) / 80))
+        screen.put_at(0, self.CONSOLE_SIZE[1] - 1 - result_height,
+                      f"{result}\n")
+
+        # Print the prompt
+        screen.put_at(0, self.CONSOLE_SIZE[1] - 1, "> ")
+        screen.present(keep_cursor)
+
+    def _status(self):
+        """Return the status line, with the result of the last command
+        followed by sync status
 
-    @classmethod
-    def _parse(cls, cmd):
+        :return: The status line
+        :rtype: str
+        """
+        result = self.last_result
+        if self.worker is not None and self.worker.status != "":
+            color = Fore.LIGHTBLACK_EX
+            if self.worker.status == UploadWorker.FAILED:
+                color = Fore.RED
+            result += f" {color}[{self.worker.status}]{Style.RESET_ALL}"
+        return result
+
+    def _parse(self, cmd):
         """Parse a user-input command
 
         The input will be cleaned up, and the matching action will be executed.
@@ -295,88 +790,231 @@ class TUI:
         :type cmd: str
         """
         # Special cases
-        if cls.state == cls.State.HELP:
-            # Any input exits help state
-            cls._undo_state()
+        if (
+                self.state == self.State.STATS and
+                self.stats_page + 1 < len(self.stats_pages)):
+            # Any input shows the next stats page
+            self.stats_page += 1
+            self.last_result = self._stats_status()
+            return
+        if self.state in self.TEXT_STATES:
+            # Any input exits help, search and stats states
+            self._undo_state()
             return
         if cmd == "":
             # Empty command. User is confused?
-            cls.last_result = "Type \"help\" for assistance."
+            self.last_result = "Type \"help\" for assistance."
             return
 
-        # Command parsing and execution
+        try:
+            self._execute(cmd)
+        except self.COMMAND_ERRORS as e:
+            self.last_result = f"{Fore.RED}{e}{Style.RESET_ALL}"
+
+    def _execute(self, cmd):
+        """Run a user-input command in the current state
+
+        :param cmd: Command as input by the user
+        :type cmd: str
+        :raises IndexError: An index argument is out of range
+        :raises ValueError: An argument is not valid
+        :raises TypeError: An argument is missing or can't be parsed
+        :raises RuntimeError: The command failed
+        :raises CommandList.CommandNameError: There is no such command
+        """
+        started = time.perf_counter() if self.metrics.enabled else None
         user_input = UserInput.parse(cmd)
-        user_input.truncate(cls.MAX_NAME_LENGTH)
+        command = self._get_command_list().find(user_input.keyword)
+        if command.limit_text_arg:
+            user_input.truncate(self.MAX_NAME_LENGTH)
+        user_input.keyword = command.keyword  # Keyword may be shortened
         try:
-            command_list = cls._get_command_list()
-            command = command_list.find(user_input.keyword)
             command.validate_and_run(user_input)
+        finally:
+            if started is not None:
+                self.metrics.record_latency(
+                    f"command.{command.keyword or '#'}",
+                    time.perf_counter() - started)
+
+    def _autosave(self):
+        """Schedule a background save if the notebook was changed
+
+        The save is delayed as set in the config, and every further change
+        restarts the delay. Nothing is saved automatically until lists
+        were loaded or saved manually, so that autosave never overwrites
+        unrelated lists in storage.
+        """
+        delay = self.config.get("autosave")
+        if delay == "off" or self.sync is None or self._background is not None:
+            return
+        if self.sync.has_base() and self.sync.has_changes():
+            self.worker.submit(self._save_job(), int(delay.rstrip("s")))
+
+    def _undo_budget(self):
+        """Return the memory the undo history may use, as set in the config
 
-        except (IndexError, ValueError, TypeError, RuntimeError,
-                CommandList.CommandNameError) as e:
-            cls.last_result = f"{Fore.RED}{e}{Style.RESET_ALL}"
+        :return: Max estimated bytes
+        :rtype: int
+        """
+        return int(self.config.get("undo_memory").rstrip("MB")) * 1024 * 1024
 
-    @classmethod
-    def _get_command_list(cls):
+    def _setting_changed(self, name, value):
+        """Apply a changed setting to the parts of the session using it
+
+        :param name: Name of the setting
+        :type name: str
+        :param value: New value of the setting
+        :type value: str
+        """
+        if name == "undo_memory":
+            self.history.budget = self._undo_budget()
+
+    def _flush_local(self):
+        """Write the changes made by the last command to the local disk
+        """
+        try:
+            self.local.flush()
+        except RuntimeError as e:
+            self.last_result = f"{Fore.RED}{e}{Style.RESET_ALL}"
+
+    def _save_job(self):
+        """Return a function that saves the notebook, for the upload worker
+
+        :return: Function performing the save
+        :rtype: function
+        """
+        sync = self.sync
+        everything = self.config.get("save_mode") == "all"
+        binary = self.config.get("save_format") == "binary"
+        return lambda: sync.save(everything=everything, binary=binary)
+
+    def _defer(self, run, finish, wait=True):
+        """Defer the slow part of a command until the command returns
+
+        :param run: Function doing the slow part, without holding the lock.
+        It should raise :class:`RuntimeError` on failure
+        :type run: function
+        :param finish: Function taking the value returned by `run`, called
+        with the lock held
+        :type finish: function
+        :param wait: Wait for the job before reading the next command
+        :type wait: bool, optional
+        """
+        self._deferred = self.Job(run, finish, wait)
+
+    def _check_idle(self):
+        """Make sure no job is running in the background
+
+        :raises RuntimeError: Lists are still loading
+        """
+        if self._background is not None:
+            raise RuntimeError("Lists are still loading, try again later.")
+
+    def _get_command_list(self):
         """Return the current state's command list
 
         :return: list of currently applicable :class:`Command`s
         :rtype: :class:`CommandList`
         """
-        if cls.state == cls.State.LIST_VIEW:
-            return cls.list_view_commands
-        if cls.state == cls.State.TASK_VIEW:
-            return cls.task_view_commands
-        if cls.state == cls.State.SETTINGS:
-            return cls.settings_commands
+        if self.state == self.State.LIST_VIEW:
+            return self.list_view_commands
+        if self.state == self.State.TASK_VIEW:
+            return self.task_view_commands
+        if self.state == self.State.SETTINGS:
+            return self.settings_commands
         raise RuntimeError  # This should be unreachable
 
-    @classmethod
-    def _change_state(cls, new_state):
+    def _page_count(self):
+        """Return the number of pages the active list is split into
+
+        :return: Page count, at least 1
+        :rtype: int
+        """
+        return max(1, math.ceil(len(self.active_list) / self.TASKS_PER_PAGE))
+
+    def _show_task(self, index):
+        """Switch to the page that holds the task under the given index
+
+        :param index: one-based index of the task
+        :type index: int
+        """
+        self.active_page = (index - 1) // self.TASKS_PER_PAGE + 1
+
+    def _change_state(self, new_state):
         """Switch state to a new one
 
         :param new_state: The new state to replace the current one
         :type new_state: :class:`TUI.State`
         """
-        cls.previous_states.append(cls.state)
-        cls.state = new_state
+        self.previous_states.append(self.state)
+        self.state = new_state
+
+    def _text_lines(self):
+        """Return the lines shown in the current text state
+
+        :return: The lines
+        :rtype: list
+        """
+        if self.state == self.State.HELP:
+            return self.help_text
+        if self.state == self.State.SEARCH:
+            return self.search_results
+        return self.stats_text
 
-    @classmethod
-    def _undo_state(cls):
+    def _undo_state(self):
         """Undo the most recent state change
         """
-        cls.state = cls.previous_states.pop()
-        cls.last_result = "Welcome to Lists."
+        self.state = self.previous_states.pop()
+        self.last_result = "Welcome to Lists."
 
-    @classmethod
-    def _cmd_exit(cls, *_):
+    def _cmd_exit(self, *_):
         """Terminate the main loop
         """
-        if Config.get("save_on_exit") == "yes":
-            if cls.storage is None:
-                if not cls.upload_warning_shown:
-                    cls.last_result = (
+        self._check_idle()
+        if self.config.get("save_on_exit") == "yes":
+            if self.storage is None and self.local is None:
+                if not self.upload_warning_shown:
+                    self.last_result = (
                         f"{Fore.RED}"
                         "You are not connected with Dropbox, so your lists "
                         "will be lost.\nIf you're sure you want to exit, run "
                         "the command again."
                         f"{Style.RESET_ALL}"
                     )
-                    cls.upload_warning_shown = True
+                    self.upload_warning_shown = True
                     return
-            else:
-                cls._cmd_save(_)
-        cls._change_state(cls.State.SHUTDOWN)
-        put("Goodbye!\n")
-
-    @classmethod
-    def _cmd_back(cls, *_):
+            elif self.storage is not None:
+                self.worker.submit(self._save_job())
+                self._defer(
+                    lambda: self.worker.flush(self.EXIT_SAVE_TIMEOUT),
+                    self._finish_exit)
+                return
+        self._finish_exit(True)
+
+    def _finish_exit(self, saved):
+        """Terminate the main loop, once lists are saved
+
+        :param saved: Whether lists were saved to storage
+        :type saved: bool
+        :raises RuntimeError: Saving failed
+        """
+        if not saved:
+            reason = self.worker.error or "timed out"
+            raise RuntimeError(
+                f"Failed to save your lists before exiting: {reason}")
+        if self.local is not None:
+            self.local.snapshot()  # Makes the next start faster
+            self.local.close()
+        self._change_state(self.State.SHUTDOWN)
+        self.screen.release()
+        self.console.put("Goodbye!\n")
+
+    def _cmd_back(self, *_):
         """Return to the previous screen
         """
-        cls._undo_state()
+        self._undo_state()
 
-    @classmethod
-    def _cmd_help(cls, *args):
+    def _cmd_help(self, *args):
         """Switch to help state
 
         :param *args: Tuple of (_, text)
@@ -384,175 +1022,484 @@ class TUI:
         _, text = args
         if text != "":  # Command-specific help
             try:
-                command = cls._get_command_list().find(text)
-                cls.help_text = command.help_text
-                cls.last_result = (
+                command = self._get_command_list().find(text)
+                self.help_text = command.help_text
+                self.last_result = (
                     f"Help for command "
-                    f"\"{text}\""
+                    f"\"{command.keyword}\""
                     f" displayed. Input anything to return.")
-                cls._change_state(cls.State.HELP)
+                self._change_state(self.State.HELP)
             except CommandList.CommandNameError:
                 raise CommandList.CommandNameError(
                     f"Help for command \"{text}\" not found"
                 )
 
         else:  # General help
-            cls.help_text = cls.GENERAL_HELP
-            cls.last_result = "Help displayed. Input anything to return."
-            cls._change_state(cls.State.HELP)
+            self.help_text = self.GENERAL_HELP
+            self.last_result = "Help displayed. Input anything to return."
+            self._change_state(self.State.HELP)
 
-    @classmethod
-    def _cmd_connect(cls, *_):
+    def _cmd_connect(self, *_):
         """Connect to Dropbox for save/load functionality
         """
-        first_time = True if cls.storage is None else False
-        clear(cls.CONSOLE_SIZE)
-        cls.storage = Storage()  # Auth wizard happens here
+        self._check_idle()
+        first_time = True if self.storage is None else False
+        if self.worker is not None:
+            self.worker.cancel()  # Uploads to the old account are dropped
+        self._defer(lambda: self._connect(first_time),
+                    lambda storage: self._finish_connect(storage, first_time))
+
+    def _connect(self, first_time):
+        """Connect to Dropbox, running the wizard if needed
+
+        :param first_time: Whether this is the first connection of
+        the session, which reuses a remembered authorization
+        :type first_time: bool
+        :raises RuntimeError: Any failure to authenticate
+        :return: The connected storage
+        :rtype: :class:`Storage`
+        """
+        # Importing the Dropbox SDK takes a large share of the startup time,
+        # and most sessions never connect
+        from storage import Storage
+
+        token_cache = None
+        if self.local is not None:
+            token_cache = TokenCache(self.local.directory)
+        self.console.clear(self.CONSOLE_SIZE)
+        try:
+            # Auth wizard happens here, unless an account can be reused
+            return Storage(token_cache, reuse=first_time,
+                           console=self.console, metrics=self.metrics)
+        finally:
+            self.screen.invalidate()  # The wizard drew over the screen
+
+    def _finish_connect(self, storage, first_time):
+        """Start syncing with a newly connected storage
+
+        :param storage: The connected storage
+        :type storage: :class:`Storage`
+        :param first_time: Whether this is the first connection of
+        the session
+        :type first_time: bool
+        """
+        self.storage = storage
+        self.sync = Sync(self.storage, self.lock, self.metrics)
+        self.sync.merge_listeners.append(self._merged)
+        self.sync.track(self.notebook)
+        if self.worker is None:
+            self.worker = UploadWorker()
 
         if first_time:  # Add save/load commands, which are now usable
-            save_command = Command("save", cls._cmd_save, [
+            save_command = Command("save", self._cmd_save, [
                 f"Syntax: {Fore.GREEN}save{Style.RESET_ALL}",
                 "",
                 "Save all your lists to online storage (Dropbox.) Previously",
-                "saved lists will be overwritten without warning."
+                "saved lists will be overwritten without warning.",
+                "",
+                "Normally only the changes since the last save or load are",
+                "uploaded. This can be changed in the settings. Saving",
+                "happens in the background, and its progress is shown next",
+                "to the result of your last command. Lists can also be saved",
+                "automatically after every change, if enabled in the settings."
             ])
-            cls.list_view_commands.add(save_command)
-            cls.task_view_commands.add(save_command)
-            load_command = Command("load", cls._cmd_load, [
+            self.list_view_commands.add(save_command)
+            self.task_view_commands.add(save_command)
+            load_command = Command("load", self._cmd_load, [
                 f"Syntax: {Fore.GREEN}load{Style.RESET_ALL}",
                 "",
                 "Load all your lists from online storage (Dropbox.) Currently",
                 "visible lists will be replaced, unless there is a load",
-                "failure."
+                "failure. Loading happens in the background, and changes made",
+                "in the meantime are replaced, too."
             ])
-            cls.list_view_commands.add(load_command)
+            self.list_view_commands.add(load_command)
 
-        cls.last_result = "Dropbox account connected successfully."
+        self.last_result = "Dropbox account connected successfully."
 
-    @classmethod
-    def _cmd_save(cls, *_):
+    def _cmd_save(self, *_):
         """Save notebook to storage
         """
-        cls.storage.upload(cls.notebook.serialize())
-        cls.last_result = f"Lists saved successfully."
+        self._check_idle()
+        self.worker.submit(self._save_job())
+        self.last_result = "Saving lists in the background."
 
-    @classmethod
-    def _cmd_load(cls, *_):
+    def _cmd_load(self, *_):
         """Load notebook from storage
         """
-        cls.notebook = Notebook.from_json(cls.storage.download())
-        cls.last_result = f"Lists loaded successfully."
+        self._check_idle()
+        self.worker.cancel()  # Pending saves would overwrite what is loaded
+        self._defer(self._load, self._finish_load, wait=False)
+        self.last_result = "Loading lists in the background."
+
+    def _load(self):
+        """Download the notebook, once all saves are done
+
+        :raises RuntimeError: Any failure to download the data, or saving
+        taking too long
+        :return: The notebook as of the most recent save
+        :rtype: :class:`Notebook`
+        """
+        if not self.worker.wait(self.EXIT_SAVE_TIMEOUT):
+            raise RuntimeError("Lists are still being saved, try again later.")
+        return self.sync.load()
+
+    def _finish_load(self, notebook):
+        """Replace the notebook with the loaded one
+
+        Changes made while loading are replaced, too.
+
+        :param notebook: The loaded notebook
+        :type notebook: :class:`Notebook`
+        """
+        self.notebook = notebook
+        self.active_list = None
+        self.previous_states = []
+        self.state = self.State.LIST_VIEW
+        self.search.track(self.notebook)
+        self.history.track(self.notebook)
+        if self.local is not None:
+            self.local.track(self.notebook)
+        self.last_result = f"Lists loaded successfully."
+
+    def _merged(self):
+        """Show that changes saved by another session were merged into
+        the lists
+
+        Called by sync, with the lock held. The undo history is cleared, as
+        the recorded changes may no longer apply to the merged lists.
+        """
+        self.history.track(self.notebook)
+        self._show_reverted()
+        self.last_result = "Changes saved by another session were merged."
+
+    def _cmd_undo(self, *_):
+        """Revert the changes of the last command that changed the notebook
+        """
+        self.history.undo()
+        self._show_reverted()
+        self.last_result = "Last command undone."
 
-    @classmethod
-    def _cmd_list_add(cls, *args):
+    def _cmd_redo(self, *_):
+        """Repeat the changes reverted by the last undo
+        """
+        self.history.redo()
+        self._show_reverted()
+        self.last_result = "Undone command redone."
+
+    def _show_reverted(self):
+        """Keep the view valid after an undo, a redo or a merge
+
+        The active list may have been removed, or lost tasks. It may also
+        be below another screen, like help, which is then left as well.
+        """
+        states = self.previous_states + [self.state]
+        if self.State.TASK_VIEW not in states:
+            return
+        if self.active_list.notebook is None:  # The list was removed
+            index = states.index(self.State.TASK_VIEW)
+            self.previous_states = states[:index]
+            self._undo_state()
+        else:
+            self.active_page = min(self.active_page, self._page_count())
+
+    def _cmd_list_add(self, *args):
         """Add a new list
 
         :param *args: Tuple of (_, text)
         """
-        cls.notebook.add(List(args[1]))
-        cls.last_result = f"List \"{args[1]}\" added."
+        self.notebook.add(List(args[1]))
+        self.last_result = f"List \"{args[1]}\" added."
 
-    @classmethod
-    def _cmd_list_remove(cls, *args):
+    def _cmd_list_remove(self, *args):
         """Remove a list
 
         :param *args: Tuple of (index, _)
         """
-        removed_list = cls.notebook.remove(args[0])
-        cls.last_result = f"List \"{removed_list.name}\" removed."
+        removed_list = self.notebook.remove(args[0])
+        self.last_result = f"List \"{removed_list.name}\" removed."
 
-    @classmethod
-    def _cmd_list_rename(cls, *args):
+    def _cmd_list_rename(self, *args):
         """Rename a list
 
         :param *args: Tuple of (index, text)
         """
-        renamed_list = cls.notebook[args[0]]
-        old_name = renamed_list.name
-        renamed_list.name = args[1]
-        cls.last_result = f"List \"{old_name}\" renamed to \"{args[1]}\"."
+        old_name = self.notebook[args[0]].name
+        self.notebook.rename(args[0], args[1])
+        self.last_result = f"List \"{old_name}\" renamed to \"{args[1]}\"."
 
-    @classmethod
-    def _cmd_list_enter(cls, *args):
+    def _cmd_list_find(self, *args):
+        """Show the lists and tasks containing the given words
+
+        :param *args: Tuple of (_, text)
+        """
+        text = args[1]
+        lists, tasks, total = self.search.find(text, self.TASKS_PER_PAGE)
+        if len(lists) == 0 and total == 0:
+            self.last_result = f"Nothing found for \"{text}\"."
+            return
+
+        self.search_results = []
+        for list_index in lists:
+            name = self.notebook[list_index].name
+            self.search_results.append(f"#{list_index} {name}")
+        shown = self.TASKS_PER_PAGE - len(lists)
+        for list_index, task_index in tasks[:shown]:
+            lst = self.notebook[list_index]
+            self.search_results.append(
+                f"#{list_index} {lst.name} {Fore.LIGHTBLACK_EX}>"
+                f"{Style.RESET_ALL} #{task_index} {lst[task_index].body}")
+        if total > shown:
+            self.last_result = (f"Showing {shown} of {total} tasks found for "
+                                f"\"{text}\". Input anything to return.")
+        else:
+            self.last_result = (f"Found {len(lists)} lists and {total} tasks "
+                                f"for \"{text}\". Input anything to return.")
+        self._change_state(self.State.SEARCH)
+
+    def _cmd_import(self, *args):
+        """Add the lists from a file
+
+        :param *args: Tuple of (_, text)
+        """
+        self._check_idle()
+        path = os.path.expanduser(args[1])
+        fmt = file_format(path)
+        self._defer(lambda: self._import(path, fmt), self._finish_import)
+
+    def _import(self, path, fmt):
+        """Read a file, adding its lists a chunk of tasks at a time
+
+        The lock is only held while a chunk is added, and each chunk is
+        written to the local disk right away. Lists read before a failure
+        are kept.
+
+        :param path: Path of the file
+        :type path: str
+        :param fmt: Format of the file
+        :type fmt: str
+        :raises RuntimeError: The file can't be read, or is not valid
+        :return: Tuple of (number of lists, number of tasks) added
+        :rtype: tuple
+        """
+        default_name = os.path.splitext(os.path.basename(path))[0]
+        lists = {}  # Key in the file -> list added for it
+        task_count = 0
+        try:
+            with open(path, encoding="utf-8", newline="") as file:
+                for key, name, tasks in import_lists(
+                        file, fmt, default_name, self.MAX_NAME_LENGTH):
+                    with self.lock:
+                        if key not in lists:
+                            lists[key] = List(name)
+                            self.notebook.add(lists[key])
+                        if len(tasks) > 0:
+                            lists[key].extend(tasks)
+                            task_count += len(tasks)
+                        if self.local is not None:
+                            self.local.flush()
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            raise RuntimeError(f"Failed to import \"{path}\": {e}")
+        return len(lists), task_count
+
+    def _finish_import(self, counts):
+        """Show how much was imported
+
+        :param counts: Tuple of (number of lists, number of tasks)
+        :type counts: tuple
+        """
+        lists, tasks = counts
+        self.last_result = f"Imported {lists} lists with {tasks} tasks."
+
+    def _cmd_export(self, *args):
+        """Write all lists to a file
+
+        :param *args: Tuple of (_, text)
+        """
+        path = os.path.expanduser(args[1])
+        fmt = file_format(path)
+        self._defer(lambda: self._export(path, fmt), self._finish_export)
+
+    def _export(self, path, fmt):
+        """Write all lists to a file, list by list
+
+        :param path: Path of the file
+        :type path: str
+        :param fmt: Format of the file
+        :type fmt: str
+        :raises RuntimeError: The file can't be written
+        :return: Path of the file
+        :rtype: str
+        """
+        try:
+            with self.lock, open(path, "w", encoding="utf-8",
+                                 newline="") as file:
+                export_lists(self.notebook, file, fmt)
+        except OSError as e:
+            raise RuntimeError(f"Failed to export lists: {e}")
+        return path
+
+    def _finish_export(self, path):
+        """Show where lists were exported
+
+        :param path: Path of the file
+        :type path: str
+        """
+        self.last_result = f"Lists exported to \"{path}\"."
+
+    def _cmd_list_enter(self, *args):
         """Enter a list
 
         :param *args: Tuple of (index, _)
         """
-        cls.active_list = cls.notebook[args[0]]
-        cls.last_result = f"Viewing list \"{cls.active_list.name}\"."
-        cls._change_state(cls.State.TASK_VIEW)
+        self.active_list = self.notebook[args[0]]
+        self.active_list.hydrate()  # Lists may be loaded without their tasks
+        self.active_page = 1
+        self.last_result = f"Viewing list \"{self.active_list.name}\"."
+        self._change_state(self.State.TASK_VIEW)
 
-    @classmethod
-    def _cmd_task_add(cls, *args):
+    def _cmd_task_add(self, *args):
         """Add a new task to active list
 
         :param *args: Tuple of (_, text)
         """
-        cls.active_list.add(Task(args[1]))
-        cls.last_result = f"Task \"{args[1]}\" added."
+        self.active_list.add(Task(args[1]))
+        self._show_task(len(self.active_list))
+        self.last_result = f"Task \"{args[1]}\" added."
+
+    def _cmd_task_insert(self, *args):
+        """Insert a new task into active list at a given position
 
-    @classmethod
-    def _cmd_task_remove(cls, *args):
+        :param *args: Tuple of (index, text)
+        """
+        self.active_list.insert(args[0], Task(args[1]))
+        self._show_task(args[0])
+        self.last_result = f"Task \"{args[1]}\" added at #{args[0]}."
+
+    def _cmd_task_move(self, *args):
+        """Move a task to a different position in active list
+
+        :param *args: Tuple of (index, text)
+        """
+        try:
+            new_index = int(args[1])
+        except ValueError:
+            raise TypeError(f"Index value \"{args[1]}\" is not valid")
+        moved_task = self.active_list.move(args[0], new_index)
+        self._show_task(new_index)
+        self.last_result = f"Task \"{moved_task.body}\" moved to #{new_index}."
+
+    def _cmd_task_remove(self, *args):
         """Remove a task from active list
 
         :param *args: Tuple of (index, _)
         """
-        removed_task = cls.active_list.remove(args[0])
-        cls.last_result = f"Task \"{removed_task.body}\" removed."
+        removed_task = self.active_list.remove(args[0])
+        self.last_result = f"Task \"{removed_task.body}\" removed."
 
-    @classmethod
-    def _cmd_task_rename(cls, *args):
+    def _cmd_task_rename(self, *args):
         """Rename a task
 
         :param *args: Tuple of (index, text)
         """
-        renamed_task = cls.active_list[args[0]]
-        old_name = renamed_task.body
-        renamed_task.body = args[1]
-        cls.last_result = f"Task \"{old_name}\" renamed to \"{args[1]}\"."
+        old_name = self.active_list[args[0]].body
+        self.active_list.set_body(args[0], args[1])
+        self.last_result = f"Task \"{old_name}\" renamed to \"{args[1]}\"."
 
-    @classmethod
-    def _cmd_task_done(cls, *args):
+    def _cmd_task_done(self, *args):
         """Toggle a task's done status
 
         :param *args: Tuple of (index, _)
         """
-        toggled_task = cls.active_list[args[0]]
+        toggled_task = self.active_list[args[0]]
         neg = "not " if toggled_task.done else ""
-        toggled_task.done = not toggled_task.done
-        cls.last_result = f"Task \"{toggled_task.body}\" marked as {neg}done."
+        self.active_list.set_done(args[0], not toggled_task.done)
+        self.last_result = f"Task \"{toggled_task.body}\" marked as {neg}done."
 
-    @classmethod
-    def _cmd_task_prio(cls, *args):
+    def _cmd_task_prio(self, *args):
         """Toggle a task's prio status
 
         :param *args: Tuple of (index, _)
         """
-        toggled_task = cls.active_list[args[0]]
+        toggled_task = self.active_list[args[0]]
         neg = "not " if toggled_task.prio else ""
-        toggled_task.prio = not toggled_task.prio
-        cls.last_result = (
+        self.active_list.set_prio(args[0], not toggled_task.prio)
+        self.last_result = (
             f"Task "
             f"\"{toggled_task.body}\""
             f" marked as {neg}priority.")
 
-    @classmethod
-    def _cmd_settings(cls, *_):
+    def _cmd_task_page(self, *args):
+        """Show a different page of the active list
+
+        :param *args: Tuple of (index, _)
+        """
+        if not 1 <= args[0] <= self._page_count():
+            raise IndexError(f"There is no page with index {args[0]}")
+        self.active_page = args[0]
+        self.last_result = f"Showing page {args[0]} of {self._page_count()}."
+
+    def _stats_status(self):
+        """Return the status line of the stats page shown
+
+        :return: The status line
+        :rtype: str
+        """
+        page = f"Stats page {self.stats_page + 1}/{len(self.stats_pages)}."
+        if not self.metrics.enabled:
+            page = f"Recording is off. {page}"
+        if self.stats_page + 1 < len(self.stats_pages):
+            return f"{page} Input anything to continue."
+        return f"{page} Input anything to return."
+
+    def _cmd_stats(self, *args):
+        """Switch to stats state, or change how stats are recorded
+
+        :param *args: Tuple of (_, text)
+        """
+        _, text = args
+        if text == "on":
+            self.metrics.enabled = True
+            self.last_result = "Recording stats."
+        elif text == "off":
+            self.metrics.enabled = False
+            self.last_result = "Stopped recording stats."
+        elif text == "reset":
+            self.metrics.reset()
+            self.last_result = "Recorded stats cleared."
+        elif text == "":
+            self.stats_text = self.metrics.print()
+            self.stats_pages = self.metrics.pages(self.STATS_PER_PAGE)
+            self.stats_page = 0
+            if not self.metrics.enabled:
+                self.stats_text += ["", "Recording is off, use \"stats on\" "
+                                        "to turn it on."]
+            self.last_result = self._stats_status()
+            self._change_state(self.State.STATS)
+        else:
+            raise ValueError(f"\"{text}\" is not a stats option, use "
+                             f"\"on\", \"off\" or \"reset\".")
+
+    def _cmd_settings(self, *_):
         """Switch to settings state
         """
 
-        cls.last_result = "Settings displayed."
-        cls._change_state(cls.State.SETTINGS)
+        self.last_result = "Settings displayed."
+        self._change_state(self.State.SETTINGS)
 
-    @classmethod
-    def _cmd_settings_set(cls, *args):
+    def _cmd_settings_set(self, *args):
         """Change a setting value
 
         :param *args: Tuple of (index, value)
         """
-        Config.set_at(args[0], args[1])
-        cls.last_result = (
+        self.config.set_at(args[0], args[1])
+        self.last_result = (
             f"Setting "
-            f"\"{Config.description_at(args[0])}\""
+            f"\"{self.config.description_at(args[0])}\""
             f" changed to "
             f"\"{args[1]}\".")
+        if self.local is not None:
+            try:
+                self.local.save_settings(self.config.data())
+            except RuntimeError as e:
+                self.last_result = f"{Fore.RED}{e}{Style.RESET_ALL}"
@@ -0,0 +1,138 @@
+import threading
+import time
+
+
+class UploadWorker:
+    """Runs uploads in a background thread, one at a time
+
+    The worker holds a single pending job. Submitting a new job replaces
+    the pending one, so only the newest state is ever uploaded. Jobs may be
+    delayed, and every submission restarts the delay, which debounces
+    a burst of changes into a single upload. Failed jobs are retried with
+    increasing delays, unless a newer job replaces them.
+    """
+
+    SAVING = "saving…"
+    SAVED = "saved"
+    FAILED = "failed, retrying"
+    RETRY_DELAYS = [2, 5, 15, 30, 60]  # Seconds to wait after each failure
+
+    def __init__(self):
+        """Constructor method, starts the background thread
+        """
+        self.status = ""  # Human-readable state of the most recent job
+        self.error = None  # Exception raised by the most recent job, if any
+        self._condition = threading.Condition()
+        self._job = None  # Pending job, if any
+        self._due = 0.0  # Time at which the pending job is started
+        self._failures = 0  # Consecutive failures of the pending job
+        self._running = False
+        self._stopping = False  # End the thread once there are no jobs
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, job, delay=0.0):
+        """Schedule a job, replacing the pending one
+
+        :param job: Function to call in the background thread. It should
+        raise :class:`RuntimeError` on failure
+        :type job: function
+        :param delay: Seconds to wait before starting the job
+        :type delay: float, optional
+        """
+        with self._condition:
+            self._job = job
+            self._due = time.monotonic() + delay
+            self._failures = 0
+            self._condition.notify_all()
+
+    def cancel(self):
+        """Drop the pending job, if it didn't start yet
+        """
+        with self._condition:
+            self._job = None
+            self._condition.notify_all()
+
+    def stop(self):
+        """Start the pending job right away, and end the background thread
+        once it's done
+
+        A failed job is not retried after this.
+        """
+        with self._condition:
+            self._stopping = True
+            self._due = time.monotonic()
+            self._condition.notify_all()
+
+    def flush(self, timeout):
+        """Start the pending job right away, and wait for all work to finish
+
+        :param timeout: Maximum number of seconds to wait
+        :type timeout: float
+        :return: `True` if all jobs finished successfully in time
+        :rtype: bool
+        """
+        with self._condition:
+            self._due = time.monotonic()
+            self.error = None
+            self._condition.notify_all()
+            # Stop waiting early if the job fails, instead of waiting
+            # for the retries
+            return self._condition.wait_for(
+                lambda: not self._running and (
+                    self._job is None or self.error is not None),
+                timeout) and self.error is None
+
+    def wait(self, timeout):
+        """Wait until there are no pending or running jobs
+
+        Delayed jobs are waited for, too.
+
+        :param timeout: Maximum number of seconds to wait
+        :type timeout: float
+        :return: `True` if the worker became idle in time
+        :rtype: bool
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._job is None and not self._running, timeout)
+
+    def _run(self):
+        """Main loop of the background thread
+        """
+        while True:
+            with self._condition:
+                while True:
+                    now = time.monotonic()
+                    if self._job is not None and self._due <= now:
+                        break
+                    if self._job is None and self._stopping:
+                        return
+                    timeout = None if self._job is None else self._due - now
+                    self._condition.wait(timeout)
+                job = self._job
+                self._job = None
+                self._running = True
+                self.status = self.SAVING
+
+            error = None
+            try:
+                job()
+            except Exception as e:  # Keep the thread alive on any failure
+                error = e
+
+            with self._condition:
+                self._running = False
+                self.error = error
+                if error is None:
+                    self.status = self.SAVED
+                    self._failures = 0
+                else:
+                    self.status = self.FAILED
+                    # Retry, unless replaced or stopped
+                    if self._job is None and not self._stopping:
+                        delay = self.RETRY_DELAYS[
+                            min(self._failures, len(self.RETRY_DELAYS) - 1)]
+                        self._job = job
+                        self._due = time.monotonic() + delay
+                        self._failures += 1
+                self._condition.notify_all()